@@ -0,0 +1,435 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Command line frontend to the BatchProcessor; runs a saved configuration without any display (i.e. on cluster nodes or
+from cron). Does not import tkinter.
+
+Example: python BatchProcessorCLI.py workflow/Konfiguration/Schritt_1.json --input "in/*.txt" --workers 8 --json
+Example: python BatchProcessorCLI.py workflow/Konfiguration/Schritt_1.json --input-dir /mnt/share/study --exclude "old"
+With --pipeline, the configuration is a pipeline definition connecting several configurations (@see Pipeline);
+--dry-run prints its task graph and the estimated duration instead of processing any file.
+--log-tail N prints the most recent records of the execution log within the output directory instead of processing.
+--captured-issues prints the errors and warnings found in the captured output of the engine (@see OutputCapture).
+
+Exit status: 0 if all files have been processed, 1 if processing failed for at least one file,
+2 if the configuration could not be loaded or the preflight checks failed. With --preflight, the job is only
+validated (@see PreflightCheck).
+"""
+
+# system imports
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+import time
+
+#project imports
+from Lang import Lang
+from batchProcessor import BatchProcessor
+from Configuration import Configuration
+from ExecutionLog import ExecutionLog
+from OutputCapture import OutputCapture
+from FileDiscovery import FileDiscovery
+from Pipeline import Pipeline
+from WorkerPool import WorkerPool
+
+
+class BatchProcessorCLI:
+    """
+    Command line frontend to the BatchProcessor backend; reports progress to stdout, either human readable or as
+    JSON lines (one object per line)
+    """
+
+    EXIT_SUCCESS = 0
+    EXIT_FAILED_FILES = 1
+    EXIT_CONFIGURATION_ERROR = 2
+
+
+    def __init__(self, args, workerPool):
+        """
+        :param args: parsed command line arguments
+        @see createArgumentParser
+        :param workerPool: WorkerPool instance
+        """
+        self.args = args
+        # JSON lines are written to the original stdout only, see main()
+        self.out = sys.stdout
+        self.errorCount = 0
+        self.lastReportedProgress = None
+        if args.pipeline:
+            self.backend = Pipeline(gui=self, workerPool=workerPool)
+        else:
+            self.backend = BatchProcessor(gui=self, workerPool=workerPool)
+
+
+    @staticmethod
+    def createArgumentParser():
+        parser = argparse.ArgumentParser(description=Lang.get('Runs a saved BatchProcessor configuration without GUI'))
+        parser.add_argument('config', help=Lang.get('configuration file (JSON) as saved by the GUI'))
+        parser.add_argument('--pipeline', action='store_true',
+                            help=Lang.get('the configuration file is a pipeline definition; --input applies to the first step'))
+        parser.add_argument('--input', action='append', metavar='GLOB',
+                            help=Lang.get('input files to use instead of those in the configuration; may be repeated'))
+        parser.add_argument('--input-dir', action='append', metavar='DIR',
+                            help=Lang.get('search the directory (and its subdirectories) for input files matching the '
+                                          'input search and regex patterns; may be repeated'))
+        parser.add_argument('--include', action='append', metavar='GLOB',
+                            help=Lang.get('file names to search for instead of the input search pattern; may be repeated'))
+        parser.add_argument('--exclude', action='append', metavar='GLOB',
+                            help=Lang.get('files and directories to skip while searching; may be repeated'))
+        parser.add_argument('--no-recursive', action='store_true',
+                            help=Lang.get('only search the top level of the input directories'))
+        parser.add_argument('--output-dir', help=Lang.get('output directory to use instead of the configured one'))
+        parser.add_argument('--simulate', action='store_true',
+                            help=Lang.get('only print the syntax generated for the first file'))
+        parser.add_argument('--workers', type=int,
+                            help=Lang.get('number of worker processes; 0 starts one worker per CPU core'))
+        parser.add_argument('--files-per-invocation', type=int, metavar='K',
+                            help=Lang.get('number of files processed by a single invocation of the statistics engine'))
+        parser.add_argument('--engine', choices=['spss', 'pspp', 'pspp-session'], help=Lang.get('statistics engine to use'))
+        parser.add_argument('--scratch-dir', help=Lang.get('directory for temporary syntax files (i.e. on tmpfs)'))
+        parser.add_argument('--keep-scratch-files', action='store_true',
+                            help=Lang.get('keep temporary syntax files for debugging'))
+        parser.add_argument('--task-timeout', type=float, metavar='SECONDS',
+                            help=Lang.get('kill and replace workers whose task takes longer; 0 disables the timeout'))
+        parser.add_argument('--retries', type=int, help=Lang.get('number of retries of failed tasks'))
+        parser.add_argument('--rerun-failed', action='store_true',
+                            help=Lang.get('only process the files which failed during the last run'))
+        parser.add_argument('--allow-undefined-placeholders', action='store_true',
+                            help=Lang.get('run the syntax even if some of its placeholders are not defined'))
+        parser.add_argument('--force', action='store_true',
+                            help=Lang.get('process all files, including those whose output is up to date'))
+        parser.add_argument('--preflight', action='store_true',
+                            help=Lang.get('only check the configuration and all input files; nothing is processed'))
+        parser.add_argument('--dry-run', action='store_true',
+                            help=Lang.get('print the task graph of the pipeline and its estimated duration; nothing is processed'))
+        parser.add_argument('--log-tail', type=int, metavar='N',
+                            help=Lang.get('print the N most recent records of the execution log; nothing is processed'))
+        parser.add_argument('--captured-issues', action='store_true',
+                            help=Lang.get('print the errors and warnings within the captured output; nothing is processed'))
+        parser.add_argument('--log-filter', metavar='TEXT', default='',
+                            help=Lang.get('only print log records (or captured issues) whose message or input file contains the text'))
+        parser.add_argument('--log-level', choices=ExecutionLog.levels, default='info',
+                            help=Lang.get('least severe level of the log records (or captured issues) printed'))
+        parser.add_argument('--json', action='store_true', help=Lang.get('report progress as JSON lines'))
+        return parser
+
+
+    def run(self):
+        """
+        Loads the configuration, applies overrides and processes all files
+        :return: exit status
+        """
+        try:
+            if self.args.pipeline:
+                self.backend.loadFromFile(self.args.config)
+            else:
+                with open(self.args.config, 'r') as f:
+                    self.backend.config.loadFromFile(f)
+        except (IOError, ValueError, KeyError) as e:
+            self.err(Lang.get('Unable to load configuration file: ') + str(e))
+            return self.EXIT_CONFIGURATION_ERROR
+
+        configs = [step.config for step in self.backend.steps] if self.args.pipeline else [self.backend.config]
+        if any(config.isFromNewerVersion() for config in configs):
+            self.emit('warning', message=Lang.get("The config file was created using a newer program version. Settings might be ignored and behavior may change. To avoid surprises, please updated the BatchProcessor."))
+
+        if self.args.log_tail is not None:
+            return self.showLogTail(configs)
+
+        if self.args.captured_issues:
+            return self.showCapturedIssues(configs)
+
+        if self.args.preflight:
+            if self.args.pipeline:
+                self.err(Lang.get('Preflight checks of pipelines are carried out step by step while processing'))
+                return self.EXIT_CONFIGURATION_ERROR
+            return self.runPreflightChecks()
+
+        if self.args.dry_run:
+            if not(self.args.pipeline):
+                self.err(Lang.get('Dry runs are only available for pipelines'))
+                return self.EXIT_CONFIGURATION_ERROR
+            return self.showTaskGraph()
+
+        if not(self.backend.startProcessing()):
+            return self.EXIT_CONFIGURATION_ERROR
+
+        for event in self.backend.iterateEvents():
+            self.showTaskEvent(event)
+        self.backend.finishProcessing()
+
+        if self.errorCount > 0:
+            return self.EXIT_FAILED_FILES
+        return self.EXIT_SUCCESS
+
+
+    def runPreflightChecks(self):
+        """
+        Validates the job without processing any file
+        :return: exit status
+        """
+        self.GUIToConfig()
+        check = self.backend.runPreflightChecks()
+        if check.hasErrors():
+            self.err(check.getReport())
+            return self.EXIT_CONFIGURATION_ERROR
+        if len(check.warnings) > 0:
+            self.warn(check.getReport())
+        self.emit('info', title=Lang.get('Preflight check'),
+                  message=Lang.get('Preflight check passed for {} files').format(len(self.backend.config.opt['inputFiles'])))
+        return self.EXIT_SUCCESS
+
+
+    def showTaskGraph(self):
+        """
+        Prints the task graph of the pipeline and the time it is expected to take on the configured number of workers
+        :return: exit status
+        """
+        try:
+            graph = self.backend.planTaskGraph()
+        except ValueError as e:
+            self.err(str(e))
+            return self.EXIT_CONFIGURATION_ERROR
+        workerCount = self.backend.getPlannedWorkerCount()
+        makespan = graph.estimateMakespan(workerCount)
+        criticalPath = max(graph.getRanks() + [0.0])
+        msg = graph.format(self.backend.stepNames) + os.linesep + \
+              Lang.get('Estimated duration on {} workers: {:.2f} seconds (critical path: {:.2f} seconds)').format(
+                  workerCount, makespan, criticalPath)
+        self.emit('graph', message=msg, workers=workerCount, makespan=makespan, criticalPath=criticalPath,
+                  tasks=sum(1 for task in graph.tasks if not(task['skipped'])))
+        return self.EXIT_SUCCESS
+
+
+    def showLogTail(self, configs):
+        """
+        Prints the most recent records of the execution log within the output directory (of each step of a pipeline),
+        read from the end of the log file
+        :return: exit status
+        """
+        outputDirs = []
+        for config in configs:
+            outputDir = self.args.output_dir if self.args.output_dir and not(self.args.pipeline) else config.opt['outputDir']
+            if outputDir not in outputDirs:
+                outputDirs.append(outputDir)
+        for outputDir in outputDirs:
+            filePath = os.path.join(outputDir, ExecutionLog.fileName)
+            if len(ExecutionLog.getLogFiles(filePath)) == 0:
+                self.warn(Lang.get('No execution log found at {}').format(filePath))
+                continue
+            for record in ExecutionLog.readTail(filePath, max(0, self.args.log_tail), self.args.log_filter,
+                                                self.args.log_level):
+                self.emit('log', record=record)
+        return self.EXIT_SUCCESS
+
+
+    def showCapturedIssues(self, configs):
+        """
+        Prints the errors and warnings within the captured output of the engine (of each step of a pipeline), as recorded
+        in the index of the capture directory, so the capture files themselves are not read
+        :return: exit status
+        """
+        captureDirs = []
+        for config in configs:
+            captureDir = config.opt.get('defaultCaptureOutputOutDir', 'none')
+            if captureDir not in ('', 'none') and captureDir not in captureDirs:
+                captureDirs.append(captureDir)
+        if len(captureDirs) == 0:
+            self.warn(Lang.get('Output of the engine is not captured (defaultCaptureOutputOutDir)'))
+        filterText = self.args.log_filter.lower()
+        minLevel = ExecutionLog.levels.index(self.args.log_level)
+        for captureDir in captureDirs:
+            for record in OutputCapture.readIndex(captureDir):
+                matchesFile = filterText in record['captureFile'].lower() or \
+                              filterText in (record.get('inputFile') or '').lower()
+                issues = [issue for issue in record['issues'] if ExecutionLog.levels.index(issue[1]) >= minLevel and
+                          (matchesFile or filterText in issue[2].lower())]
+                if len(issues) > 0:
+                    self.emit('capture', captureFile=record['captureFile'], inputFile=record.get('inputFile'),
+                              failed=record['failed'], errors=record['errors'], warnings=record['warnings'],
+                              issues=issues)
+        return self.EXIT_SUCCESS
+
+
+    def emit(self, event, **fields):
+        """
+        Reports an event on stdout (errors go to stderr in human readable mode)
+        :param event: type of event (i.e. 'progress', 'info', 'error')
+        :param fields: further information on the event
+        """
+        if self.args.json:
+            fields['event'] = event
+            fields['time'] = time.time()
+            print(json.dumps(fields, sort_keys=True), file=self.out)
+        else:
+            stream = sys.stderr if event in ('error', 'warning') else self.out
+            if event == 'progress':
+                msg = Lang.get('{} of {} files processed').format(fields['processed'], fields['total'])
+                if fields['remainingTime'] is not None:
+                    msg += Lang.get(', remaining time: {:.1f} seconds ({:.1f} to {:.1f})').format(
+                        fields['remainingTime'], *fields['remainingTimeRange'])
+            elif event == 'log':
+                msg = ExecutionLog.formatRecord(fields['record'])
+            elif event == 'capture':
+                msg = os.linesep.join('{}:{}: {}'.format(fields['captureFile'], lineNum, text)
+                                      for lineNum, level, text in fields['issues'])
+            elif event == 'debugging':
+                msg = fields['placeholders'] + os.linesep + fields['commands']
+            else:
+                msg = fields['message']
+            print(msg, file=stream)
+        self.out.flush()
+
+
+    def showTaskEvent(self, event):
+        """
+        Reports start and completion of single tasks; in human readable mode, only failures are reported
+        """
+        if self.args.json:
+            fields = dict((key, value) for key, value in event.items() if key not in ('time', 'traceback'))
+            fields['task'] = fields.pop('type')
+            self.emit('task', **fields)
+        elif event['type'] == 'failed':
+            print(Lang.get('Error while processing {}: {}').format(event['inputFile'], event['error']), file=sys.stderr)
+
+
+    # Frontend interface used by the backend
+    # ----------------------------------------------------------------------------------------------------------------
+    def GUIToConfig(self):
+        """
+        Propagates command line overrides to config
+        """
+        self.applyStepOverrides(self.backend.config.opt, 0)
+
+
+    def applyStepOverrides(self, opt, stepIndex):
+        """
+        Propagates command line overrides to the configuration of a single step of a Pipeline; input files only apply
+        to the first step
+        """
+        if (self.args.input or self.args.input_dir) and stepIndex == 0:
+            inputFiles = []
+            for pattern in self.args.input or []:
+                inputFiles += sorted(glob.glob(os.path.expanduser(pattern)))
+            if self.args.input_dir:
+                inputFiles += self.discoverInputFiles(opt)
+            opt['inputFiles'] = inputFiles
+        if self.args.output_dir and not(self.args.pipeline):
+            opt['outputDir'] = self.args.output_dir
+        if self.args.simulate:
+            opt['simulateProcessing'] = True
+        if self.args.workers is not None:
+            opt['workerCount'] = self.args.workers
+        if self.args.engine:
+            opt['engine'] = self.args.engine
+        if self.args.files_per_invocation is not None:
+            opt['filesPerInvocation'] = max(1, self.args.files_per_invocation)
+        if self.args.scratch_dir:
+            # scratch files are only used if the syntax is not passed via stdin
+            opt['scratchDir'] = self.args.scratch_dir
+            opt['syntaxDelivery'] = 'file'
+        if self.args.keep_scratch_files:
+            opt['syntaxDelivery'] = 'file'
+            opt['keepScratchFiles'] = True
+        if self.args.task_timeout is not None:
+            opt['taskTimeout'] = self.args.task_timeout
+        if self.args.retries is not None:
+            opt['maxRetries'] = max(0, self.args.retries)
+        if self.args.rerun_failed and stepIndex == 0:
+            # the list is kept within the output directory
+            backend = self.backend.steps[0] if self.args.pipeline else self.backend
+            opt['inputFiles'] = backend.loadFailedTaskList()
+        if self.args.allow_undefined_placeholders:
+            opt['allowUndefinedPlaceholders'] = True
+        if self.args.force:
+            opt['skipUpToDateFiles'] = False
+
+
+    def discoverInputFiles(self, opt):
+        """
+        Searches the input directories given on the command line
+        @see FileDiscovery
+        :return: sorted list of the files found
+        """
+        if self.args.include:
+            opt['inputSearchPattern'] = ';'.join(self.args.include)
+        if self.args.exclude:
+            opt['inputExcludePatterns'] = ';'.join(self.args.exclude)
+        if self.args.no_recursive:
+            opt['recursiveInputSearch'] = False
+        config = Configuration()
+        config.opt = opt
+        try:
+            discovery = FileDiscovery.fromConfiguration(config)
+        except re.error as e:
+            self.err(Lang.get('Invalid input regex pattern: ') + str(e))
+            return []
+        inputFiles = discovery.find([os.path.expanduser(directory) for directory in self.args.input_dir])
+        for directory, error in discovery.errors:
+            self.warn(Lang.get('Unable to read directory {}: {}').format(directory, error))
+        return inputFiles
+
+
+    def updateConfigGUI(self):
+        pass
+
+
+    def showProgress(self, processedFiles, totalFiles, remainingTime):
+        """
+        :param remainingTime: (estimate, lower bound, upper bound) in seconds; None if not known yet
+        """
+        # the backend polls frequently; only report actual progress
+        if self.lastReportedProgress == processedFiles:
+            return
+        self.lastReportedProgress = processedFiles
+        if remainingTime is None:
+            self.emit('progress', processed=processedFiles, total=totalFiles, remainingTime=None,
+                      remainingTimeRange=None)
+        else:
+            self.emit('progress', processed=processedFiles, total=totalFiles, remainingTime=remainingTime[0],
+                      remainingTimeRange=list(remainingTime[1:]))
+
+
+    def resetProgress(self):
+        self.lastReportedProgress = None
+
+
+    def showInfo(self, title, msg):
+        self.emit('info', title=title, message=msg)
+
+
+    def showDebuggingInformation(self, debuggingInfo):
+        self.emit('debugging', placeholders=debuggingInfo['placeholders'], commands=debuggingInfo['commands'])
+
+
+    def warn(self, warnMsg):
+        self.emit('warning', message=warnMsg)
+
+
+    def err(self, errMsg):
+        self.errorCount += 1
+        self.emit('error', message=errMsg)
+
+
+
+def main():
+    args = BatchProcessorCLI.createArgumentParser().parse_args()
+    jsonStream = None
+    if args.json:
+        # keep stdout clean for JSON lines: anything else printed by backend and workers goes to stderr
+        sys.stdout.flush()
+        jsonStream = os.fdopen(os.dup(sys.stdout.fileno()), 'w')
+        os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    # worker processes have to be created before anything else, as with the GUI
+    workerPool = WorkerPool(args.workers)
+    cli = BatchProcessorCLI(args, workerPool)
+    if jsonStream is not None:
+        cli.out = jsonStream
+    sys.exit(cli.run())
+
+if __name__ == '__main__':
+    main()
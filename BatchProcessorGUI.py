@@ -8,17 +8,35 @@ import tkinter.scrolledtext
 
 #system imports
 import os
+import queue
+import re
+import threading
+import time
 
 #project imports
 from Lang import Lang
 from batchProcessor import BatchProcessor
+from Pipeline import Pipeline
 from GUIComponent import GUIComponent
+from FileDiscovery import FileDiscovery
+from FileSelection import FileSelection
+from VirtualFileList import VirtualFileList
+from FrontendChannel import FrontendChannel
+from ProcessingThread import ProcessingThread
+from ExecutionLog import ExecutionLog
 
 class BatchProcessorGUI (GUIComponent):
     """
     GUI component to the BatchProcessor backend
     """
 
+    # interval (in ms) in which events reported by the workers are consumed
+    pollingInterval = 100
+
+    # interval (in ms) in which the log view follows the log while processing; number of records shown at most
+    logRefreshInterval = 1000
+    logViewSize = 1000
+
     # GUI
     # -------------------------------------------------------------------------------------------------------------
 
@@ -71,6 +89,10 @@ class BatchProcessorGUI (GUIComponent):
         self.parent = parent
         batchProcessorArgs['gui'] = self
         self.backend = BatchProcessor(**batchProcessorArgs);
+        # the backend or a Pipeline, and the thread running it; @see startProcessing
+        self.processor = self.backend
+        self.processingThread = None
+        self.channel = None
         self.mainWindow = mainWindow
 
         self.centerWindow()
@@ -80,6 +102,11 @@ class BatchProcessorGUI (GUIComponent):
         self.loadedConfigurationFilePaths = self.mainWindow.state['actions']['recentActions']
 
 
+    def applyStepOverrides(self, opt, stepIndex):
+        # the steps of a pipeline are run as saved
+        pass
+
+
     def propagateToUserState(self):
         self.mainWindow.saveUserState()
 
@@ -185,18 +212,38 @@ class BatchProcessorGUI (GUIComponent):
         self.fileSelectionPane = tk.Frame(self.notebook)
         self.fileSelectionPane.configure(background='white')
 
-        selectFilesButton = tk.Button(self.fileSelectionPane, text=Lang.get("Select input files"),
-                                      command=self.selectFiles, **self.getItemStyle())
-        selectFilesButton.grid(row=0, column=0, sticky=tk.W)
+        self.selectFilesButton = tk.Button(self.fileSelectionPane, text=Lang.get("Select input files"),
+                                           command=self.selectFiles, **self.getItemStyle())
+        self.selectFilesButton.grid(row=0, column=0, sticky=tk.W)
 
         # load config
-        selectFilesDirectoryButton = tk.Button(self.fileSelectionPane, text=Lang.get("Select Dir"),
-                                               command=self.selectDir, **self.getItemStyle())
-        selectFilesDirectoryButton.grid(row=0, column=1, sticky=tk.W);
-
-        self.selectedFilesList = tk.Listbox(self.fileSelectionPane)
+        self.selectFilesDirectoryButton = tk.Button(self.fileSelectionPane, text=Lang.get("Select Dir"),
+                                                    command=self.selectDir, **self.getItemStyle())
+        self.selectFilesDirectoryButton.grid(row=0, column=1, sticky=tk.W);
+
+        self.fileSelection = FileSelection(self.conf('inputFiles'))
+        # files shown, i.e. those passing the filter; the list of the FileSelection itself if there is no filter
+        self.shownFiles = self.fileSelection.files
+        self.unmatchedFileNum = 0
+        self.selectedFilesList = VirtualFileList(self.fileSelectionPane, **self.getItemStyle())
         self.selectedFilesList.grid(row=1, rowspan = 6,
                                     column = 0, columnspan = 6, sticky = tk.W + tk.E)
+
+        # filter by path or by capture group of the input regex pattern
+        tk.Label(self.fileSelectionPane, text=Lang.get('Filter'), **self.getItemStyle()).grid(row=8, column=0,
+                                                                                            sticky=tk.E)
+        self.fileFilterGroup = tk.StringVar()
+        self.fileFilterGroup.set(Lang.get('Path'))
+        self.fileFilterGroupBox = ttk.Combobox(self.fileSelectionPane, textvariable=self.fileFilterGroup,
+                                               state='readonly', postcommand=self.updateFileFilterGroups)
+        self.fileFilterGroupBox.grid(row=8, column=1, sticky=tk.W + tk.E)
+        self.fileFilterText = tk.StringVar()
+        tk.Entry(self.fileSelectionPane, textvariable=self.fileFilterText).grid(row=8, column=2, columnspan=3,
+                                                                               sticky=tk.W + tk.E)
+        self.fileFilterGroup.trace('w', lambda *args: self.populateSelectedFileList())
+        self.fileFilterText.trace('w', lambda *args: self.populateSelectedFileList())
+        self.fileCountLabel = tk.Label(self.fileSelectionPane, text='', **self.getItemStyle())
+        self.fileCountLabel.grid(row=9, column=0, columnspan=6, sticky=tk.W)
         # let it take up entire window
         self.fileSelectionPane.grid_columnconfigure(0, weight=1)
         self.fileSelectionPane.grid_columnconfigure(1, weight=3)
@@ -233,6 +280,24 @@ class BatchProcessorGUI (GUIComponent):
         self.pb = ttk.Progressbar(self.executionPane, orient="horizontal", length=portionOfScreenWidth,mode="determinate");
         self.pb.grid(row=2, column=0, sticky=tk.W + tk.E, columnspan=6)
 
+        # control of a run in progress
+        self.pauseButton = tk.Button(self.executionPane, text=Lang.get("Pause"), command=self.togglePause,
+                                     state='disabled', **self.getItemStyle())
+        self.pauseButton.grid(row=3, column=0, sticky=tk.W + tk.E)
+        self.cancelButton = tk.Button(self.executionPane, text=Lang.get("Cancel"), command=self.cancelProcessing,
+                                      state='disabled', **self.getItemStyle())
+        self.cancelButton.grid(row=3, column=1, sticky=tk.W)
+
+        # one row per worker
+        self.workerTable = ttk.Treeview(self.executionPane, columns=('state', 'file', 'elapsed', 'tasks'),
+                                        show='headings', height=4)
+        for column, heading, width in [('state', Lang.get('Worker'), 120), ('file', Lang.get('File'), 300),
+                                       ('elapsed', Lang.get('Running for'), 90), ('tasks', Lang.get('Tasks done'), 80)]:
+            self.workerTable.heading(column, text=heading)
+            self.workerTable.column(column, width=width, stretch=(column == 'file'))
+        self.workerTable.grid(row=4, column=0, columnspan=7, sticky=tk.W + tk.E)
+        self.workerStatus, self.workersPaused = {}, False
+
         #check output files
         #todo: implement
 
@@ -245,9 +310,9 @@ class BatchProcessorGUI (GUIComponent):
         self.simulateButton.grid(row=5, column=0, sticky= tk.W + tk.E)
 
         # run button
-        runButton = tk.Button(self.executionPane, text=Lang.get("Run"),
-                              command=self.backend.runProcessing, **self.getItemStyle())
-        runButton.grid(row=5, column=1, columnspan = 5, sticky= tk.W + tk.E);
+        self.runButton = tk.Button(self.executionPane, text=Lang.get("Run"),
+                              command=self.runProcessing, **self.getItemStyle())
+        self.runButton.grid(row=5, column=1, columnspan = 5, sticky= tk.W + tk.E);
 
         self.remainingTimeLabel = tk.Label(self.executionPane, **self.getItemStyle());
         self.remainingTimeLabel.grid(row=5, column=6, sticky= tk.W + tk.E);
@@ -256,6 +321,10 @@ class BatchProcessorGUI (GUIComponent):
                             command=self.saveProcessingLog, **self.getItemStyle())
         saveLog.grid(row=6, column=1, columnspan=5, sticky=tk.W + tk.E);
 
+        self.runPipelineButton = tk.Button(self.executionPane, text=Lang.get("Run Pipeline..."),
+                                           command=self.runPipeline, **self.getItemStyle())
+        self.runPipelineButton.grid(row=6, column=6, sticky=tk.W + tk.E);
+
         # write out output
         tk.Label(self.executionPane, text=Lang.get("Capture Output"), **self.getItemStyle()).grid(row=7,
                                                                                                          column=0,
@@ -273,13 +342,55 @@ class BatchProcessorGUI (GUIComponent):
                                                                                                   column=0,
                                                                                                   sticky=tk.W)
         self.checkFileSizeVar = tk.BooleanVar()
-        self.checkFilesizesButton = tk.Checkbutton(self.executionPane, text = Lang.get('Reprocess files if deviation exceeds 20%'), variable=self.checkFileSizeVar, **self.getItemStyle())
+        self.checkFilesizesButton = tk.Checkbutton(self.executionPane, text = Lang.get('Reprocess files considerably smaller than the others'), variable=self.checkFileSizeVar, **self.getItemStyle())
         self.checkFilesizesButton.grid(row = 8, column = 1, sticky = tk.W)
 
+        tk.Label(self.executionPane, text=Lang.get("Incremental Processing"), **self.getItemStyle()).grid(row=9,
+                                                                                                  column=0,
+                                                                                                  sticky=tk.W)
+        self.skipUpToDateFilesVar = tk.BooleanVar()
+        self.skipUpToDateFilesVar.set(True)
+        self.skipUpToDateFilesButton = tk.Checkbutton(self.executionPane, text = Lang.get('Skip files whose output is up to date'), variable=self.skipUpToDateFilesVar, **self.getItemStyle())
+        self.skipUpToDateFilesButton.grid(row = 9, column = 1, sticky = tk.W)
+
+        tk.Label(self.executionPane, text=Lang.get("Placeholders"), **self.getItemStyle()).grid(row=10,
+                                                                                                  column=0,
+                                                                                                  sticky=tk.W)
+        self.allowUndefinedPlaceholdersVar = tk.BooleanVar()
+        self.allowUndefinedPlaceholdersButton = tk.Checkbutton(self.executionPane, text = Lang.get('Keep undefined placeholders (syntax uses "<...>" literally)'), variable=self.allowUndefinedPlaceholdersVar, **self.getItemStyle())
+        self.allowUndefinedPlaceholdersButton.grid(row = 10, column = 1, sticky = tk.W)
+
         self.pad(self.executionPane)
         self.notebook.add(self.executionPane, text=Lang.get('Execution'))
 
 
+        # Log
+        # ------------------------------------------------------------------------------------------------------
+        self.logPane = tk.Frame(self.notebook)
+        self.logPane.configure(background='white')
+
+        # most recent records of the log, filtered by text and level
+        self.logList = VirtualFileList(self.logPane, **self.getItemStyle())
+        self.logList.grid(row=0, column=0, columnspan=4, sticky=tk.W + tk.E)
+        tk.Label(self.logPane, text=Lang.get('Filter'), **self.getItemStyle()).grid(row=1, column=0, sticky=tk.E)
+        self.logLevelNames = [Lang.get('All records'), Lang.get('Warnings and errors'), Lang.get('Errors')]
+        self.logLevel = tk.StringVar()
+        self.logLevel.set(self.logLevelNames[0])
+        ttk.Combobox(self.logPane, textvariable=self.logLevel, values=self.logLevelNames,
+                     state='readonly').grid(row=1, column=1, sticky=tk.W + tk.E)
+        self.logFilterText = tk.StringVar()
+        tk.Entry(self.logPane, textvariable=self.logFilterText).grid(row=1, column=2, sticky=tk.W + tk.E)
+        self.logLevel.trace('w', lambda *args: self.updateLogView())
+        self.logFilterText.trace('w', lambda *args: self.updateLogView())
+        self.logCountLabel = tk.Label(self.logPane, text='', **self.getItemStyle())
+        self.logCountLabel.grid(row=2, column=0, columnspan=4, sticky=tk.W)
+        self.logPane.grid_columnconfigure(2, weight=1)
+        self.lastLogRefreshTime = 0.0
+
+        self.pad(self.logPane)
+        self.notebook.add(self.logPane, text=Lang.get('Log'))
+
+
         # Save & Restore
         # ------------------------------------------------------------------------------------------------------
         self.saveRestorePane = tk.Frame(self.notebook)
@@ -310,57 +421,160 @@ class BatchProcessorGUI (GUIComponent):
         if tmpFiles:
             # set defaults
             self.setConf('defaultInputDir', os.path.dirname(tmpFiles[0]));
-            inputFiles = self.conf('inputFiles')
-            inputFiles += list(tmpFiles)
-            self.populateSelectedFileList()
+            self.addFiles(tmpFiles)
 
 
-    def populateSelectedFileList(self):
-        #clear list
-        self.selectedFilesList.delete(0, tk.END)
+    def getInputRegex(self):
+        """
+        :return: compiled input regex pattern; None if it is not valid or not used (accumulation)
+        """
+        if self.accumulateDataVar.get():
+            return None
+        try:
+            return re.compile(self.inputRegexPattern.get())
+        except re.error:
+            return None
 
-        for file in self.conf('inputFiles'):
-            self.selectedFilesList.insert(self.selectedFilesList.size(), file)
 
+    def updateFileFilterGroups(self):
+        """
+        Offers the capture groups of the input regex pattern for filtering
+        """
+        regex = self.getInputRegex()
+        groups = sorted(regex.groupindex, key=regex.groupindex.get) if regex is not None else []
+        self.fileFilterGroupBox.config(values=[Lang.get('Path')] + groups)
 
 
-    def removeSelectedFiles(self):
-        selected = self.selectedFilesList.curselection()
+    def getFileFilter(self):
+        """
+        :return: (text, input regex, capture group or None for the path); None if no filter is set
+        """
+        text = self.fileFilterText.get()
+        if text == '':
+            return None
+        regex = self.getInputRegex()
+        groupName = self.fileFilterGroup.get()
+        if regex is None or groupName not in regex.groupindex:
+            return text, None, None
+        return text, regex, groupName
+
+
+    def populateSelectedFileList(self):
+        """
+        Shows the selected files passing the filter; the list of input files may have been replaced (i.e. by loading
+        a configuration)
+        """
+        if self.fileSelection.files is not self.conf('inputFiles'):
+            self.fileSelection = FileSelection(self.conf('inputFiles'))
+        fileFilter = self.getFileFilter()
+        self.shownFiles = self.fileSelection.files if fileFilter is None else self.fileSelection.filter(*fileFilter)
+        regex = self.getInputRegex()
+        self.unmatchedFileNum = self.fileSelection.countUnmatched(regex) if regex is not None else 0
+        self.selectedFilesList.setRows(self.shownFiles, keepPosition=True)
+        self.updateFileCounts()
 
-        #remove from top to bottom to avoid wrong indices
-        selected = list(selected)
-        selected.sort()
-        selected = reversed(selected)
-        for index in selected:
-            self.conf('inputFiles').pop(index)
 
+    def addFiles(self, filePaths):
+        """
+        Adds files to the selection, skipping those selected already; only the files added are filtered
+        """
+        added = self.fileSelection.add(filePaths)
+        fileFilter = self.getFileFilter()
+        if fileFilter is not None:
+            self.shownFiles.extend(self.fileSelection.filter(*(fileFilter + (added, ))))
+        regex = self.getInputRegex()
+        if regex is not None:
+            self.unmatchedFileNum += self.fileSelection.countUnmatched(regex, added)
+        self.selectedFilesList.refresh()
+        self.updateFileCounts()
+
+
+    def updateFileCounts(self):
+        text = Lang.get('{} files, {} shown').format(len(self.fileSelection), len(self.shownFiles))
+        if self.unmatchedFileNum > 0:
+            text += Lang.get(', {} not matching the input regex pattern').format(self.unmatchedFileNum)
+        fileFilter = self.getFileFilter()
+        if fileFilter is not None and fileFilter[2] is not None:
+            valueNum = len(self.fileSelection.countGroupValues(fileFilter[1], fileFilter[2], self.shownFiles))
+            text += Lang.get(', {} distinct values of {}').format(valueNum, fileFilter[2])
+        self.fileCountLabel.config(text=text)
+
+
+    def removeSelectedFiles(self):
+        self.fileSelection.remove(self.selectedFilesList.getSelectedRows())
         self.populateSelectedFileList()
 
 
     def removeAllFiles(self):
-        self.setConf('inputFiles', [])
+        self.fileSelection.clear()
         self.populateSelectedFileList()
 
 
     def selectionToClipboard(self):
+        """
+        Copies the selected files; all files shown if none is selected
+        """
         self.parent.clipboard_clear()
-        fileList = os.linesep.join(self.conf('inputFiles'))
+        fileList = os.linesep.join(self.selectedFilesList.getSelectedRows() or self.shownFiles)
         self.parent.clipboard_append(fileList)
 
 
     def selectDir(self):
         """
-        Asks operator for directory and adds all files contained within to the current selections
-        :return:
+        Asks operator for directory and adds the files within (and within its subdirectories) which match the input
+        search pattern and the input regex pattern; files are added while the directory is still being searched
         """
         directory = tk.filedialog.askdirectory();
         if directory:
             # set defaults
             self.setConf('defaultInputDir', directory)
-            paths = [os.path.join(directory, fn) for fn in next(os.walk(directory))[2]]
-            inputFiles = self.conf('inputFiles')
-            inputFiles += paths
-            self.populateSelectedFileList()
+            try:
+                discovery = FileDiscovery(FileDiscovery.splitPatterns(self.inputSearchPattern.get()),
+                                          FileDiscovery.splitPatterns(self.conf('inputExcludePatterns')),
+                                          None if self.accumulateDataVar.get() else self.inputRegexPattern.get(),
+                                          self.conf('recursiveInputSearch') is not False)
+            except re.error as e:
+                self.err(Lang.get('Invalid input regex pattern: ') + str(e))
+                return
+            # the search runs in a thread of its own, so the window stays responsive on large network shares
+            foundFiles = queue.Queue()
+            thread = threading.Thread(target=self.discoverFiles, args=(discovery, directory, foundFiles))
+            thread.daemon = True
+            thread.start()
+            self.parent.after(self.pollingInterval, self.pollDiscoveredFiles, discovery, foundFiles)
+
+
+    @staticmethod
+    def discoverFiles(discovery, directory, foundFiles):
+        for filePath in discovery.iterate(directory):
+            foundFiles.put(filePath)
+        # end of the search
+        foundFiles.put(None)
+
+
+    def pollDiscoveredFiles(self, discovery, foundFiles):
+        """
+        Adds the files found so far to the selection
+        """
+        # the input files are used by the run in progress; files found meanwhile are added once it has finished
+        if self.processingThread is not None:
+            self.parent.after(self.pollingInterval, self.pollDiscoveredFiles, discovery, foundFiles)
+            return
+        paths, finished = [], False
+        while not(foundFiles.empty()):
+            filePath = foundFiles.get_nowait()
+            if filePath is None:
+                finished = True
+                break
+            paths.append(filePath)
+        if len(paths) > 0:
+            self.addFiles(paths)
+
+        if not(finished):
+            self.parent.after(self.pollingInterval, self.pollDiscoveredFiles, discovery, foundFiles)
+        elif len(discovery.errors) > 0:
+            self.warn(Lang.get('Some directories could not be read:') + os.linesep +
+                      os.linesep.join('{}: {}'.format(directory, error) for directory, error in discovery.errors))
 
 
     def selectOutDir(self):
@@ -464,6 +678,9 @@ class BatchProcessorGUI (GUIComponent):
         self.syntaxGenerationDirVar.set(self.conf('defaultSyntaxOutDir'))
         self.captureOutputDirVar.set(self.conf('defaultCaptureOutputOutDir'))
         self.checkFileSizeVar.set(self.conf('checkFileSizes'))
+        # configurations created by older versions do not have this setting
+        self.skipUpToDateFilesVar.set(self.conf('skipUpToDateFiles') is not False)
+        self.allowUndefinedPlaceholdersVar.set(self.conf('allowUndefinedPlaceholders') is True)
 
 
     def GUIToConfig(self):
@@ -479,7 +696,9 @@ class BatchProcessorGUI (GUIComponent):
         self.setConf('accumulateData', self.accumulateDataVar.get() == 1.0)
         self.setConf('defaultSyntaxOutDir', self.syntaxGenerationDirVar.get() )
         self.setConf('defaultCaptureOutputOutDir', self.captureOutputDirVar.get())
-        #self.setConf('checkFileSizes', self.checkFileSizeVar.get())
+        self.setConf('checkFileSizes', self.checkFileSizeVar.get())
+        self.setConf('skipUpToDateFiles', self.skipUpToDateFilesVar.get())
+        self.setConf('allowUndefinedPlaceholders', self.allowUndefinedPlaceholdersVar.get())
 
 
     def loadConfig(self):
@@ -495,7 +714,14 @@ class BatchProcessorGUI (GUIComponent):
 
 
     def loadConfigFromFile(self, filePath):
+        # the configuration is used by the run in progress
+        if self.processingThread is not None and self.processor is self.backend:
+            self.err(Lang.get('Configurations cannot be loaded while processing'))
+            return
         self.backend.config.loadFromFile(open(filePath, 'r'));
+        # check config file version
+        if self.backend.config.isFromNewerVersion():
+            self.err(Lang.get("The config file was created using a newer program version. Settings might be ignored and behavior may change. To avoid surprises, please updated the BatchProcessor."))
         # set defaults
         self.setConf('defaultConfigDir', os.path.dirname(filePath))
         self.updateConfigGUI();
@@ -525,41 +751,206 @@ class BatchProcessorGUI (GUIComponent):
 
     def saveProcessingLog(self):
         """
-        transfers events from log queue to main log instance, asks operator for file name and exports log
+        asks operator for file name and exports the log of the current (or last) run; the log is written to the output
+        directory while processing anyway (@see ExecutionLog)
         """
-        self.backend.transferLogQueue()
         fileName = tk.filedialog.asksaveasfilename(initialdir= self.conf('defaultOutDir'), title=Lang.get('Select Logfile'),  filetypes=[("Log files", "*.txt"), ("all files","*.*")])
 
-        if fileName is not None:
-            with open(fileName, "w") as logFile:
-                logFile.write(os.linesep.join(self.backend.executionLog))
-                logFile.close()
-                tk.messagebox.showinfo(Lang.get("Logfile saved"),
-                                       Lang.get("The Logfile has been saved at the specified destination"))
+        if fileName:
+            self.processor.saveExecutionLog(fileName)
+            tk.messagebox.showinfo(Lang.get("Logfile saved"),
+                                   Lang.get("The Logfile has been saved at the specified destination"))
 
-    @classmethod
-    def handleExecutionError(self, exception, taskQueue, debuggingResultQueue, errorQueue):
+
+    def updateLogView(self):
+        """
+        Shows the most recent records of the log passing the filter, one line each
+        """
+        minLevel = ExecutionLog.levels[self.logLevelNames.index(self.logLevel.get())]
+        records = self.processor.tailLog(self.logViewSize, self.logFilterText.get(), minLevel)
+        # the view follows the log unless scrolled back
+        following = self.logList.first + self.logList.visibleRows >= len(self.logList.rows)
+        self.logList.setRows([ExecutionLog.formatRecord(record, False) for record in records], keepPosition=True)
+        if following:
+            self.logList.scrollBy(len(records))
+        self.logCountLabel.config(text=Lang.get('{} most recent records shown').format(len(records)))
+        self.lastLogRefreshTime = time.time()
+
+    # Processing
+    # ----------------------------------------------------------------------------------------------------------------
+    def runProcessing(self):
+        """
+        Starts processing the configuration shown
+        @see startProcessing
+        """
+        self.startProcessing(self.backend)
+
+
+    def runPipeline(self):
+        """
+        Runs a pipeline definition chaining several saved configurations (@see Pipeline); the configuration shown is
+        not involved
+        """
+        filePath = tk.filedialog.askopenfilename(filetypes=[('JSON files', '*.json')],
+                                                 initialdir=self.conf('defaultConfigDir'))
+        if not(filePath):
+            return
+        pipeline = Pipeline(gui=self, workerPool=self.backend.workerPool)
+        try:
+            pipeline.loadFromFile(filePath)
+        except (IOError, ValueError, KeyError) as e:
+            self.err(Lang.get('Unable to load configuration file: ') + str(e))
+            return
+        self.startProcessing(pipeline)
+
+
+    def startProcessing(self, processor):
+        """
+        Runs the processor in a thread of its own (@see ProcessingThread); it reports back through a channel which is
+        consumed from within tkinter's main loop
+        @see pollProcessing
+        :param processor: BatchProcessor or Pipeline
+        """
+        # the settings are taken from the widgets here, as only this thread may use tkinter
+        self.GUIToConfig()
+        self.processor = processor
+        self.channel = FrontendChannel()
+        processor.gui = self.channel
+        self.processingThread = ProcessingThread(processor, self.channel)
+        self.setProcessingState(True)
+        self.processingThread.start()
+        self.parent.after(self.pollingInterval, self.pollProcessing)
+
+
+    def pollProcessing(self):
+        """
+        Carries out the calls the processor made to its frontend since the last poll
+        """
+        for method, args in self.channel.receive():
+            getattr(self, method)(*args)
+        if self.processingThread is not None:
+            # elapsed times go on without news from the processor
+            self.updateWorkerTable()
+            if time.time() - self.lastLogRefreshTime >= self.logRefreshInterval / 1000.0:
+                self.updateLogView()
+            self.parent.after(self.pollingInterval, self.pollProcessing)
+
+
+    def processingFinished(self):
+        self.processor.gui = self
+        self.processingThread = None
+        self.workerStatus = {}
+        self.updateWorkerTable()
+        self.updateLogView()
+        self.setProcessingState(False)
+
+
+    def setProcessingState(self, running):
+        """
+        Enables either the buttons starting a run or those controlling it; the input files cannot be changed while
+        they are being processed
+        """
+        self.runButton.config(state='disabled' if running else 'normal')
+        self.runPipelineButton.config(state='disabled' if running else 'normal')
+        for button in (self.selectFilesButton, self.selectFilesDirectoryButton, self.removeFilesButton,
+                       self.removeAllFilesButton):
+            button.config(state='disabled' if running else 'normal')
+        self.pauseButton.config(state='normal' if running else 'disabled', text=Lang.get('Pause'))
+        self.cancelButton.config(state='normal' if running else 'disabled')
+
+
+    def togglePause(self):
+        """
+        While paused, workers complete their current task but do not take any further one
+        """
+        if self.processingThread is None:
+            return
+        if self.pauseButton.cget('text') == Lang.get('Pause'):
+            self.processingThread.pause()
+            self.pauseButton.config(text=Lang.get('Resume'))
+        else:
+            self.processingThread.resume()
+            self.pauseButton.config(text=Lang.get('Pause'))
+
+
+    def cancelProcessing(self):
+        if self.processingThread is None:
+            return
+        if tk.messagebox.askyesno(Lang.get('Cancel'), Lang.get('Cancel processing? Tasks being processed are aborted; completed files are kept.')):
+            self.processingThread.cancel()
+            self.cancelButton.config(state='disabled')
+            self.pauseButton.config(state='disabled')
+
+
+    def showWorkerStatus(self, workerStatus, paused):
+        """
+        :param workerStatus: @see BatchProcessor.getWorkerStatus
+        :param paused: True if the workers do not take any further task
+        """
+        self.workerStatus, self.workersPaused = workerStatus, paused
+        self.updateWorkerTable()
+
+
+    def updateWorkerTable(self):
+        now = time.time()
+        for workerId in self.workerTable.get_children():
+            if int(workerId) not in self.workerStatus:
+                self.workerTable.delete(workerId)
+        for workerId, status in sorted(self.workerStatus.items()):
+            if status['inputFile'] is None:
+                values = (Lang.get('Worker {}: paused') if self.workersPaused else Lang.get('Worker {}: idle')).format(
+                    workerId), '', '', status['completedTasks']
+            else:
+                fileName = os.path.basename(status['inputFile'])
+                if status['taskNum'] > 1:
+                    fileName += ' ' + Lang.get('(and {} more)').format(status['taskNum'] - 1)
+                values = (Lang.get('Worker {}: busy').format(workerId), fileName,
+                          '{:.0f} s'.format(now - status['startTime']), status['completedTasks'])
+            if self.workerTable.exists(str(workerId)):
+                self.workerTable.item(str(workerId), values=values)
+            else:
+                self.workerTable.insert('', tk.END, iid=str(workerId), values=values)
+
+
+    # Feedback from backend
+    # ----------------------------------------------------------------------------------------------------------------
+    def showProgress(self, processedFiles, totalFiles, remainingTime):
+        """
+        Advances progress bar and updates estimated remaining time
+        :param remainingTime: (estimate, lower bound, upper bound) in seconds; None if not known yet
+        """
+        self.pb['value'] = processedFiles / float(totalFiles) * 100.0 if totalFiles > 0 else 100.0
+        if remainingTime is None:
+            self.remainingTimeLabel.config(text=Lang.get('Remaining time: estimating...'))
+        else:
+            self.remainingTimeLabel.config(text=Lang.get('Remaining time: %.1f seconds (%.1f to %.1f) ') % remainingTime);
+
+
+    def resetProgress(self):
+        self.pb['value'] = 0
+
+
+    def showInfo(self, title, msg):
+        tk.messagebox.showinfo(title, msg)
+
+
+    def showDebuggingInformation(self, debuggingInfo):
         """
-        Inquires whether operators would like to continue or to skip all remaining files
-        :param taskQueue:
-        :param debuggingResultQueue:
-        :param errorQueue:
+        Spawns new window, allows to inspect parameters and generated code for a single file
+        :param debuggingInfo: dictionary with keys 'placeholders' and 'commands'
         :return:
         """
-        spssExecutionError = ''
-        # CalledProcessError features the program's output in 'output'
-        if hasattr(exception, 'output'):
-            spssExecutionError = str(exception.output)
-        errMsg =    Lang.get('The following error occured, please check the log for details' + \
-        '\n Would you like to continue with the next file (Yes) or cancel processing (No) for all remaining files?')
-        print(spssExecutionError + '\n' + str(exception))
-
-        wantsToContinue = tk.messagebox.askyesno(Lang.get("Error occured, execution halted"),
-                            errMsg)
-        if not(wantsToContinue):
-            # clear the queue
-            while not taskQueue.empty():
-                taskQueue.get_nowait()  # as docs say: Remove and return an item from the queue.
-            print(Lang.get('Execution of remaining files has been aborted as by user\'s choice.'))
+        t = tk.Toplevel(self.parent)
+        t.wm_title(Lang.get("Debugging information"))
+
+        #organize placeholders and resulting source code into panes
+        n = ttk.Notebook(t)
+
+        n.add(self.createFrameWithText(n, debuggingInfo['placeholders']), text=Lang.get('Placeholders'))
+        n.add(self.createFrameWithText(n, debuggingInfo['commands']), text=Lang.get('Sourcecode'))
+        n.pack(expand=1, fill="both")
+
+        # propagate changes to GUI
+        self.parent.update();
 
 
@@ -1,5 +1,4 @@
 import json
-from Lang import Lang
 
 class Configuration:
     currentVersion = 0.8;
@@ -7,9 +6,22 @@ class Configuration:
            'placeholders': '', 'spssFile': '', 'defaultConfigDir': '', 'defaultSPSSDir': '', 'defaultInputDir': '',
            'defaultOutDir': '', 'programVersion': currentVersion, 'simulateProcessing': False,
            'inputFiles' : [], 'accumulateData' : False, 'accumulationFilePattern' : '', 'defaultSyntaxOutDir' : '',
-           'defaultCaptureOutputOutDir' : '', 'checkFileSizes' : False};
+           'defaultCaptureOutputOutDir' : '', 'checkFileSizes' : False, 'workerCount' : 0,
+           'engine' : 'spss', 'skipUpToDateFiles' : True,
+           'accumulationBatchSize' : 50, 'filesPerInvocation' : 1,
+           'filesPerSession' : 100, 'sessionFileTimeout' : 3600, 'syntaxDelivery' : 'stdin', 'scratchDir' : '', 'keepScratchFiles' : False,
+           'allowUndefinedPlaceholders' : False, 'taskTimeout' : 0, 'maxRetries' : 1, 'retryBackoff' : 5.0,
+           'recordTaskMetrics' : True, 'inputExcludePatterns' : '', 'recursiveInputSearch' : True,
+           'logMaxBytes' : 10485760, 'logBackupCount' : 5, 'compressLog' : True,
+           'captureFilePattern' : '<fileName>.log', 'compressCapturedOutput' : False};
     reservedPlaceholders = opt.keys();
 
+    """
+    Placeholders determined by the BatchProcessor itself; capture groups of the inputRegexPattern must not redefine those.
+    "fileName" is provided as well (the input file name), but may be refined by a capture group of the same name.
+    """
+    predefinedPlaceholders = ['INFILE', 'INPUTDIR', 'OUTPUTFILE', 'OUTPUTDIR']
+
     """
     Filters files by the given pattern; is offered as a pattern when manually selecting files
     Example: *_averagedTrials.txt   will only show files ending with "_averagedTrials.txt"
@@ -19,6 +31,14 @@ class Configuration:
     """
     opt['inputSearchPattern'] = '.txt';
 
+    """
+    Globs (separated by ";") of files and directories skipped when adding a directory, i.e. "*.bak;archive". Adding a 
+    directory searches its subdirectories as well unless recursiveInputSearch is disabled; only files matching the 
+    inputSearchPattern and the inputRegexPattern are added. 
+    """
+    opt['inputExcludePatterns'] = ''
+    opt['recursiveInputSearch'] = True
+
     """
     Decomposes input file names into their  components, which can then be reused for the output files
     Example: (?P<fileName>[\w])*.txt                             parses files like "subject123_abc.txt" and assigns 
@@ -76,25 +96,28 @@ class Configuration:
 
     """
     Data accumulation is a special function which merges the cases of all selected files into one target file
-    By default, this special function is disabled. Enabling it enforces execution of 
-    @see accumulationFileTemplate
+    By default, this special function is disabled. Enabling it replaces the selected SPSS file by generated merging 
+    syntax (ADD FILES). The cases of the very last input file come first, followed by those of all other files in the 
+    given order.
     """
     opt['accumulateData'] = False
 
 
     """
-    Pattern used to accumulate files; overwrites any value specified by the user
-    For accumulation, there is no need to extract information from the file name; therefore a standard pattern
-    is indeed sufficient.
+    Pattern formerly used to accumulate files; accumulation does not need to extract information from the file name 
+    anymore. Kept for compatibility with existing configuration files.
     """
     opt['accumulationFilePattern'] = '(?P<fileName>[\w]*).sav'
 
+    """
+    Number of files merged by a single task during accumulation (at most 50, the limit of ADD FILES). If there are more
+    input files, batches are merged in parallel into partial files, which are then merged in turn.
+    """
+    opt['accumulationBatchSize'] = 50
+
 
     """
-    The very last file from the input files is selected, copied into the destination directory and renamed 
-    as defined in the following. Please note that the syntax in
-    @accumulationFileTemplate
-    has to be adapted whenever this value is changed. 
+    Name of the accumulation file within the output directory, unless an output file pattern is given 
     """
     accumulationFileName ='accumulate.sav'
 
@@ -107,21 +130,112 @@ class Configuration:
 
     """
     Defines the directory to use for writing out the output of SPSS
-    If not 'none' but a directory, for each input file "fileName.ext", a corresponding syntax file "fileName.log" 
-    will be generated
+    If not 'none' but a directory, the output (stdout and stderr) of the engine for each input file is streamed into a 
+    capture file named by captureFilePattern, which may use the same placeholders as the outputFilePattern ("fileName.log" by
+    default). compressCapturedOutput gzip compresses the captures (".gz" is appended). Errors and warnings within the
+    captures are listed by .batchProcessorCaptureIndex.jsonl within the directory.
     """
     opt['defaultCaptureOutputOutDir'] = 'none'
+    opt['captureFilePattern'] = '<fileName>.log'
+    opt['compressCapturedOutput'] = False
 
     """
-    Checks file sizes of output files and redoes those whose filesize deviates by more than 20% (to the bottom) of the file size average. 
+    Checks the size of each output file as soon as it has been written and reprocesses files which are considerably
+    smaller than the other output files of the same directory and extension (robust outlier test, @see
+    OutputSizeValidator). Files which turn out identical when reprocessed are accepted.
     """
     opt['checkFileSizes'] = False
 
+    """
+    Number of worker processes which process files in parallel. 0 uses the value from the user state; if that is 0 as 
+    well, one worker per CPU core is started. 
+    Please note that accumulation is always carried out by one worker at a time. 
+    """
+    opt['workerCount'] = 0
+
+    """
+    Statistics engine executing the syntax: 'spss' (SPSS Python API), 'pspp' (command line; one pspp process per 
+    engine invocation) or 'pspp-session' (one long-lived pspp process per worker which is fed syntax via stdin)
+    """
+    opt['engine'] = 'spss'
+
+    """
+    Number of files after which the pspp process of a worker is restarted (engine 'pspp-session' only); caps the 
+    memory used by long sessions
+    """
+    opt['filesPerSession'] = 100
+
+    """
+    Seconds the pspp session of a worker may take for a single file (engine 'pspp-session' only). Syntax which never 
+    completes (i.e. an unterminated BEGIN DATA) would block the session otherwise; the session is killed, the file 
+    fails and the next file starts a new session. 0 disables the timeout. 
+    """
+    opt['sessionFileTimeout'] = 3600
+
+    """
+    How the syntax is passed to pspp (engine 'pspp' only): 'stdin' passes it via stdin without touching the disk, 
+    'file' writes it to a temporary file within scratchDir first. 
+    """
+    opt['syntaxDelivery'] = 'stdin'
+
+    """
+    Directory for temporary syntax files, preferably on fast local storage (i.e. tmpfs); empty uses the system's 
+    temporary directory
+    """
+    opt['scratchDir'] = ''
 
     """
-    Template for merging/accumulating data files
+    Keeps temporary syntax files instead of removing them once pspp is done (for debugging)
     """
-    accumulationFileTemplate = 'Z:/Mitarbeiter/lukas_christian/SPSS-Auswertung/workflow/Schritt_2_Zusammenfügen_der_SavDateien.sps'
+    opt['keepScratchFiles'] = False
+
+    """
+    Seconds a task may take before its worker (including the statistics engine) is killed and replaced; the task is 
+    treated as failed. 0 disables the timeout. 
+    """
+    opt['taskTimeout'] = 0
+
+    """
+    Runs the syntax even if it contains placeholders which are not defined for some files; those are kept as they are.
+    Only needed if the syntax uses "<...>" literally; otherwise, undefined placeholders fail the preflight check. 
+    """
+    opt['allowUndefinedPlaceholders'] = False
+
+    """
+    Number of times a failed task is queued again before it is reported as failed. Retries are delayed by 
+    retryBackoff seconds, doubling with every further attempt. 
+    """
+    opt['maxRetries'] = 1
+    opt['retryBackoff'] = 5.0
+
+    """
+    Skips files whose output is up to date, i.e. has been produced from the very same input file, syntax and 
+    placeholders before. Those are recorded in a manifest within the output directory; this allows to add files to 
+    a configuration and to resume interrupted runs without reprocessing everything.
+    """
+    opt['skipUpToDateFiles'] = True
+
+    """
+    Number of files whose syntax is executed by a single invocation of the statistics engine. For many small files, 
+    starting the engine dominates the runtime; packing several files into one script avoids that. Each file starts 
+    with an empty dataset (NEW FILE); output and errors are still attributed to the single files. 
+    """
+    opt['filesPerInvocation'] = 1
+
+    """
+    Records timing, CPU time and memory usage of every task as JSON lines within the output directory 
+    (.batchProcessorMetrics.jsonl); a summary is added to the log at the end of each run. 
+    """
+    opt['recordTaskMetrics'] = True
+
+    """
+    The execution log is written to .batchProcessorLog.jsonl within the output directory while processing goes on.
+    Once it exceeds logMaxBytes, it is rotated; logBackupCount previous files are kept, gzip compressed if compressLog
+    is set. 
+    """
+    opt['logMaxBytes'] = 10485760
+    opt['logBackupCount'] = 5
+    opt['compressLog'] = True
 
     def getCurrentVersion(self):
         return self.currentVersion;
@@ -131,14 +245,24 @@ class Configuration:
 
     def loadFromFile(self, f):
         self.opt = json.load(f);
-        # check config file version
-        if (self.opt['programVersion'] > self.getCurrentVersion()):
-            BatchProcessor.err(Lang.get("The config file was created using a newer program version. Settings might be ignored and behavior may change. To avoid surprises, please updated the BatchProcessor."))
+
+    def isFromNewerVersion(self):
+        """
+        Config files created using a newer program version may contain settings which are ignored by this version
+        """
+        return self.opt['programVersion'] > self.getCurrentVersion()
 
     def toJSON(self):
         return json.dumps(self.opt, default=lambda o: o.__dict__,
                           sort_keys=True, indent=4)
 
+    def toRunSettingsJSON(self):
+        """
+        Compact JSON of all settings except the list of input files; sent to each worker once per run
+        """
+        opt = dict((key, value) for key, value in self.opt.items() if key != 'inputFiles')
+        return json.dumps(opt, default=lambda o: o.__dict__, sort_keys=True, separators=(',', ':'))
+
     def ObjToJSON(self, obj):
         return json.dumps(obj, default=lambda o: o.__dict__,
                           sort_keys=True, indent=4)
@@ -0,0 +1,77 @@
+import os
+import sys
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows; usage of the engine is not measured there
+    resource = None
+
+class EngineUsage:
+    """
+    CPU time and peak memory (resident set size) used by the statistics engine while processing one task (or one batch
+    of tasks). Depending on the engine and platform, the figures come from the engine's child process (os.wait4), from
+    /proc (long-lived pspp sessions) or from the worker process itself (SPSS runs within the worker). Figures which
+    cannot be measured are None.
+    """
+
+    def __init__(self):
+        # seconds (user and system); bytes
+        self.cpuTime = None
+        self.peakRss = None
+
+
+    def add(self, cpuTime, peakRss):
+        """
+        Adds the usage of one more engine invocation: CPU times are summed up, the peak is the largest one
+        """
+        if cpuTime is not None:
+            self.cpuTime = (self.cpuTime or 0.0) + cpuTime
+        if peakRss is not None:
+            self.peakRss = max(self.peakRss or 0, peakRss)
+
+
+    def toDict(self):
+        return {'engineCpuTime': self.cpuTime, 'enginePeakRss': self.peakRss}
+
+
+    @staticmethod
+    def fromRusage(usage):
+        """
+        :param usage: resource.struct_rusage, i.e. as returned by os.wait4
+        :return: (CPU time in seconds, peak RSS in bytes)
+        """
+        # ru_maxrss is reported in kilobytes, except on macOS
+        rssUnit = 1 if sys.platform == 'darwin' else 1024
+        return usage.ru_utime + usage.ru_stime, usage.ru_maxrss * rssUnit
+
+
+    @classmethod
+    def ofCurrentProcess(cls):
+        """
+        :return: (CPU time, peak RSS) of the calling process so far; (None, None) if not available
+        """
+        if resource is None:
+            return None, None
+        return cls.fromRusage(resource.getrusage(resource.RUSAGE_SELF))
+
+
+    @staticmethod
+    def ofProcess(pid):
+        """
+        Usage of a running child process, read from /proc (Linux only)
+        :return: (CPU time so far, peak RSS so far); (None, None) if not available
+        """
+        try:
+            with open('/proc/{}/stat'.format(pid), 'r') as f:
+                # the command name in parentheses may contain spaces; utime and stime follow as fields 14 and 15
+                fields = f.read().rsplit(')', 1)[1].split()
+            cpuTime = (int(fields[11]) + int(fields[12])) / float(os.sysconf('SC_CLK_TCK'))
+            peakRss = None
+            with open('/proc/{}/status'.format(pid), 'r') as f:
+                for line in f:
+                    if line.startswith('VmHWM:'):
+                        peakRss = int(line.split()[1]) * 1024
+            return cpuTime, peakRss
+        except (OSError, IndexError, ValueError, AttributeError):
+            return None, None
@@ -0,0 +1,314 @@
+import collections
+import datetime
+import gzip
+import io
+import json
+import os
+import shutil
+import threading
+import time
+
+class ExecutionLog:
+    """
+    Log of a run: structured records (time, level, message, the input file and worker concerned, further details such
+    as the engine's output) are appended to a JSON lines file within the output directory as soon as they are
+    reported, so nothing is lost if the frontend crashes and memory does not grow with the length of the run.
+    Once the file exceeds maxBytes, it is rotated: previous files are kept as ".1", ".2", ... (gzip compressed unless
+    disabled), up to backupCount of them.
+
+    Only the most recent records are kept in memory, for the log views of the frontends (@see tail); the whole log of
+    a run is read back from the files when it is exported (@see export). Records are written through a buffer which is
+    flushed every flushInterval seconds and for every warning or error.
+    """
+
+    fileName = '.batchProcessorLog.jsonl'
+
+    """
+    Levels of the records, in increasing severity
+    """
+    levels = ['info', 'warning', 'error']
+
+    """
+    Number of records kept in memory
+    """
+    tailSize = 2000
+
+    flushInterval = 1.0
+
+    """
+    File path => {'file', 'size', 'users'} of the files being written; steps of a Pipeline may log into the same output
+    directory. Files are only written while holding fileLock, as the log may be exported by another thread.
+    """
+    openFiles = {}
+    fileLock = threading.RLock()
+
+    def __init__(self, filePath = None, runStartTime = 0.0, maxBytes = 10 * 2**20, backupCount = 5, compress = True):
+        """
+        :param filePath: JSON lines file the records are appended to; None only keeps the most recent ones in memory
+        :param runStartTime: part of every record; tells the runs within the file apart
+        :param maxBytes: size beyond which the file is rotated; 0 never rotates it
+        :param backupCount: number of rotated files kept
+        :param compress: compress rotated files
+        raises IOError if the file cannot be opened
+        """
+        self.filePath = filePath
+        self.runStartTime = runStartTime
+        self.maxBytes = maxBytes
+        self.backupCount = backupCount
+        self.compress = compress
+        self.records = collections.deque(maxlen=self.tailSize)
+        # guards records, which are read by the frontend's thread @see tail
+        self.recordLock = threading.Lock()
+        self.lastFlushTime = time.time()
+        self.shared = None
+        if filePath is not None:
+            with self.fileLock:
+                shared = self.openFiles.get(filePath)
+                if shared is None:
+                    shared = {'file': io.open(filePath, 'ab'), 'users': 0}
+                    shared['size'] = shared['file'].tell()
+                    self.openFiles[filePath] = shared
+                shared['users'] += 1
+                self.shared = shared
+
+
+    @classmethod
+    def fromConfiguration(cls, config, runStartTime):
+        """
+        Uses the output directory and logMaxBytes, logBackupCount and compressLog of the configuration; the log is only
+        kept in memory when simulating or if the output directory does not exist
+        raises IOError if the file cannot be opened
+        """
+        opt = config.opt
+        filePath = None
+        if not(opt['simulateProcessing']) and os.path.isdir(opt['outputDir']):
+            filePath = os.path.join(opt['outputDir'], cls.fileName)
+        return cls(filePath, runStartTime, int(opt.get('logMaxBytes', 10 * 2**20)), int(opt.get('logBackupCount', 5)),
+                   opt.get('compressLog', True))
+
+
+    def append(self, message, level = 'info', inputFile = None, **fields):
+        """
+        :param level: @see levels
+        :param fields: further information, i.e. 'details' (output of the engine, traceback)
+        """
+        self.write(dict(fields, time=time.time(), level=level, message=message, inputFile=inputFile))
+
+
+    def write(self, record):
+        """
+        :param record: dictionary with at least 'time', 'level' and 'message' (i.e. as reported by a worker)
+        """
+        record['runStartTime'] = self.runStartTime
+        with self.recordLock:
+            self.records.append(record)
+        if self.shared is None:
+            return
+        line = (json.dumps(record, sort_keys=True) + '\n').encode('utf-8')
+        with self.fileLock:
+            self.shared['file'].write(line)
+            self.shared['size'] += len(line)
+            if self.maxBytes > 0 and self.shared['size'] >= self.maxBytes:
+                self.rotate()
+            elif record['level'] != 'info' or time.time() - self.lastFlushTime >= self.flushInterval:
+                self.flush()
+
+
+    def flush(self):
+        with self.fileLock:
+            if self.shared is not None:
+                self.shared['file'].flush()
+        self.lastFlushTime = time.time()
+
+
+    def close(self):
+        """
+        Closes the file; the most recent records remain available @see tail
+        """
+        with self.fileLock:
+            if self.shared is None:
+                return
+            self.shared['users'] -= 1
+            if self.shared['users'] == 0:
+                self.shared['file'].close()
+                del self.openFiles[self.filePath]
+            else:
+                self.shared['file'].flush()
+            self.shared = None
+
+
+    def rotate(self):
+        """
+        Moves the file to ".1" (and the previous ones one further) and starts a new one; the file is shared by all logs
+        writing to the same path
+        """
+        with self.fileLock:
+            self.shared['file'].close()
+            for index in range(self.backupCount, 0, -1):
+                for suffix in ('', '.gz'):
+                    backupPath = '{}.{}{}'.format(self.filePath, index, suffix)
+                    if not(os.path.isfile(backupPath)):
+                        continue
+                    if index == self.backupCount:
+                        os.remove(backupPath)
+                    else:
+                        os.replace(backupPath, '{}.{}{}'.format(self.filePath, index + 1, suffix))
+            if self.backupCount > 0 and self.compress:
+                with io.open(self.filePath, 'rb') as source, gzip.open(self.filePath + '.1.gz', 'wb') as target:
+                    shutil.copyfileobj(source, target)
+                os.remove(self.filePath)
+            elif self.backupCount > 0:
+                os.replace(self.filePath, self.filePath + '.1')
+            self.shared['file'] = io.open(self.filePath, 'wb')
+            self.shared['size'] = 0
+        self.lastFlushTime = time.time()
+
+
+    def tail(self, recordNum = None, filterText = '', minLevel = 'info'):
+        """
+        May be called by any thread
+        :param recordNum: maximum number of records; None returns all records kept in memory
+        :return: list of the most recent records passing the filter (@see matches), oldest first
+        """
+        with self.recordLock:
+            records = list(self.records)
+        if filterText or minLevel != 'info':
+            records = [record for record in records if self.matches(record, filterText, minLevel)]
+        return records if recordNum is None else records[-recordNum:]
+
+
+    def export(self, f):
+        """
+        Writes all records of the run in human readable form (@see formatRecord); those within the files if there
+        are any, the most recent ones otherwise
+        :param f: file opened for writing text
+        """
+        self.flush()
+        if self.filePath is None:
+            records = self.tail()
+        else:
+            records = (record for filePath in self.getLogFiles(self.filePath) for record in self.readRecords(filePath)
+                       if record.get('runStartTime') == self.runStartTime)
+        for record in records:
+            f.write(self.formatRecord(record) + '\n')
+
+
+    @classmethod
+    def matches(cls, record, filterText = '', minLevel = 'info'):
+        """
+        :param filterText: text the message or the input file has to contain; case insensitive
+        :param minLevel: least severe level shown
+        """
+        if cls.levels.index(record.get('level', 'info')) < cls.levels.index(minLevel):
+            return False
+        if not(filterText):
+            return True
+        filterText = filterText.lower()
+        return filterText in record['message'].lower() or filterText in (record.get('inputFile') or '').lower()
+
+
+    @staticmethod
+    def formatRecord(record, details = True):
+        """
+        :param details: append further lines of the message and the details (i.e. the engine's output), indented; only
+        the first line of the message otherwise
+        """
+        lines = record['message'].splitlines() or ['']
+        text = '{} {:<7} {}'.format(datetime.datetime.fromtimestamp(record['time']).strftime('%Y-%m-%d %H:%M:%S'),
+                                    record['level'].upper(), lines[0])
+        if record.get('workerId') is not None:
+            text += ' [{}]'.format(record['workerId'])
+        if details:
+            lines += (record.get('details') or '').splitlines()
+            text += ''.join('\n    ' + line.strip('\r') for line in lines[1:])
+        return text
+
+
+    # Reading the files
+    # ----------------------------------------------------------------------------------------------------------------
+    @classmethod
+    def getLogFiles(cls, filePath):
+        """
+        :return: the file and its rotated files which exist, oldest first
+        """
+        backupPaths = []
+        index = 1
+        while True:
+            backupPath = next((path for path in ('{}.{}'.format(filePath, index), '{}.{}.gz'.format(filePath, index))
+                               if os.path.isfile(path)), None)
+            if backupPath is None:
+                break
+            backupPaths.append(backupPath)
+            index += 1
+        return list(reversed(backupPaths)) + ([filePath] if os.path.isfile(filePath) else [])
+
+
+    @staticmethod
+    def parseRecord(line):
+        """
+        :return: None if the line is not a record (i.e. written partially when the process was killed)
+        """
+        try:
+            record = json.loads(line.decode('utf-8') if isinstance(line, bytes) else line)
+        except ValueError:
+            return None
+        return record if isinstance(record, dict) and 'message' in record else None
+
+
+    @classmethod
+    def readRecords(cls, filePath):
+        """
+        Generator of the records of a single file, oldest first
+        """
+        opener = gzip.open if filePath.endswith('.gz') else io.open
+        try:
+            with opener(filePath, 'rb') as f:
+                for line in f:
+                    record = cls.parseRecord(line)
+                    if record is not None:
+                        yield record
+        except (IOError, OSError, EOFError):
+            # rotated away while being read, or compressed partially
+            return
+
+
+    @staticmethod
+    def iterateLinesBackwards(filePath, blockSize = 2**16):
+        """
+        Generator of the lines of a plain file, newest first; only reads as much of the file as is consumed
+        """
+        with io.open(filePath, 'rb') as f:
+            position = f.seek(0, os.SEEK_END)
+            remainder = b''
+            while position > 0:
+                readSize = min(blockSize, position)
+                position -= readSize
+                f.seek(position)
+                lines = (f.read(readSize) + remainder).split(b'\n')
+                remainder = lines.pop(0)
+                for line in reversed(lines):
+                    yield line
+            yield remainder
+
+
+    @classmethod
+    def readTail(cls, filePath, recordNum, filterText = '', minLevel = 'info'):
+        """
+        Reads the most recent records passing the filter from the files; the file is read from its end, rotated files
+        are only read if it does not hold enough records
+        :return: list of the records, oldest first
+        """
+        records = []
+        if recordNum <= 0:
+            return records
+        for logFile in reversed(cls.getLogFiles(filePath)):
+            if logFile.endswith('.gz'):
+                lines = reversed(list(cls.readRecords(logFile)))
+            else:
+                lines = (cls.parseRecord(line) for line in cls.iterateLinesBackwards(logFile) if line.strip())
+            for record in lines:
+                if record is not None and cls.matches(record, filterText, minLevel):
+                    records.append(record)
+                    if len(records) >= recordNum:
+                        return list(reversed(records))
+        return list(reversed(records))
@@ -0,0 +1,201 @@
+import collections
+import fnmatch
+import os
+import re
+import threading
+import time
+
+class FileDiscovery:
+    """
+    Finds input files within directories: walks them (optionally recursively) with os.scandir, which obtains the type
+    of each entry along with its name, so no further system call is needed per file. Files are selected by include
+    globs (i.e. the inputSearchPattern), exclude globs and the inputRegexPattern, all of which are matched against the
+    file name (exclude globs also against the path relative to the directory searched, and prune directories).
+    Matches are yielded as soon as they are found, so callers may show the first results while a large share is still
+    being scanned.
+
+    Directory listings are cached by the modification time of the directory, which changes whenever entries are added,
+    removed or renamed: rescanning a tree which has not changed only needs to stat each directory. The cache is shared
+    by all instances (the GUI creates one per search) and holds at most maxCachedEntries entries; the listings used least
+    recently are dropped first.
+    """
+
+    """
+    Directory => (modification time in ns, list of (name, is directory) in the order listed by the file system), least
+    recently used first; shared by all instances
+    """
+    listingCache = collections.OrderedDict()
+
+    """
+    Total number of entries of the cached listings
+    """
+    cachedEntryNum = 0
+
+    """
+    Maximum number of entries of all cached listings together
+    """
+    maxCachedEntries = 1000000
+
+    """
+    Guards listingCache and cachedEntryNum; searches may run in several threads at once
+    """
+    cacheLock = threading.Lock()
+
+    """
+    Listings of directories modified less than this many seconds ago are not cached: file systems (i.e. network
+    shares) may keep the modification time at a coarse granularity, so a change within the same tick would go unnoticed
+    """
+    minCacheAge = 2.0
+
+    def __init__(self, includePatterns = None, excludePatterns = None, regexPattern = None, recursive = True):
+        """
+        :param includePatterns: globs of the files to find; a pattern without wildcards is taken as the end of the file
+        name (i.e. ".txt"). None or empty finds all files.
+        :param excludePatterns: globs of files and directories to skip
+        :param regexPattern: regular expression the file name has to match (from its start, as the inputRegexPattern)
+        :param recursive: False only searches the top level of the directories
+        raises re.error if regexPattern is not a valid regular expression
+        """
+        # globs are combined into a single regular expression each; names are compared case insensitively where the
+        # file system does so (as fnmatch)
+        flags = re.IGNORECASE if os.path.normcase('A') == 'a' else 0
+        self.includeRegex = self.compileGlobs([self.normalisePattern(pattern) for pattern in includePatterns or []
+                                               if pattern], flags)
+        self.excludeRegex = self.compileGlobs([pattern for pattern in excludePatterns or [] if pattern], flags)
+        self.regex = re.compile(regexPattern) if regexPattern else None
+        self.recursive = recursive
+        # (directory, error message) of directories which could not be read
+        self.errors = []
+
+
+    @classmethod
+    def fromConfiguration(cls, config):
+        """
+        Uses the inputSearchPattern, inputRegexPattern, inputExcludePatterns and recursiveInputSearch of the
+        configuration. Accumulation does not use the inputRegexPattern; it does not filter then.
+        """
+        opt = config.opt
+        return cls(cls.splitPatterns(opt.get('inputSearchPattern', '')),
+                   cls.splitPatterns(opt.get('inputExcludePatterns', '')),
+                   None if opt.get('accumulateData') else opt.get('inputRegexPattern'),
+                   opt.get('recursiveInputSearch', True))
+
+
+    @staticmethod
+    def splitPatterns(patterns):
+        """
+        :param patterns: globs separated by ";"
+        """
+        return [pattern.strip() for pattern in patterns.split(';') if pattern.strip()]
+
+
+    @staticmethod
+    def normalisePattern(pattern):
+        if not(any(character in pattern for character in '*?[')):
+            return '*' + pattern
+        return pattern
+
+
+    @staticmethod
+    def compileGlobs(patterns, flags):
+        """
+        :return: regular expression matching any of the globs; None if there is none
+        """
+        if len(patterns) == 0:
+            return None
+        return re.compile('|'.join('(?:{})'.format(fnmatch.translate(pattern)) for pattern in patterns), flags)
+
+
+    def isIncluded(self, name):
+        if self.includeRegex is not None and self.includeRegex.match(name) is None:
+            return False
+        return self.regex is None or self.regex.match(name) is not None
+
+
+    def isExcluded(self, name, relativePath):
+        return self.excludeRegex is not None and (self.excludeRegex.match(name) is not None or
+                                                  self.excludeRegex.match(relativePath) is not None)
+
+
+    def iterate(self, directories):
+        """
+        Generator of the paths of all matching files, in the order they are listed by the file system; the files of a
+        directory precede those of its subdirectories
+        :param directories: directory or list of directories to search
+        """
+        if isinstance(directories, str):
+            directories = [directories]
+        for root in directories:
+            # (directory, its path relative to the root, using "/"); depth first
+            pending = [(root, '')]
+            while len(pending) > 0:
+                directory, relativeDirectory = pending.pop()
+                subdirectories = []
+                for name, isDirectory in self.iterateListing(directory):
+                    if self.isExcluded(name, relativeDirectory + name):
+                        continue
+                    if isDirectory:
+                        subdirectories.append((os.path.join(directory, name), relativeDirectory + name + '/'))
+                    elif self.isIncluded(name):
+                        yield os.path.join(directory, name)
+                if self.recursive:
+                    pending += reversed(subdirectories)
+
+
+    def find(self, directories):
+        """
+        :return: sorted list of the paths of all matching files @see iterate
+        """
+        return sorted(self.iterate(directories))
+
+
+    def iterateListing(self, directory):
+        """
+        Generator of (name, is directory) of the entries of the directory, from the cache or while they are read;
+        nothing if the directory cannot be read (@see errors)
+        """
+        try:
+            modificationTime = os.stat(directory).st_mtime_ns
+        except OSError as e:
+            self.errors.append((directory, str(e)))
+            return
+        with self.cacheLock:
+            cached = self.listingCache.get(directory)
+            if cached is not None:
+                self.listingCache.move_to_end(directory)
+        if cached is not None and cached[0] == modificationTime:
+            for entry in cached[1]:
+                yield entry
+            return
+
+        listing = []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    # symbolic links to directories are not followed, which might lead into cycles
+                    listing.append((entry.name, entry.is_dir(follow_symlinks=False)))
+                    yield listing[-1]
+        except OSError as e:
+            self.errors.append((directory, str(e)))
+            return
+        if time.time() - modificationTime / 1e9 > self.minCacheAge:
+            self.cacheListing(directory, modificationTime, listing)
+
+
+    @classmethod
+    def cacheListing(cls, directory, modificationTime, listing):
+        """
+        Adds (or replaces) the listing of the directory, dropping the least recently used listings beyond
+        maxCachedEntries
+        """
+        if len(listing) > cls.maxCachedEntries:
+            return
+        with cls.cacheLock:
+            replaced = cls.listingCache.pop(directory, None)
+            if replaced is not None:
+                cls.cachedEntryNum -= len(replaced[1])
+            cls.listingCache[directory] = (modificationTime, listing)
+            cls.cachedEntryNum += len(listing)
+            while cls.cachedEntryNum > cls.maxCachedEntries:
+                dropped = cls.listingCache.popitem(last=False)[1]
+                cls.cachedEntryNum -= len(dropped[1])
@@ -0,0 +1,121 @@
+import os
+import re
+
+#project imports
+from Lang import Lang
+from Configuration import Configuration
+from PlaceholderPattern import PlaceholderPattern
+
+class FileNameAnalysis:
+    """
+    Parses the names of all input files in a single pass: the inputRegexPattern and the outputFilePattern are compiled
+    once, every file name is matched once. The result is a table input file => placeholders (capture groups and
+    predefined placeholders) => output file, which is used to queue the tasks (the workers receive the resolved
+    placeholders) and by the preflight checks.
+    Files which cannot be processed are collected instead of being reported one by one (@see PreflightCheck).
+    """
+
+    def __init__(self, inputRegexPattern, outputFilePattern, outputDir):
+        """
+        raises re.error if inputRegexPattern is not a valid regular expression
+        """
+        self.inputRegex = re.compile(inputRegexPattern)
+        self.outputFilePattern = PlaceholderPattern(outputFilePattern)
+        self.outputDir = outputDir
+
+        # dictionaries with keys 'inputFile', 'placeholders' and 'outputFile'; in the order of the input files
+        self.entries = []
+        # files whose name does not match the inputRegexPattern
+        self.unmatchedFiles = []
+        # (input file, error message) of files whose placeholders or output file could not be resolved
+        self.invalidFiles = []
+
+
+    @classmethod
+    def fromConfiguration(cls, config):
+        return cls(config.opt['inputRegexPattern'], config.opt['outputFilePattern'], config.opt['outputDir'])
+
+
+    def analyse(self, inputFilePaths):
+        for inputFilePath in inputFilePaths:
+            self.addFile(inputFilePath)
+        return self
+
+
+    def addFile(self, inputFilePath):
+        """
+        :return: entry of the file; None if the file cannot be processed
+        """
+        match = self.inputRegex.match(os.path.basename(inputFilePath))
+        if match is None:
+            self.unmatchedFiles.append(inputFilePath)
+            return None
+
+        try:
+            placeholders = self.resolvePlaceholders(inputFilePath, match)
+        except RuntimeError as e:
+            self.invalidFiles.append((inputFilePath, str(e)))
+            return None
+
+        undefined = set()
+        outputFileName = self.outputFilePattern.substitute(placeholders, undefined)
+        if len(undefined) > 0:
+            self.invalidFiles.append((inputFilePath, Lang.get("Placeholder in ouput file pattern refers to a placeholder which has not been defined") +
+                                      ': ' + ', '.join(sorted(undefined))))
+            return None
+
+        entry = {'inputFile': inputFilePath, 'placeholders': placeholders,
+                 'outputFile': self.outputDir + '/' + outputFileName}
+        self.entries.append(entry)
+        return entry
+
+
+    def resolvePlaceholders(self, inputFilePath, inputFileNameMatch):
+        """
+        Determines the value of every placeholder for the given file, except OUTPUTFILE
+        :param inputFileNameMatch: match of the inputRegexPattern on the input file name
+        :return: dictionary placeholder name => value
+        """
+        inputPath, fileName = os.path.split(inputFilePath);
+
+        # may be refined by a capture group of the same name
+        placeholders = {'fileName': fileName}
+
+        # incorporate the capture groups in the input file name
+        # groups which did not participate in the match (i.e. optional ones) are empty
+        for grpName, grpValue in inputFileNameMatch.groupdict().items():
+            # predefined placeholders may NOT be overwritten.
+            if grpName in Configuration.predefinedPlaceholders:
+                msg = Lang.get('Predefined placeholders must not be redefined: attempted to define placeholder,  which already exists: ');
+                raise RuntimeError(msg + ' ' + grpName);
+            placeholders[grpName] = grpValue if grpValue is not None else ''
+
+        # set special placeholders
+        placeholders['INFILE'] = inputFilePath;
+        # input Path doesn't have a trailing slash
+        placeholders['INPUTDIR'] = inputPath + '/';
+        # output Path doesn't have a trailing slash
+        placeholders['OUTPUTDIR'] = self.outputDir + '/';
+        return placeholders
+
+
+    def hasErrors(self):
+        return len(self.unmatchedFiles) > 0 or len(self.invalidFiles) > 0
+
+
+    def getErrors(self):
+        """
+        :return: list of (error message, list of affected files); files with the same error are listed together
+        """
+        errors = []
+        if len(self.unmatchedFiles) > 0:
+            errors.append((Lang.get("Could not match input filename with pattern. Please check defined and used placeholders. Affected files: "),
+                           self.unmatchedFiles))
+
+        filesPerMessage = {}
+        for inputFilePath, message in self.invalidFiles:
+            if message not in filesPerMessage:
+                filesPerMessage[message] = []
+                errors.append((message, filesPerMessage[message]))
+            filesPerMessage[message].append(inputFilePath)
+        return errors
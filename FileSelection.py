@@ -0,0 +1,114 @@
+import collections
+import os
+
+class FileSelection:
+    """
+    Input files selected for processing: an ordered set on top of the list of input files of a configuration, which is
+    kept up to date in place. Membership is looked up by an index (file => position), so adding files (duplicates are
+    skipped) takes time proportional to the number of files added, and removing any number of files takes a single
+    pass over the list.
+    """
+
+    def __init__(self, files = None):
+        """
+        :param files: list of files, i.e. the inputFiles of a configuration; duplicates are removed from it
+        """
+        self.files = files if files is not None else []
+        self.indices = {}
+        self.files[:] = [filePath for filePath in self.files if self.addToIndex(filePath)]
+
+
+    def addToIndex(self, filePath):
+        """
+        :return: False if the file is contained already
+        """
+        if filePath in self.indices:
+            return False
+        self.indices[filePath] = len(self.indices)
+        return True
+
+
+    def __len__(self):
+        return len(self.files)
+
+
+    def __contains__(self, filePath):
+        return filePath in self.indices
+
+
+    def __iter__(self):
+        return iter(self.files)
+
+
+    def __getitem__(self, index):
+        return self.files[index]
+
+
+    def add(self, filePaths):
+        """
+        :return: list of the files added, i.e. those not contained already
+        """
+        added = [filePath for filePath in filePaths if self.addToIndex(filePath)]
+        self.files.extend(added)
+        return added
+
+
+    def remove(self, filePaths):
+        """
+        :return: number of files removed
+        """
+        removed = set(filePath for filePath in filePaths if filePath in self.indices)
+        if len(removed) > 0:
+            self.files[:] = [filePath for filePath in self.files if filePath not in removed]
+            self.indices = dict((filePath, index) for index, filePath in enumerate(self.files))
+        return len(removed)
+
+
+    def clear(self):
+        del self.files[:]
+        self.indices = {}
+
+
+    @staticmethod
+    def getGroupValue(regex, filePath, groupName):
+        """
+        :param regex: compiled inputRegexPattern; matched on the file name
+        :return: value of the capture group; None if the file name does not match
+        """
+        match = regex.match(os.path.basename(filePath))
+        if match is None:
+            return None
+        return match.group(groupName) or ''
+
+
+    def filter(self, text, regex = None, groupName = None, filePaths = None):
+        """
+        :param text: text the path (or the value of the capture group) has to contain; case insensitive
+        :param regex: compiled inputRegexPattern; needed if groupName is given
+        :param groupName: capture group of the regex; None filters by the whole path
+        :param filePaths: files to filter instead of all files (i.e. those just added)
+        :return: list of the matching files, in order
+        """
+        text = text.lower()
+        filePaths = self.files if filePaths is None else filePaths
+        if groupName is None:
+            return [filePath for filePath in filePaths if text in filePath.lower()]
+        values = ((filePath, self.getGroupValue(regex, filePath, groupName)) for filePath in filePaths)
+        return [filePath for filePath, value in values if value is not None and text in value.lower()]
+
+
+    def countGroupValues(self, regex, groupName, filePaths = None):
+        """
+        :return: collections.Counter value of the capture group => number of files; files whose name does not match
+        the regex are counted as None
+        """
+        filePaths = self.files if filePaths is None else filePaths
+        return collections.Counter(self.getGroupValue(regex, filePath, groupName) for filePath in filePaths)
+
+
+    def countUnmatched(self, regex, filePaths = None):
+        """
+        :return: number of files whose name does not match the regex (i.e. would fail the preflight check)
+        """
+        filePaths = self.files if filePaths is None else filePaths
+        return sum(1 for filePath in filePaths if regex.match(os.path.basename(filePath)) is None)
@@ -0,0 +1,82 @@
+import queue
+
+class FrontendChannel:
+    """
+    Frontend of a processor running in a thread other than the GUI's (@see ProcessingThread). Calls of the frontend
+    interface are queued instead of being carried out; the GUI consumes them from within tkinter's main loop, as
+    tkinter must only be used by the thread running it.
+    """
+
+    """
+    Calls which only report the latest state; of several consecutive ones, only the last one is passed on
+    """
+    coalescedMethods = ('showProgress', 'showWorkerStatus')
+
+    def __init__(self):
+        # (name of the frontend's method, arguments)
+        self.messages = queue.Queue()
+
+
+    def post(self, method, *args):
+        self.messages.put((method, args))
+
+
+    def receive(self):
+        """
+        Does not block
+        :return: list of (name of the frontend's method, arguments) of all calls posted so far
+        """
+        messages = []
+        try:
+            while True:
+                message = self.messages.get_nowait()
+                if len(messages) > 0 and message[0] in self.coalescedMethods and messages[-1][0] == message[0]:
+                    messages[-1] = message
+                else:
+                    messages.append(message)
+        except queue.Empty:
+            pass
+        return messages
+
+
+    # Frontend interface used by the backend
+    # ----------------------------------------------------------------------------------------------------------------
+    def GUIToConfig(self):
+        # the GUI applies its settings before the processor is started
+        pass
+
+
+    def applyStepOverrides(self, opt, stepIndex):
+        pass
+
+
+    def updateConfigGUI(self):
+        pass
+
+
+    def showProgress(self, processedFiles, totalFiles, remainingTime):
+        self.post('showProgress', processedFiles, totalFiles, remainingTime)
+
+
+    def showWorkerStatus(self, workerStatus, paused):
+        self.post('showWorkerStatus', workerStatus, paused)
+
+
+    def resetProgress(self):
+        self.post('resetProgress')
+
+
+    def showInfo(self, title, msg):
+        self.post('showInfo', title, msg)
+
+
+    def showDebuggingInformation(self, debuggingInfo):
+        self.post('showDebuggingInformation', debuggingInfo)
+
+
+    def warn(self, warnMsg):
+        self.post('warn', warnMsg)
+
+
+    def err(self, errMsg):
+        self.post('err', errMsg)
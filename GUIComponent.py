@@ -51,4 +51,8 @@ class GUIComponent:
 
     @staticmethod
     def err(errMsg):
-        tk.messagebox.showerror(Lang.get("Error"), errMsg)
\ No newline at end of file
+        tk.messagebox.showerror(Lang.get("Error"), errMsg)
+
+    @staticmethod
+    def warn(warnMsg):
+        tk.messagebox.showwarning(Lang.get("Warning"), warnMsg)
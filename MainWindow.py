@@ -5,17 +5,15 @@ import tkinter.messagebox
 
 # system imports
 import json
-from multiprocessing import Process, Queue
 import os
 
 
 #project imports
-from Configuration import Configuration
 from BatchProcessorGUI import BatchProcessorGUI
-from batchProcessor import BatchProcessor
 from LastActionsSelectionGUI import LastActionsSelectionGUI
 from Lang import Lang
 from GUIComponent import GUIComponent
+from WorkerPool import WorkerPool
 
 
 class MainWindow (GUIComponent):
@@ -34,7 +32,9 @@ class MainWindow (GUIComponent):
             'recentActions': []
         },
         'settings' :{
-            'language' : []
+            'language' : [],
+            # number of parallel workers; 0 starts one worker per CPU core
+            'workerCount' : 0
         }
     }
 
@@ -181,28 +181,13 @@ class MainWindow (GUIComponent):
         Not all Python types are pickable (including tkinter's); therefore, to avoid those conditions, all critical
         objects related to processes are instantiated before tkinter.
         """
-        self.taskQueue = Queue()
-        # returns the parsed script/placeholders to the calling process
-        # please note that Tkinter is NOT threadsafe.
-        self.debuggingResultQueue = Queue()
-        self.logQueue = Queue()
-        self.errorQueue = Queue()
-        self.p = Process(target=SPSSWorkerProcess, args=(self.logQueue, self.taskQueue, self.debuggingResultQueue, self.errorQueue));
-
-        # start worker process
-        # could be starting a pool of workers as well
-        self.p.start()
+        self.workerPool = WorkerPool(self.state['settings'].get('workerCount', 0))
         self.parent = root = tk.Tk();
 
 
 
     def showBatchProcessor(self):
-        batchProcessorArgs = {'parent': self.parent,
-                              'workerProcess': self.p,
-                              'taskQueue': self.taskQueue,
-                              'logQueue' : self.logQueue,
-                              'debuggingResultQueue': self.debuggingResultQueue,
-                              'errorQueue': self.errorQueue}
+        batchProcessorArgs = {'workerPool': self.workerPool}
         self.gui = BatchProcessorGUI(tk.Toplevel(self.parent), self, batchProcessorArgs);
 
 
@@ -214,19 +199,6 @@ class MainWindow (GUIComponent):
 
 
 
-def SPSSWorkerProcess(logQueue, taskQueue, debuggingResultQueue, errorQueue):
-    while(True):
-        #block until next job is fetched
-        job = taskQueue.get(True);
-        [inputFilePath, outputFilePath, configStr] = job;
-        config = Configuration()
-        config.loadFromString(configStr);
-        #try:
-        BatchProcessor.runSPSSProcessOnFile(inputFilePath, outputFilePath, config, logQueue, debuggingResultQueue, errorQueue);
-        #except Exception as e:
-            #BatchProcessorGUI.handleExecutionError(e, taskQueue, debuggingResultQueue, errorQueue)
-
-
 def main():
     mainWindow = MainWindow()
 
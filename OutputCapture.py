@@ -0,0 +1,162 @@
+import gzip
+import io
+import json
+import os
+import re
+import time
+
+#project imports
+from PlaceholderPattern import PlaceholderPattern
+
+class OutputCapture:
+    """
+    Output (stdout and stderr) of the statistics engine for a single task, streamed into a capture file while the
+    engine runs, so it is never held in memory as a whole; the file is gzip compressed if requested. The file is written
+    under a temporary name and renamed once complete.
+
+    Lines reporting errors or warnings are counted and recorded along the way. Once a capture is complete, they are
+    appended to the index within the capture directory (@see indexFileName), so the captures of a large run can be
+    searched without opening every single file. Records of captures written again supersede earlier ones.
+    """
+
+    indexFileName = '.batchProcessorCaptureIndex.jsonl'
+
+    """
+    Errors and warnings as reported by pspp ("stdin:3: error: ...") and SPSS (">Error # 4070.")
+    """
+    issuePattern = re.compile(r'(?:^\s*>|:\s*)(error|warning)(?:\s*#|:)', re.IGNORECASE)
+
+    """
+    Number of error and warning lines recorded in the index per capture (all of them are counted); characters recorded
+    per line
+    """
+    maxIndexedLines = 100
+    maxIndexedLineLength = 500
+
+    def __init__(self, filePath, temporaryFilePath, compress = False, inputFile = None):
+        """
+        :param filePath: capture file; should end with ".gz" if compressed
+        :param temporaryFilePath: name the file is written to until it is complete; within the same directory
+        :param inputFile: input file of the task; part of the index record
+        raises IOError if the file cannot be opened
+        """
+        self.filePath = filePath
+        self.temporaryFilePath = temporaryFilePath
+        self.inputFile = inputFile
+        self.file = gzip.open(temporaryFilePath, 'wb') if compress else io.open(temporaryFilePath, 'wb')
+        # the last line written may be incomplete; it is scanned once complete
+        self.partialLine = b''
+        self.lineNum = 0
+        self.errorNum, self.warningNum = 0, 0
+        # [line number, level, text] of errors and warnings
+        self.issues = []
+
+
+    @classmethod
+    def getFilePath(cls, config, placeholders):
+        """
+        Name of the capture file of a task: captureFilePattern within the capture directory
+        (defaultCaptureOutputOutDir); ".gz" is appended if compressed
+        :param placeholders: placeholders of the task
+        :return: None if output is not captured
+        """
+        outDir = config.opt.get('defaultCaptureOutputOutDir', 'none')
+        if outDir in ('', 'none'):
+            return None
+        fileName = PlaceholderPattern(config.opt.get('captureFilePattern', '<fileName>.log')).substitute(placeholders)
+        if config.opt.get('compressCapturedOutput', False):
+            fileName += '.gz'
+        return os.path.join(outDir, fileName)
+
+
+    def write(self, data):
+        """
+        :param data: output of the engine; bytes (UTF-8) or text
+        """
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        self.file.write(data)
+        lines = (self.partialLine + data).split(b'\n')
+        self.partialLine = lines.pop()
+        for line in lines:
+            self.scanLine(line)
+
+
+    def writeFile(self, filePath, blockSize = 2**16):
+        """
+        Appends the contents of a file (i.e. written by the engine itself), block by block
+        """
+        with io.open(filePath, 'rb') as f:
+            while True:
+                block = f.read(blockSize)
+                if not(block):
+                    break
+                self.write(block)
+
+
+    def scanLine(self, line):
+        self.lineNum += 1
+        text = line.decode('utf-8', 'replace').rstrip('\r')
+        match = self.issuePattern.search(text)
+        if match is None:
+            return
+        level = match.group(1).lower()
+        if level == 'error':
+            self.errorNum += 1
+        else:
+            self.warningNum += 1
+        if len(self.issues) < self.maxIndexedLines:
+            self.issues.append([self.lineNum, level, text.strip()[:self.maxIndexedLineLength]])
+
+
+    def close(self, failed = False):
+        """
+        Renames the file into place and records it in the index
+        :param failed: the engine failed on the task
+        """
+        if self.file is None:
+            return
+        if self.partialLine:
+            self.scanLine(self.partialLine)
+            self.partialLine = b''
+        self.file.close()
+        self.file = None
+        os.replace(self.temporaryFilePath, self.filePath)
+        self.appendToIndex({'captureFile': self.filePath, 'inputFile': self.inputFile, 'time': time.time(),
+                            'failed': failed, 'lines': self.lineNum, 'errors': self.errorNum,
+                            'warnings': self.warningNum, 'issues': self.issues})
+
+
+    def appendToIndex(self, record):
+        """
+        Workers append to the same index; each record is written by a single call in append mode, so records of
+        different workers do not interleave
+        """
+        line = (json.dumps(record, sort_keys=True) + '\n').encode('utf-8')
+        indexPath = os.path.join(os.path.dirname(self.filePath), self.indexFileName)
+        fd = os.open(indexPath, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o666)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+
+    @classmethod
+    def readIndex(cls, directory):
+        """
+        :return: list of the latest index record of every capture within the directory, in the order they were written
+        """
+        records = {}
+        try:
+            with io.open(os.path.join(directory, cls.indexFileName), 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    # dictionaries keep the order of insertion; superseded records are moved to the end
+                    records.pop(record['captureFile'], None)
+                    records[record['captureFile']] = record
+        except (IOError, OSError):
+            return []
+        return list(records.values())
@@ -0,0 +1,87 @@
+import bisect
+import os
+
+class OutputSizeValidator:
+    """
+    Spots output files which are considerably smaller than the other outputs of their group (i.e. written
+    incompletely), using a robust outlier test: the modified z-score of a file's size, based on the median and the median
+    absolute deviation (MAD) of all sizes of the group (Iglewicz and Hoaglin). Unlike the mean, those are hardly affected
+    by the outliers themselves.
+    Outputs are grouped by directory and extension. Files are checked as soon as they are reported, i.e. while the
+    remaining tasks are still being processed; the first files of a group are checked once the group has minSamples
+    files.
+    """
+
+    """
+    Number of files a group needs before any of its files is checked
+    """
+    minSamples = 10
+
+    """
+    Files whose modified z-score is below -threshold are outliers
+    """
+    threshold = 3.5
+
+    """
+    Statistics of a group are recomputed once it has grown by this factor (recomputing them for every file would take
+    quadratic time)
+    """
+    recomputationGrowth = 1.05
+
+    def __init__(self):
+        # group => {'sizes': sorted list of sizes, 'files': output file => size, 'pending': files not checked yet,
+        #           'stats': (median, scale), 'statsCount': number of sizes the statistics are based on}
+        self.groups = {}
+
+
+    @staticmethod
+    def getGroup(outputFile):
+        directory, fileName = os.path.split(os.path.abspath(outputFile))
+        return directory, os.path.splitext(fileName)[1].lower()
+
+
+    def add(self, outputFile, size):
+        """
+        Adds the size of a written output file to its group; a file which has been added before (i.e. reprocessed) is
+        replaced
+        :return: output files which turned out to be outliers; may include files added earlier
+        """
+        key = self.getGroup(outputFile)
+        group = self.groups.setdefault(key, {'sizes': [], 'files': {}, 'pending': [], 'stats': None,
+                                             'statsCount': 0})
+        if outputFile in group['files']:
+            sizes = group['sizes']
+            del sizes[bisect.bisect_left(sizes, group['files'][outputFile])]
+        group['files'][outputFile] = size
+        bisect.insort(group['sizes'], size)
+
+        if len(group['sizes']) < self.minSamples:
+            group['pending'].append(outputFile)
+            return []
+        filesToCheck, group['pending'] = group['pending'] + [outputFile], []
+        return [filePath for filePath in filesToCheck if self.isOutlier(group, group['files'][filePath])]
+
+
+    def isOutlier(self, group, size):
+        if group['stats'] is None or len(group['sizes']) >= group['statsCount'] * self.recomputationGrowth:
+            group['stats'] = self.computeStatistics(group['sizes'])
+            group['statsCount'] = len(group['sizes'])
+        median, scale = group['stats']
+        if scale == 0:
+            return False
+        return 0.6745 * (size - median) / scale < -self.threshold
+
+
+    @staticmethod
+    def computeStatistics(sortedSizes):
+        """
+        :return: (median, scale); scale is the MAD. If most sizes are identical (MAD = 0), the scale is derived from the
+        mean absolute deviation instead; 0 means all sizes are identical.
+        """
+        n = len(sortedSizes)
+        median = (sortedSizes[(n - 1) // 2] + sortedSizes[n // 2]) / 2.0
+        deviations = sorted(abs(size - median) for size in sortedSizes)
+        mad = (deviations[(n - 1) // 2] + deviations[n // 2]) / 2.0
+        if mad > 0:
+            return median, mad
+        return median, 1.2533 * sum(deviations) / n * 0.6745
@@ -1,12 +1,203 @@
+import io
 import os
 import subprocess
+import tempfile
+import threading
+
+#project imports
+from EngineUsage import EngineUsage
 
 class PSPPExecutor:
 
-    def execute(self, commands):
-        commandsTxt = os.linesep.join(commands)
-        #write all commands to file
-        with open("cmd.txt", "w") as cmd_file:
-            cmd_file.write(commandsTxt)
-            cmd_file.close()
-            subprocess.check_output(['pspp', './cmd.txt'])
\ No newline at end of file
+    engine = 'pspp'
+
+    """
+    Set by each worker process; part of the names of scratch files
+    """
+    workerId = 0
+
+    """
+    'stdin' passes the syntax to pspp via stdin; 'file' writes it to a temporary file within scratchDir
+    """
+    syntaxDelivery = 'stdin'
+
+    """
+    Directory for temporary syntax files; empty uses the system's temporary directory
+    """
+    scratchDir = ''
+
+    """
+    Keeps temporary syntax files for debugging
+    """
+    keepScratchFiles = False
+
+    """
+    Prefix of the ECHO markers enclosing the commands of each file when several files are executed at once
+    """
+    markerPrefix = 'BATCHPROCESSOR-FILE'
+
+    """
+    CPU time and peak memory of the pspp processes started since the worker reset it (@see EngineUsage)
+    """
+    usage = EngineUsage()
+
+    """
+    Bytes of pspp's output kept in memory while it is streamed into a capture (i.e. for the error report); bytes read
+    from pspp at once
+    """
+    outputTailSize = 2**16
+    readSize = 2**16
+
+    def execute(self, commands, capture = None):
+        """
+        :param capture: OutputCapture receiving pspp's output while it runs; None if output is not captured
+        """
+        return self.runPSPP(commands, capture)
+
+    def runPSPP(self, commands, capture = None):
+        """
+        Runs pspp on the given commands; the syntax is passed via stdin or a temporary file within the scratch
+        directory (@see Configuration.opt['syntaxDelivery'])
+        :param capture: @see runProcess
+        :return: output of pspp (stdout and stderr); only its end if captured
+        raises subprocess.CalledProcessError if pspp reports errors
+        """
+        commandsTxt = os.linesep.join(commands) + os.linesep
+        if self.syntaxDelivery == 'stdin':
+            output = self.runProcess(['pspp', '-'], commandsTxt.encode('utf-8'), capture)
+            return output.decode('utf-8', 'replace')
+
+        # unique name per call; several workers (or instances of the BatchProcessor) may share the scratch directory
+        fd, cmdFilePath = tempfile.mkstemp(prefix='cmd_{}_'.format(self.workerId), suffix='.sps',
+                                           dir=self.scratchDir or None)
+        try:
+            with io.open(fd, 'w', encoding='utf-8') as cmdFile:
+                cmdFile.write(commandsTxt)
+            output = self.runProcess(['pspp', cmdFilePath], None, capture)
+        finally:
+            if not(self.keepScratchFiles):
+                os.remove(cmdFilePath)
+        return output.decode('utf-8', 'replace')
+
+    def runProcess(self, args, input = None, capture = None):
+        """
+        Runs pspp like subprocess.check_output with stderr redirected to stdout; where the platform reports the
+        resource usage of single child processes (os.wait4), the process is reaped here and its usage is added to
+        self.usage
+        :param input: bytes passed via stdin
+        :param capture: OutputCapture the output is streamed into as it arrives; only the last outputTailSize bytes
+        are kept then
+        :return: output (bytes)
+        raises subprocess.CalledProcessError if pspp reports errors
+        """
+        process = subprocess.Popen(args, stdin=None if input is None else subprocess.PIPE, stdout=subprocess.PIPE,
+                                   stderr=subprocess.STDOUT)
+        writer = None
+        if input is not None:
+            # pspp may fill the output pipe before it has read all of its input
+            writer = threading.Thread(target=self.writeInput, args=(process.stdin, input))
+            writer.daemon = True
+            writer.start()
+        output = bytearray()
+        while True:
+            chunk = process.stdout.read1(self.readSize)
+            if not(chunk):
+                break
+            output += chunk
+            if capture is not None:
+                capture.write(chunk)
+                del output[:-self.outputTailSize]
+        process.stdout.close()
+        if not(hasattr(os, 'wait4')):
+            process.wait()
+        else:
+            pid, status, rusage = os.wait4(process.pid, 0)
+            process.returncode = -os.WTERMSIG(status) if os.WIFSIGNALED(status) else os.WEXITSTATUS(status)
+            self.usage.add(*EngineUsage.fromRusage(rusage))
+        if writer is not None:
+            writer.join()
+        output = bytes(output)
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode, args, output)
+        return output
+
+    @staticmethod
+    def writeInput(stream, input):
+        try:
+            stream.write(input)
+            stream.close()
+        except OSError:
+            # pspp terminated before reading all of its input; reported by its exit status
+            pass
+
+    def executeBatch(self, commandLists, outputFiles = None, captures = None):
+        """
+        Executes the commands of several files using one pspp invocation. Each file starts with an empty dataset;
+        its commands are enclosed in ECHO markers, which allow to attribute output and errors to the single files.
+        Files whose commands have not been completed (i.e. pspp crashed) are executed on their own.
+        :param commandLists: list of command lists, one per file
+        :param outputFiles: output file of each file; not needed, as the markers show how far pspp got
+        :param captures: OutputCapture of each file (None for files whose output is not captured); receives the output
+        of the file once it has been split off that of the invocation
+        :return: list of (output, error) per file; error is None if the file has been processed successfully
+        """
+        if captures is None:
+            captures = [None] * len(commandLists)
+        commands = []
+        for i, fileCommands in enumerate(commandLists):
+            commands.append("ECHO '{} BEGIN {}'.".format(self.markerPrefix, i))
+            commands.append('NEW FILE.')
+            commands += fileCommands
+            commands.append("ECHO '{} END {}'.".format(self.markerPrefix, i))
+
+        try:
+            output = self.runPSPP(commands)
+        except subprocess.CalledProcessError as e:
+            output = e.output.decode('utf-8', 'replace') if e.output else ''
+
+        results = []
+        for i, (fileOutput, completed) in enumerate(self.splitOutput(output, len(commandLists))):
+            if not(completed):
+                try:
+                    results.append((self.runPSPP(commandLists[i], captures[i]), None))
+                except subprocess.CalledProcessError as e:
+                    fileOutput = e.output.decode('utf-8', 'replace') if e.output else ''
+                    results.append((fileOutput, self.getErrorMessage(fileOutput) or str(e)))
+                continue
+            if captures[i] is not None:
+                captures[i].write(fileOutput)
+            results.append((fileOutput, self.getErrorMessage(fileOutput)))
+        return results
+
+    def splitOutput(self, output, fileCount):
+        """
+        Splits the output of a batch along the markers
+        :return: list of (output, completed) per file; completed is True if the end marker of the file has been seen
+        """
+        outputs = [[] for i in range(fileCount)]
+        completed = [False] * fileCount
+        current = None
+        for line in output.splitlines():
+            if line.strip().startswith(self.markerPrefix):
+                # i.e. "BATCHPROCESSOR-FILE BEGIN 3"
+                parts = line.split()
+                if len(parts) == 3 and parts[2].isdigit() and int(parts[2]) < fileCount:
+                    if parts[1] == 'BEGIN':
+                        current = int(parts[2])
+                    elif parts[1] == 'END':
+                        completed[int(parts[2])] = True
+                        current = None
+                    continue
+            if current is not None:
+                outputs[current].append(line)
+        return [(os.linesep.join(lines), completed[i]) for i, lines in enumerate(outputs)]
+
+    @staticmethod
+    def getErrorMessage(output):
+        """
+        :return: error messages contained in pspp's output; None if there are none
+        """
+        errors = [line.strip() for line in output.splitlines() if 'error:' in line]
+        if len(errors) == 0:
+            return None
+        return os.linesep.join(errors)
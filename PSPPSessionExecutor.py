@@ -0,0 +1,159 @@
+import collections
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import time
+
+#project imports
+from EngineUsage import EngineUsage
+from PSPPExecutor import PSPPExecutor
+
+class PSPPSessionExecutor(PSPPExecutor):
+    """
+    Keeps one long-lived pspp process per worker which reads syntax from stdin, instead of starting pspp for every
+    file. The commands of each file are enclosed in ECHO markers; the output up to a file's end marker belongs to that
+    file. The session is restarted after a crash and after a number of files (to cap pspp's memory usage).
+    """
+
+    engine = 'pspp-session'
+
+    """
+    Number of files after which the session is restarted
+    """
+    filesPerSession = 100
+
+    """
+    Seconds to wait for a file to complete; None waits forever (@see Configuration.opt['sessionFileTimeout'])
+    """
+    fileTimeout = None
+
+    def __init__(self):
+        self.process = None
+        # lines of pspp's output; None marks the end of the output (pspp terminated)
+        self.lines = None
+        self.filesInSession = 0
+        # numbers the files over all sessions; markers of earlier files can never be mistaken for current ones
+        self.fileNum = 0
+
+    @staticmethod
+    def getSessionCommand():
+        command = ['pspp', '-']
+        # output written to a pipe is block buffered; markers have to arrive as soon as a file has been processed
+        if shutil.which('stdbuf') is not None:
+            command = ['stdbuf', '-oL'] + command
+        return command
+
+    def startSession(self):
+        self.process = subprocess.Popen(self.getSessionCommand(), stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        stderr=subprocess.STDOUT, universal_newlines=True, bufsize=1)
+        self.lines = queue.Queue()
+        reader = threading.Thread(target=self.readOutput, args=(self.process.stdout, self.lines))
+        reader.daemon = True
+        reader.start()
+        self.filesInSession = 0
+
+    @staticmethod
+    def readOutput(stream, lines):
+        for line in stream:
+            lines.put(line.rstrip('\r\n'))
+        lines.put(None)
+
+    def stopSession(self, kill = False):
+        if self.process is None:
+            return
+        if kill:
+            self.process.kill()
+        else:
+            try:
+                self.process.stdin.close()
+            except OSError:
+                pass
+        try:
+            self.process.wait(5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.process = None
+
+    def execute(self, commands, capture = None):
+        """
+        :param capture: OutputCapture receiving the file's output while it is processed; None if output is not captured
+        """
+        output, error = self.executeInSession(commands, capture)
+        if error is not None:
+            e = RuntimeError(error)
+            e.output = output
+            raise e
+        return output
+
+    def executeBatch(self, commandLists, outputFiles = None, captures = None):
+        # starting pspp is paid once per session anyway
+        if captures is None:
+            captures = [None] * len(commandLists)
+        return [self.executeInSession(commands, capture) for commands, capture in zip(commandLists, captures)]
+
+    def executeInSession(self, commands, capture = None):
+        """
+        Executes the commands of a single file in the running session (which is started if necessary)
+        :param capture: OutputCapture the lines are streamed into as they arrive; only the last outputTailSize bytes
+        (roughly) are kept then
+        :return: (output, error); error is None if the file has been processed successfully
+        """
+        if self.process is not None and (self.process.poll() is not None
+                                         or self.filesInSession >= self.filesPerSession):
+            self.stopSession()
+        if self.process is None:
+            self.startSession()
+
+        self.fileNum += 1
+        self.filesInSession += 1
+        # the session outlives the file; its CPU time is attributed to files by difference, its peak memory is that of
+        # the whole session so far
+        sessionPid = self.process.pid
+        cpuTimeBefore = EngineUsage.ofProcess(sessionPid)[0]
+        beginMarker = '{} BEGIN {}'.format(self.markerPrefix, self.fileNum)
+        endMarker = '{} END {}'.format(self.markerPrefix, self.fileNum)
+        lines = ["ECHO '{}'.".format(beginMarker), 'NEW FILE.'] + commands + ["ECHO '{}'.".format(endMarker)]
+        try:
+            self.process.stdin.write('\n'.join(lines) + '\n')
+            self.process.stdin.flush()
+        except OSError:
+            self.stopSession(kill=True)
+            return '', 'pspp session terminated unexpectedly'
+
+        # lines are about 80 characters
+        outputLines = collections.deque(maxlen=None if capture is None else self.outputTailSize // 80)
+        # the error message is made up of all error lines, even if the output is truncated
+        errorLines = []
+        started = False
+        deadline = None if self.fileTimeout is None else time.time() + self.fileTimeout
+        while True:
+            try:
+                line = self.lines.get(True, None if deadline is None else max(0, deadline - time.time()))
+            except queue.Empty:
+                self.stopSession(kill=True)
+                output = os.linesep.join(outputLines)
+                return output, 'pspp did not complete the file within {} seconds'.format(self.fileTimeout)
+            if line is None:
+                # pspp crashed; the next file starts a new session
+                self.stopSession()
+                output = os.linesep.join(outputLines)
+                return output, self.getErrorMessage(os.linesep.join(errorLines)) or 'pspp session terminated unexpectedly'
+            if line.strip() == beginMarker:
+                started = True
+            elif line.strip() == endMarker:
+                break
+            elif started:
+                outputLines.append(line)
+                if capture is not None:
+                    capture.write(line + '\n')
+                if 'error:' in line:
+                    errorLines.append(line)
+
+        cpuTime, peakRss = EngineUsage.ofProcess(sessionPid)
+        if cpuTime is not None and cpuTimeBefore is not None:
+            self.usage.add(cpuTime - cpuTimeBefore, peakRss)
+        output = os.linesep.join(outputLines)
+        return output, self.getErrorMessage(os.linesep.join(errorLines))
@@ -0,0 +1,638 @@
+import heapq
+import io
+import json
+import os
+import queue
+import re
+import time
+
+#project imports
+from Lang import Lang
+from Configuration import Configuration
+from FileNameAnalysis import FileNameAnalysis
+from RemainingTimeEstimator import RemainingTimeEstimator
+from RunManifest import RunManifest
+from TaskGraph import TaskGraph
+from batchProcessor import BatchProcessor
+
+class Pipeline:
+    """
+    Connects several configurations (steps) into one run: the output files of a step are the input files of the steps
+    depending on it. By default, each step depends on the previous one; "inputsFrom" lets several steps depend on the
+    same step (independent branches) or a step combine the outputs of several steps. A step only takes those output
+    files whose names match its inputRegexPattern, so the dependencies are per file (i.e. per subject) rather than
+    per step (@see TaskGraph).
+    Steps share the worker pool and are processed at the same time: a file flows into the next steps as soon as it has
+    been produced, instead of waiting for the whole step. Accumulating steps (fan-in) start once all their input files
+    are ready. Jobs of all steps are handed to the workers critical path first, so the files followed by the longest
+    chain of further tasks do not fall behind (@see dispatchJob).
+
+    Each step is run by a BatchProcessor of its own; the pipeline acts as the frontend of those (reports are passed on
+    to the actual frontend, progress is summed up over all steps) and distributes the workers' events by run id.
+
+    A pipeline is defined by a JSON file listing the configuration files of the steps, relative to the pipeline file;
+    options override settings of the step's configuration, estimatedTaskDuration (seconds per file) is used by the
+    dry run until actual durations are known:
+    {"steps": ["Schritt_1.json",
+               {"config": "Schritt_2a.json", "name": "a"},
+               {"config": "Schritt_2b.json", "inputsFrom": ["Schritt_1.json"], "estimatedTaskDuration": 30},
+               {"config": "Schritt_3.json", "inputsFrom": ["a", "Schritt_2b.json"], "options": {"accumulateData": true}}]}
+    """
+
+    """
+    Seconds per task assumed for steps without estimatedTaskDuration, until a task of the step has been completed
+    """
+    defaultTaskDuration = 1.0
+
+    """
+    Relative change of the estimated task duration of a step beyond which all tasks are ranked again
+    (@see updateTaskRanks)
+    """
+    rerankThreshold = 0.1
+
+    def __init__(self, gui, workerPool):
+        """
+        :param gui: frontend; BatchProcessorGUI or BatchProcessorCLI instance
+        :param workerPool: WorkerPool instance
+        """
+        self.gui = gui
+        self.workerPool = workerPool
+        # one BatchProcessor per step
+        self.steps = []
+        self.stepNames = []
+        # per step, indices of the steps whose output files it takes; steps only depend on earlier steps
+        self.upstreamSteps = []
+        # per step, seconds per task assumed as long as no task has been completed
+        self.estimatedTaskDurations = []
+        # per step, [total duration, number] of the tasks completed so far
+        self.observedTaskDurations = []
+        # per step, 'waiting', 'started' or 'abandoned'
+        self.stepStates = []
+        # run id => step
+        self.stepsByRunId = {}
+        # per step, expected duration of the step and of the longest chain of steps depending on it
+        self.stepRanks = []
+        # task graph of the run; (step index, output file) => rank of the task @see updateTaskRanks
+        self.taskGraph = None
+        self.taskRanks = {}
+        # per step, estimated task duration the tasks have been ranked by
+        self.rankedTaskDurations = []
+        # (-rank, sequence number, step index, job) of jobs waiting for a worker @see dispatchJob
+        self.readyJobs = []
+        self.dispatchedJobSeq = 0
+        # jobs passed on to the workers which no worker has taken yet
+        self.dispatchedJobNum = 0
+        # sequence number of jobs taken back from the workers, which go before all others @see pauseProcessing
+        self.returnedJobSeq = 0
+        # no jobs are passed on while paused
+        self.paused = False
+        self.completedMessages = []
+        self.startTime = 0
+
+
+    def loadFromFile(self, filePath):
+        """
+        raises IOError if a file cannot be read, ValueError if a file is invalid
+        """
+        with io.open(filePath, 'r', encoding='utf-8') as f:
+            definition = json.load(f)
+        if not(isinstance(definition, dict)) or len(definition.get('steps', [])) == 0:
+            raise ValueError(Lang.get('A pipeline has to define at least one step'))
+
+        self.steps, self.stepNames, self.upstreamSteps = [], [], []
+        self.estimatedTaskDurations, self.observedTaskDurations = [], []
+        for stepIndex, stepDefinition in enumerate(definition['steps']):
+            if not(isinstance(stepDefinition, dict)):
+                stepDefinition = {'config': stepDefinition}
+            configFilePath = os.path.join(os.path.dirname(os.path.abspath(filePath)), stepDefinition['config'])
+            step = BatchProcessor(gui=self, workerPool=self.workerPool)
+            with io.open(configFilePath, 'r', encoding='utf-8') as f:
+                step.config.loadFromFile(f)
+            # configurations saved by older versions lack some settings
+            step.config.opt = dict(Configuration.opt, **step.config.opt)
+            step.config.opt.update(stepDefinition.get('options', {}))
+            # the first step sizes the worker pool; further steps are run on the same workers at the same time
+            step.ownsWorkerPool = stepIndex == 0
+            step.completionListener = self.handleTaskCompletion
+            step.dispatcher = self.dispatchJob
+
+            # steps are referred to by name; steps without inputs of other steps use the input files of their
+            # configuration
+            defaultInputsFrom = self.stepNames[-1:]
+            upstreamSteps = []
+            for name in stepDefinition.get('inputsFrom', defaultInputsFrom):
+                if name not in self.stepNames:
+                    raise ValueError(Lang.get('Step {} takes the output files of an unknown or later step: {}').format(
+                        stepIndex + 1, name))
+                upstreamSteps.append(self.stepNames.index(name))
+            self.upstreamSteps.append(sorted(set(upstreamSteps)))
+            self.estimatedTaskDurations.append(float(stepDefinition.get('estimatedTaskDuration',
+                                                                        self.defaultTaskDuration)))
+            self.observedTaskDurations.append([0.0, 0])
+            self.steps.append(step)
+            self.stepNames.append(stepDefinition.get('name', os.path.basename(configFilePath)))
+
+
+    # Processing
+    # ----------------------------------------------------------------------------------------------------------------
+    def applyOverrides(self):
+        """
+        Steps inherit the frontend's settings (i.e. input files and number of workers), as far as those apply
+        """
+        for stepIndex, step in enumerate(self.steps):
+            self.gui.applyStepOverrides(step.config.opt, stepIndex)
+
+
+    def startProcessing(self):
+        """
+        Starts the steps which do not depend on other steps, as well as all further steps which do not have to wait
+        for the steps they depend on
+        :return: False if processing could not be started at all; steps which have been started go on even if a further
+        step could not be started
+        """
+        print(Lang.get('Started processing...'))
+        self.applyOverrides()
+
+        self.startTime = time.time()
+        self.stepsByRunId = {}
+        self.stepStates = ['waiting'] * len(self.steps)
+        self.observedTaskDurations = [[0.0, 0] for step in self.steps]
+        self.updateStepRanks()
+        self.planTaskRanks()
+        self.readyJobs = []
+        self.dispatchedJobNum = 0
+        self.paused = False
+        self.completedMessages = []
+        self.startReadySteps()
+        return len(self.stepsByRunId) > 0
+
+
+    def startReadySteps(self):
+        """
+        Starts steps as soon as their input files are known: once the steps they depend on have been started, if they
+        process file by file, or once those have been completed, if they accumulate. If a step cannot be started, the
+        steps depending on it are abandoned; independent branches go on.
+        Called whenever a step may have been completed.
+        """
+        # steps only depend on earlier steps; a single pass sees the state changes of all steps they depend on
+        for stepIndex, step in enumerate(self.steps):
+            if self.stepStates[stepIndex] != 'waiting':
+                continue
+            upstreamSteps = [self.steps[i] for i in self.upstreamSteps[stepIndex]]
+            upstreamStates = [self.stepStates[i] for i in self.upstreamSteps[stepIndex]]
+            if 'abandoned' in upstreamStates:
+                self.abandonStep(stepIndex, Lang.get('a step it depends on has been abandoned'))
+                continue
+            if 'waiting' in upstreamStates:
+                continue
+            if step.config.opt['accumulateData'] and len(upstreamSteps) > 0:
+                if not(all(upstreamStep.isProcessingComplete() for upstreamStep in upstreamSteps)):
+                    continue
+                failedFileNum = sum(len(upstreamStep.failedFiles) for upstreamStep in upstreamSteps)
+                if failedFileNum > 0:
+                    self.abandonStep(stepIndex, Lang.get('{} input files could not be produced').format(failedFileNum))
+                    continue
+
+            if len(upstreamSteps) > 0:
+                outputFiles, pendingOutputFiles = [], set()
+                for upstreamStep in upstreamSteps:
+                    stepOutputFiles, stepPendingOutputFiles = upstreamStep.getPlannedOutputFiles()
+                    outputFiles += stepOutputFiles
+                    pendingOutputFiles.update(stepPendingOutputFiles)
+                step.config.opt['inputFiles'] = self.selectInputFiles(step, outputFiles)
+                step.pendingInputFiles = set()
+                if not(step.config.opt['accumulateData']):
+                    step.pendingInputFiles = pendingOutputFiles.intersection(step.config.opt['inputFiles'])
+
+            self.stepStates[stepIndex] = 'started'
+            # overrides have been applied already; the start of the pipeline has been reported once for all steps
+            if not(step.queueTasks()):
+                self.abandonStep(stepIndex, Lang.get('the step could not be started'))
+                continue
+            self.stepsByRunId[step.runId] = step
+
+
+    @staticmethod
+    def selectInputFiles(step, outputFiles):
+        """
+        :param outputFiles: output files of the steps the given step depends on
+        :return: those files the step takes: all of them if the step accumulates, the files whose names match its
+        inputRegexPattern otherwise
+        """
+        if step.config.opt['accumulateData']:
+            return list(outputFiles)
+        try:
+            inputRegex = re.compile(step.config.opt['inputRegexPattern'])
+        except re.error:
+            # reported by the preflight checks of the step
+            return list(outputFiles)
+        return [filePath for filePath in outputFiles if inputRegex.match(os.path.basename(filePath))]
+
+
+    def abandonStep(self, stepIndex, reason):
+        """
+        Does not start the given step; steps depending on it are abandoned as well once they are due
+        """
+        self.gui.err(Lang.get('Pipeline skips step {} ({}): {}').format(stepIndex + 1, self.stepNames[stepIndex],
+                                                                        reason))
+        self.stepStates[stepIndex] = 'abandoned'
+
+
+    def getEstimatedTaskDuration(self, stepIndex):
+        """
+        :return: mean duration of the tasks of the step completed so far; the estimate of the pipeline definition as
+        long as none has been completed
+        """
+        totalDuration, taskNum = self.observedTaskDurations[stepIndex]
+        if taskNum == 0:
+            return self.estimatedTaskDurations[stepIndex]
+        return totalDuration / taskNum
+
+
+    def updateStepRanks(self):
+        """
+        Ranks steps by the expected duration of a file passing through the step and all steps depending on it
+        """
+        self.stepRanks = [0.0] * len(self.steps)
+        for stepIndex in range(len(self.steps) - 1, -1, -1):
+            downstreamRanks = [self.stepRanks[i] for i in range(stepIndex + 1, len(self.steps))
+                               if stepIndex in self.upstreamSteps[i]]
+            self.stepRanks[stepIndex] = self.getEstimatedTaskDuration(stepIndex) + max(downstreamRanks + [0.0])
+
+
+    def planTaskRanks(self):
+        """
+        Plans the task graph of the run (@see planTaskGraph), whose ranks order the jobs of all steps
+        """
+        try:
+            self.taskGraph = self.planTaskGraph()
+        except ValueError:
+            # reported by the preflight checks of the step; its jobs are ranked by their step
+            self.taskGraph = None
+        self.taskRanks, self.rankedTaskDurations = {}, []
+        self.updateTaskRanks()
+
+
+    def updateTaskRanks(self):
+        """
+        Ranks each task by its expected duration and the longest chain of tasks depending on it (@see
+        TaskGraph.getRanks), based on the task durations observed so far. This takes a pass over the whole graph, so
+        tasks are only ranked again once the estimate of a step has changed by more than rerankThreshold; jobs waiting
+        for a worker are reordered then.
+        """
+        durations = [self.getEstimatedTaskDuration(stepIndex) for stepIndex in range(len(self.steps))]
+        if self.taskGraph is None or (len(self.rankedTaskDurations) == len(durations) and all(
+                abs(duration - rankedDuration) <= self.rerankThreshold * rankedDuration
+                for duration, rankedDuration in zip(durations, self.rankedTaskDurations))):
+            return
+        self.rankedTaskDurations = durations
+        for task in self.taskGraph.tasks:
+            if not(task['skipped']):
+                task['duration'] = durations[task['step']]
+        self.taskRanks = dict(((task['step'], task['outputFile']), rank)
+                              for task, rank in zip(self.taskGraph.tasks, self.taskGraph.getRanks()))
+        # jobs taken back from the workers keep going first @see pauseProcessing
+        self.readyJobs = [(rank if rank == float('-inf') else -self.getJobRank(stepIndex, job), seq, stepIndex, job)
+                          for rank, seq, stepIndex, job in self.readyJobs]
+        heapq.heapify(self.readyJobs)
+
+
+    def getJobRank(self, stepIndex, job):
+        """
+        :return: rank of the job's task; that of its step if the task is not part of the task graph
+        """
+        return self.taskRanks.get((stepIndex, job[3]), self.stepRanks[stepIndex])
+
+
+    def dispatchJob(self, step, job):
+        """
+        Jobs of all steps wait here until a worker is about to become free; then the job with the highest rank (longest
+        critical path of tasks depending on it) is passed on, rather than the oldest one. Among jobs of the same rank,
+        the oldest one goes first.
+        @see BatchProcessor.dispatchJob
+        """
+        stepIndex = self.steps.index(step)
+        heapq.heappush(self.readyJobs, (-self.getJobRank(stepIndex, job), self.dispatchedJobSeq, stepIndex, job))
+        self.dispatchedJobSeq += 1
+        self.fillTaskQueue()
+
+
+    def fillTaskQueue(self):
+        """
+        Passes on as many jobs as the workers can take at once; jobs already passed on cannot be reordered anymore
+        """
+        filesPerInvocation = max([int(step.config.opt.get('filesPerInvocation', 1) or 1)
+                                  for step in self.getStartedSteps()] + [1])
+        capacity = max(1, self.workerPool.getWorkerCount()) * filesPerInvocation
+        while not(self.paused) and len(self.readyJobs) > 0 and self.dispatchedJobNum < capacity:
+            rank, seq, stepIndex, job = heapq.heappop(self.readyJobs)
+            self.workerPool.taskQueue.put(job)
+            self.dispatchedJobNum += 1
+
+
+    def planTaskGraph(self):
+        """
+        Builds the graph of all tasks of the pipeline without processing any file (dry run): input files of the steps
+        are derived from the planned output files of the steps they depend on, outputs which are up to date are marked
+        as skipped.
+        raises ValueError if the input files of a step cannot be analysed
+        :return: TaskGraph
+        """
+        self.applyOverrides()
+        graph = TaskGraph()
+        outputFilesByStep = []
+        for stepIndex, step in enumerate(self.steps):
+            opt = step.config.opt
+            inputFiles = opt['inputFiles']
+            if len(self.upstreamSteps[stepIndex]) > 0:
+                inputFiles = self.selectInputFiles(step, [filePath for i in self.upstreamSteps[stepIndex]
+                                                          for filePath in outputFilesByStep[i]])
+            duration = self.getEstimatedTaskDuration(stepIndex)
+
+            if opt['accumulateData']:
+                outputFiles = []
+                if len(inputFiles) > 0:
+                    levels = step.planAccumulation(inputFiles)
+                    for level in levels:
+                        for (levelInputFiles, outputFilePath) in level:
+                            graph.addTask(stepIndex, levelInputFiles, outputFilePath, duration)
+                    outputFiles = [levels[-1][0][1]]
+                outputFilesByStep.append(outputFiles)
+                continue
+
+            try:
+                analysis = FileNameAnalysis.fromConfiguration(step.config).analyse(inputFiles)
+            except re.error as e:
+                raise ValueError(Lang.get('Invalid regular expression: ') + str(e))
+            manifest = None
+            if opt.get('skipUpToDateFiles', True) and not(opt['simulateProcessing']) and \
+                    os.path.isdir(opt['outputDir']) and step.compileTemplate() is None:
+                manifest = RunManifest(opt['outputDir'])
+            for entry in analysis.entries:
+                # files produced by the pipeline itself are new
+                skipped = manifest is not None and not(graph.isProduced(entry['inputFile'])) and \
+                          manifest.isUpToDate(entry['inputFile'], entry['outputFile'], step.template.contentHash,
+                                              entry['placeholders'])
+                graph.addTask(stepIndex, [entry['inputFile']], entry['outputFile'], duration, skipped)
+            outputFilesByStep.append([entry['outputFile'] for entry in analysis.entries])
+        return graph
+
+
+    def getPlannedWorkerCount(self):
+        opt = self.steps[0].config.opt
+        return self.workerPool.resolveWorkerCount(opt.get('workerCount', 0) or self.workerPool.defaultWorkerCount)
+
+
+    def getStepName(self, step):
+        stepIndex = self.steps.index(step)
+        return Lang.get('Step {} ({})').format(stepIndex + 1, self.stepNames[stepIndex])
+
+
+    def getStartedSteps(self):
+        return [step for step in self.steps if step.runId in self.stepsByRunId]
+
+
+    def handleTaskCompletion(self, step, task, succeeded):
+        """
+        Passes output files on to the steps depending on the given one as soon as they have been produced; steps only
+        take the files matching their inputRegexPattern
+        """
+        stepIndex = self.steps.index(step)
+        for downstreamIndex in range(stepIndex + 1, len(self.steps)):
+            downstreamStep = self.steps[downstreamIndex]
+            if stepIndex in self.upstreamSteps[downstreamIndex] and downstreamStep.runId in self.stepsByRunId:
+                downstreamStep.releaseInputFile(task['outputFile'], succeeded)
+
+
+    def handleEvent(self, event):
+        """
+        :return: False if the event is outdated and has been ignored
+        """
+        step = self.stepsByRunId.get(event['runId'])
+        if step is None:
+            return False
+        if event['type'] == 'started':
+            # a worker took a job; pass on the next one
+            self.dispatchedJobNum = max(0, self.dispatchedJobNum - 1)
+        if not(step.handleEvent(event)):
+            self.fillTaskQueue()
+            return False
+        if event['type'] == 'finished':
+            stepIndex = self.steps.index(step)
+            self.observedTaskDurations[stepIndex][0] += event['duration'] / event.get('batchSize', 1)
+            self.observedTaskDurations[stepIndex][1] += 1
+            self.updateStepRanks()
+            self.updateTaskRanks()
+        self.startReadySteps()
+        self.fillTaskQueue()
+        return True
+
+
+    def superviseWorkers(self):
+        """
+        @see BatchProcessor.superviseWorkers; workers are shared by all steps
+        """
+        # steps may have been completed without any event (i.e. if none of their input files has been produced)
+        self.startReadySteps()
+        steps = self.getStartedSteps()
+        abandonedWorkers = {}
+        for step in steps:
+            step.queueDueRetries()
+            abandonedWorkers.update(step.getTimedOutWorkers())
+        for workerId in abandonedWorkers:
+            self.workerPool.restartWorker(workerId)
+        for workerId in self.workerPool.replaceDeadWorkers():
+            abandonedWorkers.setdefault(workerId, Lang.get('Worker terminated unexpectedly'))
+        for step in steps:
+            step.abandonTasks(abandonedWorkers)
+
+
+    def isProcessingComplete(self):
+        return 'waiting' not in self.stepStates and \
+               all(step.isProcessingComplete() for step in self.getStartedSteps())
+
+
+    def pauseProcessing(self):
+        """
+        @see BatchProcessor.pauseProcessing; jobs taken back from the workers keep their order and go before all others
+        """
+        if self.paused:
+            return
+        self.paused = True
+        returnedJobs = self.workerPool.takeQueuedTasks()
+        self.returnedJobSeq -= len(returnedJobs)
+        for index, job in enumerate(returnedJobs):
+            # they had the highest rank when they were passed on
+            stepIndex = self.steps.index(self.stepsByRunId[job[0]])
+            heapq.heappush(self.readyJobs, (float('-inf'), self.returnedJobSeq + index, stepIndex, job))
+        self.dispatchedJobNum = 0
+
+
+    def resumeProcessing(self):
+        self.paused = False
+        self.fillTaskQueue()
+
+
+    def cancelProcessing(self):
+        """
+        @see BatchProcessor.cancelProcessing; steps which have not been started yet are abandoned
+        """
+        self.paused = False
+        self.readyJobs = []
+        self.dispatchedJobNum = 0
+        for step in self.getStartedSteps():
+            step.cancelProcessing()
+        self.stepStates = ['abandoned' if state == 'waiting' else state for state in self.stepStates]
+
+
+    def getWorkerStatus(self):
+        """
+        @see BatchProcessor.getWorkerStatus; the workers are shared by all steps
+        """
+        status = {}
+        for step in self.getStartedSteps():
+            for workerId, stepStatus in step.getWorkerStatus().items():
+                workerStatus = status.setdefault(workerId, dict(stepStatus, completedTasks=0))
+                workerStatus['completedTasks'] += stepStatus['completedTasks']
+                if stepStatus['inputFile'] is not None:
+                    workerStatus.update(inputFile=stepStatus['inputFile'], startTime=stepStatus['startTime'],
+                                        taskNum=stepStatus['taskNum'])
+        return status
+
+
+    def pollEvents(self):
+        """
+        @see BatchProcessor.pollEvents
+        """
+        self.superviseWorkers()
+        self.transferLogQueue()
+        try:
+            while not(self.isProcessingComplete()):
+                self.handleEvent(self.workerPool.eventQueue.get_nowait())
+        except queue.Empty:
+            pass
+        return self.isProcessingComplete()
+
+
+    def iterateEvents(self):
+        """
+        @see BatchProcessor.iterateEvents
+        """
+        while not(self.isProcessingComplete()):
+            self.superviseWorkers()
+            self.transferLogQueue()
+            try:
+                event = self.workerPool.eventQueue.get(True, BatchProcessor.supervisionInterval)
+            except queue.Empty:
+                continue
+            if self.handleEvent(event):
+                yield event
+
+
+    def transferLogQueue(self):
+        """
+        @see BatchProcessor.transferLogQueue; records are written to the log of the step they belong to
+        """
+        while True:
+            try:
+                record = self.workerPool.logQueue.get_nowait()
+            except queue.Empty:
+                return
+            step = self.stepsByRunId.get(record.pop('runId', None))
+            if step is not None:
+                step.executionLog.write(record)
+
+
+    def tailLog(self, recordNum = None, filterText = '', minLevel = 'info'):
+        """
+        @see BatchProcessor.tailLog; records of all steps, by time
+        """
+        records = []
+        for step in self.getStartedSteps():
+            records += step.tailLog(recordNum, filterText, minLevel)
+        records.sort(key=lambda record: record['time'])
+        return records if recordNum is None else records[-recordNum:]
+
+
+    def saveExecutionLog(self, filePath):
+        """
+        Exports the logs of all steps one after the other
+        """
+        with io.open(filePath, 'w', encoding='utf-8') as f:
+            for step in self.getStartedSteps():
+                f.write(self.getStepName(step) + ':\n')
+                step.executionLog.export(f)
+
+
+    def finishProcessing(self):
+        self.transferLogQueue()
+        for step in self.getStartedSteps():
+            self.completedMessages.append(self.getStepName(step) + ':')
+            step.finishProcessing()
+        self.gui.resetProgress()
+        msg = Lang.get('Pipeline completed in {:.2f} seconds').format(time.time() - self.startTime)
+        self.gui.showInfo(Lang.get('Processing completed'), os.linesep.join([msg] + self.completedMessages))
+
+
+    def runProcessing(self):
+        """
+        Blocks until all steps have been processed
+        """
+        if not(self.startProcessing()):
+            return False
+        for event in self.iterateEvents():
+            pass
+        self.finishProcessing()
+        return True
+
+
+    # Frontend interface used by the steps
+    # ----------------------------------------------------------------------------------------------------------------
+    def GUIToConfig(self):
+        # overrides of the frontend have been applied by startProcessing already
+        pass
+
+
+    def updateConfigGUI(self):
+        pass
+
+
+    def showProgress(self, processedFiles, totalFiles, remainingTime):
+        """
+        Sums up the progress of all steps started so far; the remaining work of all steps is spread over the shared
+        workers. Steps which have not completed any task yet are estimated by the model of another step.
+        """
+        steps = self.getStartedSteps()
+        processedFiles = sum(step.completedTasks for step in steps)
+        totalFiles = sum(step.totalFileNum for step in steps)
+        if totalFiles == 0:
+            # only steps whose files are all up to date have been started so far
+            return
+        models = [step.remainingTimeEstimator.getModel() for step in steps]
+        model = next((model for model in models if model is not None), None)
+        now = time.time()
+        remainingTime = RemainingTimeEstimator.combine(
+            [step.remainingTimeEstimator.getRemainingWork(now, model) for step in steps],
+            self.workerPool.getWorkerCount())
+        self.gui.showProgress(processedFiles, totalFiles, remainingTime)
+
+
+    def resetProgress(self):
+        pass
+
+
+    def showInfo(self, title, msg):
+        # collected for the summary shown once all steps have been completed
+        self.completedMessages.append(msg)
+
+
+    def showDebuggingInformation(self, debuggingInfo):
+        self.gui.showDebuggingInformation(debuggingInfo)
+
+
+    def warn(self, warnMsg):
+        self.gui.warn(warnMsg)
+
+
+    def err(self, errMsg):
+        self.gui.err(errMsg)
@@ -0,0 +1,41 @@
+import re
+
+class PlaceholderPattern:
+    """
+    Text containing placeholders of the form <name1>, <name2> ... (i.e. a command of the syntax template or the output
+    file pattern). The text is tokenised once; afterwards, all placeholders are filled in a single pass. As every
+    placeholder is looked up exactly once, the result does not depend on the order of the placeholder definitions.
+    """
+
+    namedGroupPattern = re.compile(r'<(\w*)>')
+
+    def __init__(self, text):
+        self.text = text
+        # alternating literal text and placeholder names, starting and ending with literal text (possibly empty):
+        # literal, name, literal, name, ..., literal
+        self.parts = self.namedGroupPattern.split(text)
+        self.names = self.parts[1::2]
+
+
+    def hasPlaceholders(self):
+        return len(self.parts) > 1
+
+
+    def substitute(self, values, undefined = None):
+        """
+        Fills in the placeholders
+        :param values: dictionary placeholder name => substitute
+        :param undefined: set; if given, names of placeholders without value are added. Those placeholders are kept
+        as they are.
+        :return: resulting text
+        """
+        parts = self.parts[:]
+        for i in range(1, len(parts), 2):
+            name = parts[i]
+            if name in values:
+                parts[i] = values[name]
+            else:
+                parts[i] = '<' + name + '>'
+                if undefined is not None:
+                    undefined.add(name)
+        return ''.join(parts)
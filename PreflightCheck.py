@@ -0,0 +1,196 @@
+import os
+import shutil
+
+#project imports
+from Lang import Lang
+from PlaceholderPattern import PlaceholderPattern
+
+class PreflightCheck:
+    """
+    Validates a whole job before any task is queued, so that runs which are bound to fail do not use up engine time:
+    input files exist and match the inputRegexPattern, all placeholders of the syntax and of the output file pattern
+    resolve, output files do not collide, output directories are writable and there is enough free disk space.
+    All problems are collected into one report; only file system metadata is read (no file contents).
+    """
+
+    """
+    Factor applied to the expected output size when checking the free disk space
+    """
+    diskSpaceMargin = 1.1
+
+    def __init__(self, config, fileNameAnalysis = None, template = None, pendingInputFiles = ()):
+        """
+        :param fileNameAnalysis: FileNameAnalysis of the input files; None if their names are not analysed
+        (accumulation)
+        :param template: SyntaxTemplate; None if the syntax is generated (accumulation)
+        :param pendingInputFiles: input files which are still to be produced by the previous step of a Pipeline; those
+        need not exist yet
+        """
+        self.config = config
+        self.fileNameAnalysis = fileNameAnalysis
+        self.template = template
+        self.pendingInputFiles = pendingInputFiles
+        # (message, list of affected files); the list may be empty
+        self.errors = []
+        self.warnings = []
+        # total size of all input files in bytes
+        self.inputSize = 0
+
+
+    def addError(self, message, filePaths = ()):
+        self.errors.append((message, list(filePaths)))
+
+
+    def addWarning(self, message, filePaths = ()):
+        self.warnings.append((message, list(filePaths)))
+
+
+    def hasErrors(self):
+        return len(self.errors) > 0
+
+
+    def run(self):
+        self.checkInputFiles()
+        if self.fileNameAnalysis is not None:
+            for message, filePaths in self.fileNameAnalysis.getErrors():
+                self.addError(message, filePaths)
+            self.checkTemplatePlaceholders()
+            self.checkCaptureFilePattern()
+            self.checkOutputCollisions()
+        self.checkDirectories()
+        self.checkDiskSpace()
+        return self
+
+
+    def checkInputFiles(self):
+        missingFiles = []
+        for inputFilePath in self.config.opt['inputFiles']:
+            if inputFilePath in self.pendingInputFiles:
+                continue
+            try:
+                self.inputSize += os.stat(inputFilePath).st_size
+            except OSError:
+                missingFiles.append(inputFilePath)
+        if len(missingFiles) > 0:
+            self.addError(Lang.get('Input files do not exist'), missingFiles)
+
+
+    def checkTemplatePlaceholders(self):
+        """
+        Placeholders of the syntax which are not defined for a file would be kept as they are. Unless the syntax uses
+        "<...>" for other purposes (@see Configuration.opt['allowUndefinedPlaceholders']), this is an error.
+        """
+        if self.template is None:
+            return
+        placeholderNames = self.template.getPlaceholderNames()
+        # undefined placeholders => affected files
+        undefinedPlaceholders = {}
+        for entry in self.fileNameAnalysis.entries:
+            undefined = placeholderNames.difference(entry['placeholders'], ['OUTPUTFILE'])
+            if len(undefined) > 0:
+                undefinedPlaceholders.setdefault(tuple(sorted(undefined)), []).append(entry['inputFile'])
+        for names, filePaths in undefinedPlaceholders.items():
+            message = Lang.get('Undefined placeholders in syntax: ') + ', '.join(names)
+            if self.config.opt.get('allowUndefinedPlaceholders', False):
+                self.addWarning(message, filePaths)
+            else:
+                self.addError(message + ' ' + Lang.get('(allow undefined placeholders if the syntax uses "<...>" literally)'),
+                              filePaths)
+
+
+    def checkCaptureFilePattern(self):
+        """
+        Capture files are named by the placeholders of each file, like the output files (@see OutputCapture)
+        """
+        if self.config.opt['simulateProcessing'] or self.config.opt.get('defaultCaptureOutputOutDir', 'none') in ('', 'none'):
+            return
+        names = set(PlaceholderPattern(self.config.opt.get('captureFilePattern', '<fileName>.log')).names)
+        undefinedFiles = [entry['inputFile'] for entry in self.fileNameAnalysis.entries
+                          if len(names.difference(entry['placeholders'], ['OUTPUTFILE'])) > 0]
+        if len(undefinedFiles) > 0:
+            self.addError(Lang.get('Capture file pattern refers to a placeholder which has not been defined'),
+                          undefinedFiles)
+
+
+    def checkOutputCollisions(self):
+        inputFiles = set(os.path.normcase(os.path.abspath(entry['inputFile']))
+                         for entry in self.fileNameAnalysis.entries)
+        # output file => input files
+        outputFiles = {}
+        overwrittenInputFiles = []
+        for entry in self.fileNameAnalysis.entries:
+            outputFile = os.path.normcase(os.path.abspath(entry['outputFile']))
+            outputFiles.setdefault(outputFile, []).append(entry['inputFile'])
+            if outputFile in inputFiles:
+                overwrittenInputFiles.append(entry['inputFile'])
+
+        collisions = [outputFile + ' <= ' + ', '.join(filePaths) for outputFile, filePaths in outputFiles.items()
+                      if len(filePaths) > 1]
+        if len(collisions) > 0:
+            self.addError(Lang.get('Several input files are mapped onto the same output file'), collisions)
+        if len(overwrittenInputFiles) > 0:
+            self.addError(Lang.get('Output files would overwrite input files'), overwrittenInputFiles)
+
+
+    def checkDirectories(self):
+        directories = [('outputDir', Lang.get('Output directory'))]
+        if not(self.config.opt['simulateProcessing']):
+            directories += [('defaultCaptureOutputOutDir', Lang.get('Output capture directory')),
+                            ('defaultSyntaxOutDir', Lang.get('Syntax output directory'))]
+        for key, name in directories:
+            directory = self.config.opt.get(key, '')
+            if key != 'outputDir' and directory in ('', 'none'):
+                continue
+            if not(os.path.isdir(directory)):
+                self.addError(name + ' ' + Lang.get('does not exist: ') + directory)
+            elif not(os.access(directory, os.W_OK)):
+                self.addError(name + ' ' + Lang.get('is not writable: ') + directory)
+
+
+    def getExpectedOutputSize(self):
+        """
+        Output files are assumed to be about as large as their input files; accumulation additionally stores
+        partial files
+        """
+        if self.config.opt['accumulateData']:
+            return 2 * self.inputSize
+        return self.inputSize
+
+
+    def checkDiskSpace(self):
+        if self.config.opt['simulateProcessing'] or not(os.path.isdir(self.config.opt['outputDir'])):
+            return
+        requiredSpace = self.getExpectedOutputSize() * self.diskSpaceMargin
+        freeSpace = shutil.disk_usage(self.config.opt['outputDir']).free
+        if requiredSpace > freeSpace:
+            self.addError(Lang.get('Not enough free disk space in output directory: {:.0f} MB expected, {:.0f} MB available').format(
+                requiredSpace / 2**20, freeSpace / 2**20))
+
+
+    @staticmethod
+    def formatProblems(problems, maxFilesPerProblem = 20):
+        """
+        :param maxFilesPerProblem: number of files listed per problem; further files are only counted
+        """
+        lines = []
+        for message, filePaths in problems:
+            if len(filePaths) == 0:
+                lines.append(message)
+                continue
+            lines.append(message.rstrip().rstrip(':') + ' ({}):'.format(len(filePaths)))
+            lines += ['    ' + filePath for filePath in filePaths[:maxFilesPerProblem]]
+            if len(filePaths) > maxFilesPerProblem:
+                lines.append('    ' + Lang.get('... and {} more').format(len(filePaths) - maxFilesPerProblem))
+        return os.linesep.join(lines)
+
+
+    def getReport(self):
+        """
+        One message covering all errors and warnings
+        """
+        sections = []
+        if len(self.errors) > 0:
+            sections.append(Lang.get('Preflight check failed:') + os.linesep + self.formatProblems(self.errors))
+        if len(self.warnings) > 0:
+            sections.append(Lang.get('Warnings:') + os.linesep + self.formatProblems(self.warnings))
+        return (os.linesep + os.linesep).join(sections)
@@ -0,0 +1,84 @@
+import os
+import queue
+import threading
+import time
+import traceback
+
+#project imports
+from Lang import Lang
+
+class ProcessingThread(threading.Thread):
+    """
+    Runs a BatchProcessor or a Pipeline in a thread of its own, so the GUI stays responsive however long it takes to
+    check, queue and validate the files. The processor reports to a FrontendChannel, which the GUI consumes from within
+    tkinter's main loop; commands (pause, resume, cancel) take the opposite direction and are carried out by this
+    thread between handling events, as the processor is not thread safe.
+    """
+
+    """
+    Seconds to wait for a command before handling the workers' events again
+    """
+    pollingInterval = 0.05
+
+    """
+    Seconds between reports of the workers' status
+    """
+    statusInterval = 0.25
+
+    def __init__(self, processor, channel):
+        """
+        :param processor: BatchProcessor or Pipeline; its frontend has to be the channel
+        :param channel: FrontendChannel
+        """
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.processor = processor
+        self.channel = channel
+        # names of the processor's methods to call
+        self.commands = queue.Queue()
+
+
+    def pause(self):
+        self.commands.put('pauseProcessing')
+
+
+    def resume(self):
+        self.commands.put('resumeProcessing')
+
+
+    def cancel(self):
+        self.commands.put('cancelProcessing')
+
+
+    def run(self):
+        """
+        Posts 'processingFinished' when done, whether processing could be started or not
+        """
+        try:
+            if self.processor.startProcessing():
+                self.handleEvents()
+                self.processor.finishProcessing()
+        except Exception:
+            self.channel.err(Lang.get('Processing has been aborted due to an internal error:') + os.linesep +
+                             traceback.format_exc())
+            try:
+                self.processor.cancelProcessing()
+            except Exception:
+                pass
+        finally:
+            self.channel.post('processingFinished')
+
+
+    def handleEvents(self):
+        lastStatusTime = 0.0
+        while not(self.processor.pollEvents()):
+            now = time.time()
+            if now - lastStatusTime >= self.statusInterval:
+                self.channel.showWorkerStatus(self.processor.getWorkerStatus(), self.processor.paused)
+                lastStatusTime = now
+            try:
+                command = self.commands.get(True, self.pollingInterval)
+            except queue.Empty:
+                continue
+            getattr(self.processor, command)()
+            self.channel.showWorkerStatus(self.processor.getWorkerStatus(), self.processor.paused)
@@ -0,0 +1,321 @@
+import bisect
+import collections
+import math
+
+class RemainingTimeEstimator:
+    """
+    Estimates the remaining time of a run from the tasks still to be processed, rather than by extrapolating the
+    average so far: the duration of a task is modelled as a fixed cost plus a cost per input byte (engine start vs.
+    data), fitted by least squares to all tasks completed so far, and scaled to match a moving window of recently
+    completed tasks. The window follows changes of the throughput (i.e. a slowing network share); the durations of
+    completed tasks already reflect the contention between parallel workers.
+    The remaining work (worker seconds) is spread over the workers which can still be kept busy, i.e. at most one per
+    remaining task; as workers do not run out of tasks at the same time, the run ends later than the remaining work
+    divided by the workers (tail: the longest of the workers' last tasks, drawn from the recent task durations), and
+    not before the longest of the running tasks, each of which may take longer or shorter than expected. The confidence interval follows from the
+    scatter of the window's durations around the model, relative to the expected duration (larger files scatter more;
+    tasks are assumed to vary independently), the uncertainty of the model itself (the window's scale, and the cost
+    per byte extrapolated to the sizes of the remaining files), the drift of the throughput seen so far (throughput
+    which has changed may change again) and that of the tail.
+    @see benchmarks/remainingTimeEstimation.py for the error and the coverage of the interval on run traces.
+    Tasks are identified by any key (the BatchProcessor uses their output files).
+    """
+
+    """
+    Number of recently completed tasks the model is fitted to
+    """
+    windowSize = 50
+
+    """
+    Number of completed tasks needed before the cost per byte is fitted; until then every task is assumed to take the
+    average time (a line through very few tasks extrapolates wildly to files of other sizes)
+    """
+    minFitSize = 5
+
+    """
+    Quantile of the normal distribution for the confidence interval (95%)
+    """
+    z = 1.96
+
+    """
+    Number of steps the distribution of the tail is integrated in (@see getTail)
+    """
+    tailSteps = 100
+
+    def __init__(self):
+        # key => input bytes (None if not known yet) of all tasks ever added
+        self.weights = {}
+        # keys of tasks to be processed, including running ones
+        self.pendingTasks = set()
+        # number, sum and sum of squares of the known input sizes of the pending tasks; kept up to date instead of
+        # iterating over all pending tasks whenever the progress is shown
+        self.knownPendingNum = 0
+        self.pendingWeightSum = 0
+        self.pendingWeightSquareSum = 0
+        # key => start time of running tasks
+        self.runningTasks = {}
+        # (input bytes, duration) of recently completed tasks
+        self.window = collections.deque(maxlen=self.windowSize)
+        # number, sum of input bytes, of durations, of squared bytes and of bytes times duration of all completed tasks
+        self.totals = [0, 0.0, 0.0, 0.0, 0.0]
+        self.model = None
+
+
+    def addTask(self, key, inputBytes = None):
+        """
+        Adds a task to be processed, or a task to be processed again
+        :param inputBytes: size of the input; None keeps the size known already (if any) and otherwise assumes an
+        average task (i.e. input files which are still to be produced)
+        """
+        self.removeTask(key)
+        if inputBytes is not None or key not in self.weights:
+            self.weights[key] = inputBytes
+        self.pendingTasks.add(key)
+        self.updatePendingWeights(self.weights[key], 1)
+
+
+    def updatePendingWeights(self, weight, sign):
+        if weight is not None:
+            self.knownPendingNum += sign
+            self.pendingWeightSum += sign * weight
+            self.pendingWeightSquareSum += sign * weight ** 2
+
+
+    def removeTask(self, key):
+        """
+        Drops a task which will not be processed (i.e. skipped, or its input could not be produced)
+        """
+        if key in self.pendingTasks:
+            self.pendingTasks.remove(key)
+            self.updatePendingWeights(self.weights[key], -1)
+        self.runningTasks.pop(key, None)
+
+
+    def startTask(self, key, startTime):
+        self.runningTasks[key] = startTime
+
+
+    def finishTask(self, key, duration, completed = True):
+        """
+        :param duration: time the task took; tasks processed by a single engine invocation share the duration of their
+        batch, which should be divided by its size. None if the attempt does not tell (i.e. it failed).
+        :param completed: False if the task will be processed again (i.e. retried)
+        """
+        self.runningTasks.pop(key, None)
+        if completed:
+            self.removeTask(key)
+        if duration is not None and self.weights.get(key) is not None:
+            inputBytes = self.weights[key]
+            self.window.append((inputBytes, duration))
+            for index, value in enumerate([1, inputBytes, duration, inputBytes ** 2, inputBytes * duration]):
+                self.totals[index] += value
+            self.model = None
+
+
+    def getModel(self):
+        """
+        :return: dictionary; None if no task has been completed yet. 'fixedCost', 'costPerByte': the model,
+        'relativeDeviation': standard deviation of the durations around the model relative to the expected duration,
+        'sampleNum': effective number of tasks the scale of the model is based on, 'slopeVariance': variance of the cost per byte,
+        'meanBytes': mean input size of the tasks the model has been scaled to, 'drift': relative change of the durations in
+        the window compared to all tasks, 'durations': durations of the tasks in the window
+        """
+        if self.model is not None or len(self.window) == 0:
+            return self.model
+        n, sumBytes, sumDurations, sumBytesSquares, sumProducts = self.totals
+        meanBytes, meanDuration = sumBytes / n, sumDurations / n
+        varianceBytes = sumBytesSquares - n * meanBytes ** 2
+        fixedCost, costPerByte, slopeVariance = meanDuration, 0.0, 0.0
+        if varianceBytes > 0 and n >= self.minFitSize:
+            costPerByte = (sumProducts - n * meanBytes * meanDuration) / varianceBytes
+            fixedCost = meanDuration - costPerByte * meanBytes
+            # larger files scatter more; the variance is robust to that (sandwich estimate, from the window's residuals)
+            slopeVariance = n * sum(((inputBytes - meanBytes) * (duration - fixedCost - costPerByte * inputBytes)) ** 2
+                                    for inputBytes, duration in self.window) / len(self.window) / varianceBytes ** 2
+            slopeError = math.sqrt(slopeVariance)
+            if costPerByte < self.z * slopeError:
+                # larger files are not (significantly) slower, i.e. sizes vary too little yet; a slope fitted to the
+                # noise would extrapolate wildly to the sizes of the remaining files
+                fixedCost, costPerByte = meanDuration, 0.0
+            elif fixedCost < 0:
+                fixedCost, costPerByte = 0.0, meanDuration / meanBytes
+
+        # the window tells how much slower (or faster) tasks are now than on average
+        windowDurations = sum(duration for inputBytes, duration in self.window)
+        windowExpected = sum(fixedCost + costPerByte * inputBytes for inputBytes, duration in self.window)
+        scale = windowDurations / windowExpected if windowExpected > 0 else 1.0
+        fixedCost, costPerByte, slopeVariance = fixedCost * scale, costPerByte * scale, slopeVariance * scale ** 2
+        expectedDurations = [(fixedCost + costPerByte * inputBytes, duration) for inputBytes, duration in self.window]
+        relativeResiduals = [(duration - expected) / expected for expected, duration in expectedDurations
+                             if expected > 0]
+        # with a single sample, there is no scatter to go by; assume it varies by its own magnitude
+        relativeDeviation = 1.0
+        if len(relativeResiduals) > 1:
+            relativeDeviation = math.sqrt(sum(residual ** 2 for residual in relativeResiduals) /
+                                          (len(relativeResiduals) - 1))
+        # the scale is dominated by the longest tasks of the window; they count as fewer samples than there are tasks
+        expectedSum = sum(expected for expected, duration in expectedDurations)
+        sampleNum = expectedSum ** 2 / sum(expected ** 2 for expected, duration in expectedDurations) \
+            if expectedSum > 0 else len(self.window)
+        self.model = {'fixedCost': fixedCost, 'costPerByte': costPerByte, 'relativeDeviation': relativeDeviation,
+                      'sampleNum': sampleNum, 'slopeVariance': slopeVariance,
+                      'meanBytes': sum(inputBytes for inputBytes, duration in self.window) / len(self.window),
+                      'drift': abs(scale - 1.0), 'durations': [duration for inputBytes, duration in self.window]}
+        return self.model
+
+
+    def getRemainingWork(self, now, model = None):
+        """
+        Takes time proportional to the number of running tasks only
+        :param model: model to use if none has been fitted yet (i.e. that of another step of a Pipeline)
+        :return: dictionary; None if the work cannot be estimated yet. 'workerSeconds': expected remaining work,
+        'variance': its variance, 'taskNum': number of remaining tasks, 'queuedWork', 'queuedSquares': sum of the
+        expected durations (and of their squares) of the tasks not started yet, 'runningTasks': list of (expected
+        remaining time, its standard deviation) of the running tasks, 'durations': sample of the durations of the
+        remaining tasks
+        """
+        model = self.getModel() or model
+        if model is None:
+            return None
+        fixedCost, costPerByte = model['fixedCost'], model['costPerByte']
+        taskNum = len(self.pendingTasks)
+        unknownNum = taskNum - self.knownPendingNum
+        averageWeight = self.pendingWeightSum / float(self.knownPendingNum) if self.knownPendingNum > 0 else 0.0
+        weightSum = self.pendingWeightSum + unknownNum * averageWeight
+        weightSquareSum = self.pendingWeightSquareSum + unknownNum * averageWeight ** 2
+        queuedWork = fixedCost * taskNum + costPerByte * weightSum
+        queuedSquares = fixedCost ** 2 * taskNum + 2 * fixedCost * costPerByte * weightSum + \
+                        costPerByte ** 2 * weightSquareSum
+
+        workerSeconds, runningSquares = queuedWork, 0.0
+        # (expected remaining time, its standard deviation) of the running tasks
+        runningTasks = []
+        for key, startTime in self.runningTasks.items():
+            if key not in self.pendingTasks:
+                continue
+            weight = self.weights[key] if self.weights[key] is not None else averageWeight
+            expected = fixedCost + costPerByte * weight
+            # tasks taking longer than expected are assumed to be about to complete
+            remaining = max(0.0, expected - (now - startTime))
+            workerSeconds -= expected - remaining
+            queuedWork -= expected
+            queuedSquares -= expected ** 2
+            runningTasks.append((remaining, model['relativeDeviation'] * expected))
+            runningSquares += remaining ** 2
+        # scatter of the single tasks
+        variance = model['relativeDeviation'] ** 2 * (max(0.0, queuedSquares) + runningSquares)
+        # uncertainty of the window's scale and drift of the throughput, which apply to all tasks alike
+        variance += (model['relativeDeviation'] ** 2 / model['sampleNum'] + model['drift'] ** 2) * workerSeconds ** 2
+        # uncertainty of the cost per byte, which grows with the distance of the remaining sizes from those the model has
+        # been scaled to
+        variance += model['slopeVariance'] * (weightSum - taskNum * model['meanBytes']) ** 2
+        # recent durations, scaled to the expected mean duration of the remaining tasks (i.e. if the largest files
+        # come last)
+        sampleMean = sum(model['durations']) / len(model['durations'])
+        meanDuration = (fixedCost * taskNum + costPerByte * weightSum) / taskNum if taskNum > 0 else sampleMean
+        durations = [duration * meanDuration / sampleMean for duration in model['durations']] if sampleMean > 0 \
+            else model['durations']
+        return {'workerSeconds': workerSeconds, 'variance': variance, 'taskNum': taskNum,
+                'queuedWork': max(0.0, queuedWork), 'queuedSquares': max(0.0, queuedSquares),
+                'runningTasks': runningTasks, 'durations': durations}
+
+
+    @classmethod
+    def combine(cls, remainingWork, workerCount):
+        """
+        :param remainingWork: list of results of getRemainingWork (of all steps sharing the workers); None entries
+        are ignored
+        :param workerCount: number of workers processing the tasks
+        :return: (remaining seconds, lower bound, upper bound of the confidence interval); None if no estimate is
+        available
+        """
+        remainingWork = [work for work in remainingWork if work is not None]
+        if len(remainingWork) == 0:
+            return None
+        total = lambda key: sum(work[key] for work in remainingWork)
+        taskNum = total('taskNum')
+        if taskNum == 0:
+            return 0.0, 0.0, 0.0
+        workerSeconds, queuedWork, queuedSquares = total('workerSeconds'), total('queuedWork'), total('queuedSquares')
+        longestTask, longestTaskVariance = cls.getLongestTask([task for work in remainingWork
+                                                               for task in work['runningTasks']])
+
+        # only as many workers as there are tasks left are busy
+        busyWorkers = max(1, min(workerCount, taskNum))
+        # workers do not run out of tasks at the same time; this only matters while tasks are waiting, the tasks
+        # being processed are accounted for by the longest of them
+        tail, tailVariance = 0.0, 0.0
+        if queuedWork > 0:
+            tail, tailVariance = cls.getTail([duration for work in remainingWork for duration in work['durations']],
+                                             busyWorkers)
+            share = min(1.0, queuedWork / max(workerSeconds, 1e-9))
+            tail, tailVariance = tail * share, tailVariance * share ** 2
+        remainingTime = workerSeconds / busyWorkers + tail
+        margin = cls.z * math.sqrt(total('variance') / busyWorkers ** 2 + tailVariance)
+        if longestTask > remainingTime:
+            # the run ends with the running tasks
+            remainingTime, margin = longestTask, cls.z * math.sqrt(longestTaskVariance)
+        return remainingTime, max(0.0, remainingTime - margin), remainingTime + margin
+
+
+    @classmethod
+    def getTail(cls, durations, workerCount):
+        """
+        Once the last task has been taken, each worker is still busy with its last task for a while: a task picked
+        with a probability proportional to its duration (longer tasks are more likely to be running at any moment),
+        of which a uniformly distributed part is left. The run ends with the longest of those rests, rather than after
+        their mean (which is part of the remaining work divided by the workers).
+        :param durations: sample of the durations of the tasks
+        :return: (expected time beyond the mean rest, variance of the longest rest)
+        """
+        durations = sorted(duration for duration in durations if duration > 0)
+        if workerCount <= 1 or len(durations) == 0:
+            return 0.0, 0.0
+        durationSum = sum(durations)
+        # partial sums of the durations up to each one
+        partialSums = [0.0]
+        for duration in durations:
+            partialSums.append(partialSums[-1] + duration)
+        # expected maximum (and its square) of the rests by integrating P(max > r) = 1 - F(r) ** workerCount
+        step = durations[-1] / cls.tailSteps
+        expectedMax, expectedMaxSquare = 0.0, 0.0
+        for index in range(cls.tailSteps):
+            rest = (index + 0.5) * step
+            # P(rest of a worker <= r): tasks shorter than r are done; longer ones have r / duration of their length left
+            shorterNum = bisect.bisect_right(durations, rest)
+            restDistribution = (partialSums[shorterNum] + rest * (len(durations) - shorterNum)) / durationSum
+            exceedance = 1 - restDistribution ** workerCount
+            expectedMax += exceedance * step
+            expectedMaxSquare += 2 * rest * exceedance * step
+        expectedRest = sum(duration ** 2 for duration in durations) / (2 * durationSum)
+        return max(0.0, expectedMax - expectedRest), max(0.0, expectedMaxSquare - expectedMax ** 2)
+
+
+    @classmethod
+    def getLongestTask(cls, runningTasks):
+        """
+        :param runningTasks: list of (expected remaining time, its standard deviation) of tasks; the remaining times
+        are assumed to be normally distributed, but not below zero
+        :return: (expected remaining time of the task which takes longest, its variance)
+        """
+        runningTasks = [(remaining, deviation) for remaining, deviation in runningTasks if deviation > 0]
+        if len(runningTasks) == 0:
+            return 0.0, 0.0
+        # P(max > r) vanishes beyond a few standard deviations of the longest task
+        step = max(remaining + 4 * deviation for remaining, deviation in runningTasks) / cls.tailSteps
+        expectedMax, expectedMaxSquare = 0.0, 0.0
+        for index in range(cls.tailSteps):
+            rest = (index + 0.5) * step
+            maxDistribution = 1.0
+            for remaining, deviation in runningTasks:
+                maxDistribution *= 0.5 * (1 + math.erf((rest - remaining) / (deviation * math.sqrt(2))))
+            expectedMax += (1 - maxDistribution) * step
+            expectedMaxSquare += 2 * rest * (1 - maxDistribution) * step
+        return expectedMax, max(0.0, expectedMaxSquare - expectedMax ** 2)
+
+
+    def estimate(self, now, workerCount):
+        """
+        @see combine
+        """
+        return self.combine([self.getRemainingWork(now)], workerCount)
@@ -0,0 +1,137 @@
+import io
+import os
+import json
+import hashlib
+
+class RunManifest:
+    """
+    Records for each output file of an output directory what it has been produced from: input file (hash, size and
+    modification time), hash of the compiled template, resolved placeholders, as well as size and hash of the output
+    file itself.
+    Later runs skip tasks whose input, template and placeholders did not change and whose output is still in place
+    (the way make does). As every completed task is recorded right away, rerunning an interrupted run picks up after
+    the last completed file.
+
+    The manifest is stored as JSON lines (one record per completed task) within the output directory; later records
+    supersede earlier ones, records marked as 'removed' drop the output file from the manifest.
+    """
+
+    fileName = '.batchProcessorManifest.jsonl'
+
+    # records are compacted on load once the file holds this many superseded records
+    compactionThreshold = 1000
+
+    def __init__(self, outputDir):
+        self.filePath = os.path.join(outputDir, self.fileName)
+        # output file path => record
+        self.records = {}
+        self.load()
+
+
+    def load(self):
+        if not(os.path.isfile(self.filePath)):
+            return
+
+        lineNum = 0
+        with io.open(self.filePath, 'r', encoding='utf-8') as f:
+            for line in f:
+                lineNum += 1
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # last line may be incomplete if a run has been interrupted
+                    continue
+                if record.get('removed'):
+                    self.records.pop(record['outputFile'], None)
+                else:
+                    self.records[record['outputFile']] = record
+
+        if lineNum - len(self.records) >= self.compactionThreshold:
+            self.compact()
+
+
+    def compact(self):
+        """
+        Rewrites the manifest with exactly one record per output file
+        """
+        tmpFilePath = self.filePath + '.tmp'
+        with io.open(tmpFilePath, 'w', encoding='utf-8') as f:
+            for record in self.records.values():
+                f.write(json.dumps(record, sort_keys=True) + '\n')
+        os.replace(tmpFilePath, self.filePath)
+
+
+    @staticmethod
+    def hashFile(filePath):
+        sha1 = hashlib.sha1()
+        with io.open(filePath, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                sha1.update(chunk)
+        return sha1.hexdigest()
+
+
+    @classmethod
+    def getFileSignature(cls, filePath, previous = None):
+        """
+        :param previous: signature recorded earlier; its hash is reused if size and modification time did not change
+        :return: dictionary with keys 'size', 'mtime' and 'hash'; None if the file does not exist
+        """
+        try:
+            stat = os.stat(filePath)
+        except OSError:
+            return None
+
+        if previous is not None and previous['size'] == stat.st_size and previous['mtime'] == stat.st_mtime:
+            contentHash = previous['hash']
+        else:
+            contentHash = cls.hashFile(filePath)
+        return {'size': stat.st_size, 'mtime': stat.st_mtime, 'hash': contentHash}
+
+
+    @staticmethod
+    def isSameContent(signature, recorded):
+        return signature is not None and signature['size'] == recorded['size'] and signature['hash'] == recorded['hash']
+
+
+    def isUpToDate(self, inputFile, outputFile, templateHash, placeholders):
+        """
+        Checks whether the output file has been produced from the very same input, template and placeholders.
+        Files are only hashed if their size or modification time changed.
+        """
+        record = self.records.get(outputFile)
+        if record is None or record['inputFile'] != inputFile or record['templateHash'] != templateHash \
+                or record['placeholders'] != placeholders:
+            return False
+
+        if not(self.isSameContent(self.getFileSignature(inputFile, record['input']), record['input'])):
+            return False
+        return self.isSameContent(self.getFileSignature(outputFile, record['output']), record['output'])
+
+
+    def record(self, inputFile, outputFile, templateHash, placeholders, inputSignature = None, outputSignature = None):
+        """
+        Records a completed task; written to disk right away
+        :param inputSignature: signature of the input file as taken by the worker (@see getFileSignature); the file is
+        hashed if None
+        :param outputSignature: signature of the output file as taken by the worker
+        """
+        record = {'inputFile': inputFile, 'outputFile': outputFile, 'templateHash': templateHash,
+                  'placeholders': placeholders, 'input': inputSignature or self.getFileSignature(inputFile),
+                  'output': outputSignature or self.getFileSignature(outputFile)}
+        if record['input'] is None or record['output'] is None:
+            return
+
+        self.records[outputFile] = record
+        with io.open(self.filePath, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, sort_keys=True) + '\n')
+
+
+    def forget(self, outputFile):
+        """
+        Removes the record of the given output file (i.e. as it turned out to be incomplete); the next run
+        produces it again
+        """
+        if self.records.pop(outputFile, None) is None:
+            return
+        with io.open(self.filePath, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'outputFile': outputFile, 'removed': True}, sort_keys=True) + '\n')
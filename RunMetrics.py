@@ -0,0 +1,163 @@
+import io
+import json
+import os
+
+#project imports
+from Lang import Lang
+
+class RunMetrics:
+    """
+    Structured metrics of every attempt to process a task: time waiting for a worker, loading the template,
+    instantiating the placeholders, running the engine and writing the outputs, CPU time and peak memory of the engine
+    (@see EngineUsage) and the sizes of input and output file. Tasks processed by a single engine invocation share the
+    figures of the whole batch (@see 'batchSize').
+
+    Records are appended to a JSON lines file within the output directory as soon as they are reported, so the file
+    can be followed while a run is going on; at the end of a run, a summary (percentiles, slowest files, throughput
+    over time) is appended as well.
+    """
+
+    fileName = '.batchProcessorMetrics.jsonl'
+
+    """
+    Durations summarised by percentiles; the figures of a batch are divided by its size
+    """
+    timedMetrics = [('duration', 'Task'), ('queueWait', 'Queue wait'), ('templateLoad', 'Template load'),
+                    ('instantiation', 'Placeholder instantiation'), ('engineTime', 'Engine'),
+                    ('outputWrite', 'Output write'), ('engineCpuTime', 'Engine CPU time')]
+
+    percentiles = [50, 90, 99]
+
+    def __init__(self, filePath = None, runStartTime = 0.0):
+        """
+        :param filePath: JSON lines file the records are appended to; None only keeps them in memory
+        :param runStartTime: part of every record; tells the runs within the file apart
+        raises IOError if the file cannot be opened
+        """
+        self.filePath = filePath
+        self.runStartTime = runStartTime
+        self.records = []
+        self.file = None
+        if filePath is not None:
+            self.file = io.open(filePath, 'a', encoding='utf-8')
+
+
+    def record(self, taskId, inputFile, outputFile, status, workerId, startTime, endTime, duration, queueWait = None,
+               batchSize = 1, attempt = 1, metrics = None):
+        """
+        :param status: 'finished' or 'failed'
+        :param duration: duration of the task, or of its whole batch
+        :param metrics: figures measured by the worker (@see WorkerPool.getTaskMetrics)
+        """
+        record = {'runStartTime': self.runStartTime, 'taskId': taskId, 'inputFile': inputFile,
+                  'outputFile': outputFile, 'status': status, 'workerId': workerId, 'startTime': startTime,
+                  'endTime': endTime, 'duration': duration, 'queueWait': queueWait, 'batchSize': batchSize,
+                  'attempt': attempt}
+        record.update(metrics or {})
+        self.records.append(record)
+        self.write(record)
+
+
+    def write(self, record):
+        if self.file is None:
+            return
+        self.file.write(json.dumps(record, sort_keys=True) + '\n')
+        self.file.flush()
+
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+    @staticmethod
+    def getPercentile(sortedValues, percentile):
+        """
+        Linear interpolation between the closest ranks
+        """
+        position = (len(sortedValues) - 1) * percentile / 100.0
+        lower = int(position)
+        upper = min(lower + 1, len(sortedValues) - 1)
+        return sortedValues[lower] + (sortedValues[upper] - sortedValues[lower]) * (position - lower)
+
+
+    def getDistribution(self, records, key, perTask = True):
+        """
+        :param perTask: divide the figures of a batch by its size
+        :return: dictionary 'p50', 'p90', 'p99', 'max' => value; None if no record has the figure
+        """
+        values = sorted(record[key] / (record['batchSize'] if perTask else 1) for record in records
+                        if record.get(key) is not None)
+        if len(values) == 0:
+            return None
+        distribution = dict(('p{}'.format(percentile), self.getPercentile(values, percentile))
+                            for percentile in self.percentiles)
+        distribution['max'] = values[-1]
+        return distribution
+
+
+    def getSummary(self, slowestFileNum = 5, intervalNum = 10):
+        """
+        :param slowestFileNum: number of slowest files listed
+        :param intervalNum: number of intervals the run is divided into to tell the throughput over time
+        :return: dictionary; 'throughput' lists the files completed per second within each interval
+        """
+        finished = [record for record in self.records if record['status'] == 'finished']
+        summary = {'tasks': len(finished), 'failedAttempts': len(self.records) - len(finished)}
+        for key, name in self.timedMetrics:
+            summary[key] = self.getDistribution(finished, key)
+        summary['enginePeakRss'] = self.getDistribution(finished, 'enginePeakRss', False)
+        summary['inputBytes'] = sum(record.get('inputBytes') or 0 for record in finished)
+        summary['outputBytes'] = sum(record.get('outputBytes') or 0 for record in finished)
+
+        slowest = sorted(finished, key=lambda record: record['duration'] / record['batchSize'], reverse=True)
+        summary['slowestFiles'] = [(record['inputFile'], record['duration'] / record['batchSize'])
+                                   for record in slowest[:slowestFileNum]]
+
+        summary['throughput'] = []
+        if len(finished) > 0:
+            startTime = min(record['startTime'] for record in self.records)
+            endTime = max(record['endTime'] for record in self.records)
+            intervalLength = max(endTime - startTime, 1e-6) / intervalNum
+            completions = [0] * intervalNum
+            for record in finished:
+                completions[min(int((record['endTime'] - startTime) / intervalLength), intervalNum - 1)] += 1
+            summary['throughput'] = [count / intervalLength for count in completions]
+        return summary
+
+
+    def finish(self):
+        """
+        Appends the summary to the file and closes it
+        :return: summary @see getSummary
+        """
+        summary = self.getSummary()
+        self.write({'runStartTime': self.runStartTime, 'summary': summary})
+        self.close()
+        return summary
+
+
+    @classmethod
+    def formatSummary(cls, summary):
+        lines = [Lang.get('Task metrics: {} tasks, {} failed attempts').format(summary['tasks'],
+                                                                              summary['failedAttempts'])]
+        formatDistribution = lambda distribution, unit, factor: ', '.join(
+            '{} {:.2f}{}'.format(key, distribution[key] * factor, unit)
+            for key in ['p{}'.format(percentile) for percentile in cls.percentiles] + ['max'])
+        for key, name in cls.timedMetrics:
+            if summary[key] is not None:
+                lines.append('    {}: {}'.format(Lang.get(name), formatDistribution(summary[key], ' s', 1)))
+        if summary['enginePeakRss'] is not None:
+            lines.append('    {}: {}'.format(Lang.get('Engine peak memory'),
+                                             formatDistribution(summary['enginePeakRss'], ' MB', 1.0 / 2**20)))
+        lines.append('    ' + Lang.get('Input: {:.1f} MB, output: {:.1f} MB').format(summary['inputBytes'] / 2**20,
+                                                                                   summary['outputBytes'] / 2**20))
+        if len(summary['slowestFiles']) > 0:
+            lines.append('    ' + Lang.get('Slowest files: ') + ', '.join(
+                '{} ({:.2f} s)'.format(os.path.basename(filePath), duration)
+                for filePath, duration in summary['slowestFiles']))
+        if len(summary['throughput']) > 0:
+            lines.append('    ' + Lang.get('Throughput over time (files/s): ') +
+                         ' '.join('{:.1f}'.format(throughput) for throughput in summary['throughput']))
+        return os.linesep.join(lines)
@@ -1,13 +1,44 @@
 import os
-import subprocess
+import tempfile
 import spss ,spssaux
-import sys
 
-from spssaux import u
+#project imports
+from EngineUsage import EngineUsage
 
 class SPSSExecutor:
 
-    def execute(self, commands):
+    engine = 'spss'
+
+    """
+    CPU time and peak memory of SPSS since the worker reset it; SPSS runs within the worker process, so the peak is that
+    of the worker (@see EngineUsage)
+    """
+    usage = EngineUsage()
+
+    """
+    Set by each worker process; every worker runs its own SPSS backend
+    """
+    workerId = 0
+
+    """
+    Prefix of the ECHO markers enclosing the commands of each file when several files are executed at once
+    """
+    markerPrefix = 'BATCHPROCESSOR-FILE'
+
+    """
+    Prefix of the tags of the OMS requests capturing the output of each file when several files are executed at once
+    """
+    omsTagPrefix = 'batchProcessorFile'
+
+    def execute(self, commands, capture = None):
+        """
+        :param capture: OutputCapture receiving the output; SPSS writes it to a text file by OMS, which is streamed
+        into the capture afterwards. None if output is not captured.
+        """
+        omsFilePath = None
+        if capture is not None:
+            omsFilePath = self.createOMSFile()
+            commands = [self.getOMSCommand(omsFilePath)] + commands + ['OMSEND.']
         transformedCommands = ['* Encoding: UTF-8.']
         for command in commands:
            # command = command.replace("\n", " ");
@@ -15,11 +46,118 @@ class SPSSExecutor:
                 command += '.'
             # SPSS probably only understands ASCII
             transformedCommands.append(command)
-        #try:
-            """
-            Execute all commands as batch; this allows to execute BEGIN DUMMY. [...] END DUMMY. as well
-            i.e. BEGIN MATRIX. [...] END MATRIX. 
-            """
-        spss.Submit(transformedCommands)
-        #except spss.SpssError as e:
-            #raise RuntimeError(str(spss.GetLastErrorMessage()))
\ No newline at end of file
+        # all commands are submitted at once; this allows to execute BEGIN DUMMY. [...] END DUMMY. as well,
+        # i.e. BEGIN MATRIX. [...] END MATRIX.
+        cpuTimeBefore = EngineUsage.ofCurrentProcess()[0]
+        try:
+            spss.Submit(transformedCommands)
+        except spss.SpssError:
+            if omsFilePath is not None:
+                # the submission stopped before OMSEND
+                spss.Submit(['OMSEND.'])
+            raise
+        finally:
+            cpuTime, peakRss = EngineUsage.ofCurrentProcess()
+            if cpuTime is not None:
+                self.usage.add(cpuTime - cpuTimeBefore, peakRss)
+            if omsFilePath is not None:
+                capture.writeFile(omsFilePath)
+                os.remove(omsFilePath)
+
+    def executeBatch(self, commandLists, outputFiles = None, captures = None):
+        """
+        Executes the commands of several files using one submission; each file starts with an empty dataset and is
+        enclosed in ECHO markers (which show up in the viewer).
+        SPSS stops a submission at the first error, but does not tell which file caused it. Files are processed in
+        order, so the output files tell how far the submission got: files up to the last one whose output has been
+        written are done, except for that very file (it may have failed after saving). Processing continues with the
+        remaining files one by one.
+        :param commandLists: list of command lists, one per file
+        :param outputFiles: output file of each file; without those, all files are executed again on their own
+        :param captures: OutputCapture of each file (None for files whose output is not captured); the output of each
+        file is written to a file of its own by an OMS request enclosing its commands
+        :return: list of (output, error) per file; error is None if the file has been processed successfully. The
+        output is empty, as SPSS only writes it to the captures.
+        """
+        if captures is None:
+            captures = [None] * len(commandLists)
+        omsFilePaths = [self.createOMSFile() if capture is not None else None for capture in captures]
+        commands = []
+        for i, (fileCommands, omsFilePath) in enumerate(zip(commandLists, omsFilePaths)):
+            commands.append("ECHO '{} BEGIN {}'.".format(self.markerPrefix, i))
+            commands.append('NEW FILE.')
+            # tagged, so OMS requests of the syntax itself are left alone
+            tag = '{}{}'.format(self.omsTagPrefix, i)
+            if omsFilePath is not None:
+                commands.append(self.getOMSCommand(omsFilePath, tag))
+            commands += fileCommands
+            if omsFilePath is not None:
+                commands.append("OMSEND TAG='{}'.".format(tag))
+            commands.append("ECHO '{} END {}'.".format(self.markerPrefix, i))
+
+        previousSignatures = [self.getFileSignature(filePath) for filePath in outputFiles or []]
+        try:
+            try:
+                self.execute(commands)
+                completedFiles = len(commandLists)
+            except spss.SpssError:
+                if any(omsFilePath is not None for omsFilePath in omsFilePaths):
+                    # the submission stopped within the OMS request of the failed file
+                    spss.Submit(['OMSEND.'])
+                # number of files which have certainly been completed by the submission
+                completedFiles = 0
+                if outputFiles is not None:
+                    for i, filePath in enumerate(outputFiles):
+                        signature = self.getFileSignature(filePath)
+                        if signature is None or signature == previousSignatures[i]:
+                            break
+                        completedFiles = i
+            # the output of files executed again on their own is captured then
+            for capture, omsFilePath in zip(captures[:completedFiles], omsFilePaths):
+                if capture is not None:
+                    capture.writeFile(omsFilePath)
+        finally:
+            for omsFilePath in omsFilePaths:
+                if omsFilePath is not None:
+                    os.remove(omsFilePath)
+        results = [('', None)] * completedFiles
+
+        for fileCommands, capture in zip(commandLists[completedFiles:], captures[completedFiles:]):
+            try:
+                self.execute(['NEW FILE.'] + fileCommands, capture)
+                results.append(('', None))
+            except spss.SpssError as e:
+                results.append(('', str(spss.GetLastErrorMessage()) or str(e)))
+        return results
+
+    def createOMSFile(self):
+        """
+        :return: path of a new temporary file for OMS to write the output to
+        """
+        fd, omsFilePath = tempfile.mkstemp(prefix='oms_{}_'.format(self.workerId), suffix='.txt')
+        os.close(fd)
+        return omsFilePath
+
+    @staticmethod
+    def getOMSCommand(omsFilePath, tag = None):
+        """
+        :return: OMS command writing all output to the file as text
+        :param tag: identifies the request for OMSEND; None for an untagged request
+        """
+        command = "OMS /SELECT ALL /DESTINATION FORMAT=TEXT OUTFILE='{}'".format(omsFilePath.replace("'", "''"))
+        if tag is not None:
+            command += " /TAG='{}'".format(tag)
+        return command + '.'
+
+    @staticmethod
+    def getFileSignature(filePath):
+        """
+        :return: (modification time, size) of the file; None if it does not exist
+        """
+        if filePath is None:
+            return None
+        try:
+            stat = os.stat(filePath)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
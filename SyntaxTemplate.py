@@ -0,0 +1,140 @@
+import io
+import os
+import hashlib
+
+#project imports
+from PlaceholderPattern import PlaceholderPattern
+
+class SyntaxTemplate:
+    """
+    SPSS/PSPP syntax file parsed once per run: a list of commands (comments removed, lines merged into commands)
+    and an index of where placeholders occur within those commands.
+    Instances are picklable; they are shipped to every worker once per run and reused for every file.
+    """
+
+    def __init__(self, filePath, commands, mtime, size, contentHash):
+        """
+        :param filePath: path of the syntax file
+        :param commands: list of commands
+        :param mtime: modification time of the syntax file when it was compiled
+        :param size: size of the syntax file in bytes when it was compiled
+        :param contentHash: SHA-1 of the file content
+        """
+        self.filePath = filePath
+        self.commands = commands
+        self.mtime, self.size, self.contentHash = mtime, size, contentHash
+
+        # for each command containing placeholders: the tokenised command (PlaceholderPattern)
+        # commands without any placeholders are not listed and are used as they are
+        self.placeholderIndex = {}
+        for i, command in enumerate(commands):
+            pattern = PlaceholderPattern(command)
+            if pattern.hasPlaceholders():
+                self.placeholderIndex[i] = pattern
+
+
+    @classmethod
+    def compile(cls, filePath):
+        """
+        Reads and parses the given syntax file (which must be UTF-8 encoded)
+        :return: SyntaxTemplate instance
+        """
+        with io.open(filePath, "rb") as f:
+            content = f.read()
+        stat = os.stat(filePath)
+        commands = cls.parseCommands(content)
+        return cls(filePath, commands, stat.st_mtime, stat.st_size, hashlib.sha1(content).hexdigest())
+
+
+    def isStale(self):
+        """
+        Checks whether the syntax file changed since it has been compiled. Modification time and size are checked
+        first; only if those changed, the content hash is compared.
+        """
+        try:
+            stat = os.stat(self.filePath)
+        except OSError:
+            return True
+
+        if stat.st_mtime == self.mtime and stat.st_size == self.size:
+            return False
+
+        with io.open(self.filePath, "rb") as f:
+            contentHash = hashlib.sha1(f.read()).hexdigest()
+        if contentHash != self.contentHash:
+            return True
+
+        # touched, but not modified
+        self.mtime, self.size = stat.st_mtime, stat.st_size
+        return False
+
+
+    def getPlaceholderNames(self):
+        """
+        :return: set of all placeholder names used in the template
+        """
+        return set(name for pattern in self.placeholderIndex.values() for name in pattern.names)
+
+
+    def instantiate(self, placeholders, undefined = None):
+        """
+        Fills in the placeholders of all commands in a single pass
+        :param placeholders: dictionary placeholder name => substitute
+        :param undefined: set; if given, names of placeholders without value are added
+        :return: list of commands
+        """
+        commands = self.commands[:]
+        for i, pattern in self.placeholderIndex.items():
+            commands[i] = pattern.substitute(placeholders, undefined)
+        return commands
+
+
+    @classmethod
+    def parseCommands(cls, content):
+        """
+        Returns list of commands from raw file content
+        :param content: bytes, UTF-8 encoded
+        :return: list of commands
+        """
+        # remove BOM byte, should it be there
+        spssCommands = content.decode("utf-8-sig")
+
+        usesWindowsNewlines = "\r\n" in spssCommands
+
+        #by definition, commands end with "." and a newline
+        if not(usesWindowsNewlines):
+            spssCommands = spssCommands.split("\n");
+        else:
+            spssCommands = spssCommands.split("\r\n");
+
+        spssCommands = cls.removeCommentsFromCommands(spssCommands)
+        spssCommands = cls.mergeLinesIntoCommands(spssCommands)
+        #ignore encoding line
+        return [command for command in spssCommands if command.find('Encoding') == -1]
+
+    @staticmethod
+    def removeCommentsFromCommands(commands):
+        ret = []
+        for command in commands:
+            command = command.strip()
+            if(len(command) > 0 and command[0] != '*'):
+                ret.append(command)
+        return ret
+
+    @staticmethod
+    def mergeLinesIntoCommands(lines):
+        """
+        A command may span several lines; merge parts from several lines into point-separated commands
+        :return: array of commands where each line corresponds to a command.
+        """
+        currentCommand = ""
+        ret = []
+
+        for line in lines:
+            currentCommand += " "
+            currentCommand += line
+            if(line[-1] == '.'):
+                ret.append(currentCommand)
+                currentCommand = ""
+
+        return ret
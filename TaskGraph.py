@@ -0,0 +1,123 @@
+import heapq
+import os
+
+#project imports
+from Lang import Lang
+
+class TaskGraph:
+    """
+    Tasks of a Pipeline and the files they pass on to each other: a task depends on the tasks producing its input
+    files. Edges are per file (i.e. per subject), so a subject may reach the last step while others are still being
+    processed by the first one.
+    Used to rank tasks by the length of the longest chain of tasks which depend on them (critical path) and to estimate
+    the time the whole pipeline takes on a number of workers (makespan).
+    """
+
+    def __init__(self):
+        # dictionaries with keys 'step', 'inputFiles', 'outputFile', 'duration', 'skipped' and 'dependencies' (indices
+        # of the tasks producing the input files); tasks are added in topological order
+        self.tasks = []
+        # output file => index of the task producing it
+        self.producers = {}
+
+
+    def addTask(self, stepIndex, inputFiles, outputFile, duration, skipped = False):
+        """
+        :param inputFiles: input files of the task; files which are not produced by a task of the graph are expected to
+        exist already
+        :param duration: estimated duration in seconds
+        :param skipped: True if the output is up to date; skipped tasks are not processed and do not delay others
+        :return: index of the task
+        """
+        dependencies = set()
+        for inputFile in inputFiles:
+            producer = self.producers.get(inputFile)
+            if producer is not None and not(self.tasks[producer]['skipped']):
+                dependencies.add(producer)
+        self.tasks.append({'step': stepIndex, 'inputFiles': list(inputFiles), 'outputFile': outputFile,
+                           'duration': 0.0 if skipped else duration, 'skipped': skipped,
+                           'dependencies': sorted(dependencies)})
+        self.producers[outputFile] = len(self.tasks) - 1
+        return len(self.tasks) - 1
+
+
+    def isProduced(self, filePath):
+        """
+        :return: True if the file is (re)produced by a task which is going to be processed
+        """
+        producer = self.producers.get(filePath)
+        return producer is not None and not(self.tasks[producer]['skipped'])
+
+
+    def getRanks(self):
+        """
+        :return: per task, its duration plus the longest chain of durations of the tasks depending on it
+        """
+        ranks = [task['duration'] for task in self.tasks]
+        # tasks are in topological order; dependents come later
+        for index in range(len(self.tasks) - 1, -1, -1):
+            for dependency in self.tasks[index]['dependencies']:
+                ranks[dependency] = max(ranks[dependency], self.tasks[dependency]['duration'] + ranks[index])
+        return ranks
+
+
+    def estimateMakespan(self, workerCount):
+        """
+        Simulates processing all tasks on the given number of workers; ready tasks are assigned critical path first
+        :return: estimated duration in seconds
+        """
+        ranks = self.getRanks()
+        dependents = [[] for task in self.tasks]
+        missingDependencies = []
+        for index, task in enumerate(self.tasks):
+            missingDependencies.append(len(task['dependencies']))
+            for dependency in task['dependencies']:
+                dependents[dependency].append(index)
+
+        ready = [(-ranks[index], index) for index, task in enumerate(self.tasks)
+                 if not(task['skipped']) and missingDependencies[index] == 0]
+        heapq.heapify(ready)
+        # (finish time, task index) of the tasks being processed
+        running = []
+        now = 0.0
+        while len(ready) > 0 or len(running) > 0:
+            while len(ready) > 0 and len(running) < max(1, workerCount):
+                rank, index = heapq.heappop(ready)
+                heapq.heappush(running, (now + self.tasks[index]['duration'], index))
+            now, index = heapq.heappop(running)
+            for dependent in dependents[index]:
+                missingDependencies[dependent] -= 1
+                if missingDependencies[dependent] == 0:
+                    heapq.heappush(ready, (-ranks[dependent], dependent))
+        return now
+
+
+    def format(self, stepNames, maxTasksPerStep = 10, maxSourcesPerTask = 5):
+        """
+        Human readable listing of the graph: the steps with their number of tasks, and the edges of some tasks per step
+        :param stepNames: name of each step
+        :param maxTasksPerStep: number of tasks listed per step; further tasks are only counted
+        :param maxSourcesPerTask: number of input files listed per task (accumulation merges many files)
+        """
+        lines = []
+        for stepIndex, stepName in enumerate(stepNames):
+            tasks = [task for task in self.tasks if task['step'] == stepIndex]
+            skippedNum = sum(1 for task in tasks if task['skipped'])
+            lines.append(Lang.get('Step {} ({}): {} tasks, {} up to date').format(stepIndex + 1, stepName,
+                                                                                len(tasks) - skippedNum, skippedNum))
+            for task in tasks[:maxTasksPerStep]:
+                sources = []
+                for inputFile in task['inputFiles']:
+                    producer = self.producers.get(inputFile)
+                    if producer is not None and producer in task['dependencies']:
+                        sources.append('{} [{}]'.format(os.path.basename(inputFile), self.tasks[producer]['step'] + 1))
+                    else:
+                        sources.append(os.path.basename(inputFile))
+                if len(sources) > maxSourcesPerTask:
+                    sources = sources[:maxSourcesPerTask] + [Lang.get('... and {} more').format(
+                        len(sources) - maxSourcesPerTask)]
+                line = '    {} <= {}'.format(os.path.basename(task['outputFile']), ', '.join(sources))
+                lines.append(line + (' ' + Lang.get('(up to date)') if task['skipped'] else ''))
+            if len(tasks) > maxTasksPerStep:
+                lines.append('    ' + Lang.get('... and {} more').format(len(tasks) - maxTasksPerStep))
+        return os.linesep.join(lines)
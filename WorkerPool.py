@@ -0,0 +1,373 @@
+import os
+import queue
+import signal
+import time
+import traceback
+from multiprocessing import Process, Queue
+
+#project imports
+from Lang import Lang
+from Configuration import Configuration
+from RunManifest import RunManifest
+from batchProcessor import BatchProcessor
+
+class WorkerPool:
+    """
+    Pool of worker processes which all consume tasks from one shared task queue.
+    Not all Python types are pickable (including tkinter's); therefore, the pool (and all queues) have to be created
+    before tkinter is initialized.
+    """
+
+    """
+    Seconds to wait for tasks still on their way into the task queue @see takeQueuedTasks
+    """
+    queueFlushTimeout = 0.1
+
+    """
+    Log records which may wait for the backend; workers wait while the log queue is full @see BatchProcessor.log
+    """
+    logQueueSize = 1000
+
+    def __init__(self, workerCount = None):
+        """
+        :param workerCount: number of worker processes to start; 0 or None start one worker per CPU core
+        """
+        # used whenever a configuration does not request a specific number of workers
+        self.defaultWorkerCount = workerCount
+        self.taskQueue = Queue()
+        # returns the parsed script/placeholders to the calling process
+        # please note that Tkinter is NOT threadsafe.
+        self.debuggingResultQueue = Queue()
+        self.logQueue = Queue(self.logQueueSize)
+        # workers report when they start a task and when they are done with it (successful or not)
+        # @see SPSSWorkerProcess
+        self.eventQueue = Queue()
+
+        self.processes = []
+        self.nextWorkerId = 0
+        # settings which stay the same for all tasks of a run (i.e. the compiled template) are sent to each worker
+        # once via its own control queue; tasks refer to them by run id
+        # @see broadcastRunSettings
+        self.runId = 0
+        # run id => settings of the current runs (several for a Pipeline); workers started during a run (i.e.
+        # replacing crashed ones) receive them as well
+        self.runSettings = {}
+        self.resize(workerCount)
+
+
+    @staticmethod
+    def resolveWorkerCount(workerCount):
+        """
+        :param workerCount: requested number of workers; 0 or None refer to the number of CPU cores
+        :return: effective number of workers (at least 1)
+        """
+        if not(workerCount) or int(workerCount) <= 0:
+            return os.cpu_count() or 1
+        return int(workerCount)
+
+
+    def getWorkerCount(self):
+        # workers which received a stop signal may still be shutting down
+        self.processes = [p for p in self.processes if p.is_alive()]
+        return len(self.processes)
+
+
+    def getWorkerIds(self):
+        return [p.workerId for p in self.processes if p.is_alive()]
+
+
+    def takeQueuedTasks(self):
+        """
+        Takes back the tasks no worker has taken yet (i.e. to pause or cancel a run); stop signals stay queued
+        :return: list of the tasks, in the order they were queued
+        """
+        tasks, stopSignalNum = [], 0
+        while True:
+            try:
+                # tasks put by this process reach the queue through a feeder thread, i.e. with a short delay
+                task = self.taskQueue.get(True, self.queueFlushTimeout)
+            except queue.Empty:
+                break
+            if task is None:
+                stopSignalNum += 1
+            else:
+                tasks.append(task)
+        for i in range(stopSignalNum):
+            self.taskQueue.put(None)
+        return tasks
+
+
+    def startWorker(self):
+        controlQueue = Queue()
+        for runId, runSettings in sorted(self.runSettings.items()):
+            controlQueue.put((runId, runSettings, False))
+        p = Process(target=SPSSWorkerProcess, args=(self.nextWorkerId, controlQueue, self.logQueue, self.taskQueue,
+                                                     self.debuggingResultQueue, self.eventQueue))
+        p.daemon = True
+        p.controlQueue = controlQueue
+        p.workerId = self.nextWorkerId
+        p.start()
+        self.processes.append(p)
+        self.nextWorkerId += 1
+        return p.workerId
+
+
+    def resize(self, workerCount):
+        """
+        Starts or stops workers until exactly the requested number of workers is running.
+        Must only be called while no tasks are pending: stopping relies on idle workers picking up the stop signal.
+        """
+        workerCount = self.resolveWorkerCount(workerCount)
+        currentCount = self.getWorkerCount()
+
+        for i in range(currentCount, workerCount):
+            self.startWorker()
+
+        # None is the stop signal; whichever worker fetches it terminates
+        for i in range(workerCount, currentCount):
+            self.taskQueue.put(None)
+        while self.getWorkerCount() > workerCount:
+            for p in self.processes:
+                p.join(0.1)
+
+
+    def restartWorker(self, workerId):
+        """
+        Kills the given worker (including the statistics engine it runs) and starts a new one in its place
+        :return: id of the new worker
+        """
+        for p in self.processes:
+            if p.workerId == workerId:
+                self.killWorker(p)
+                self.processes.remove(p)
+                break
+        return self.startWorker()
+
+
+    @staticmethod
+    def killWorker(p):
+        # workers lead their own process group (@see SPSSWorkerProcess); engine processes are killed as well
+        if hasattr(os, 'killpg'):
+            try:
+                os.killpg(p.pid, signal.SIGKILL)
+            except OSError:
+                p.kill()
+        else:
+            p.terminate()
+        p.join(5)
+
+
+    def replaceDeadWorkers(self):
+        """
+        Starts a new worker for every worker which terminated unexpectedly (i.e. crashed); only to be called during a
+        run, while no worker has been asked to stop
+        :return: ids of the terminated workers
+        """
+        deadWorkerIds = [p.workerId for p in self.processes if not(p.is_alive())]
+        for workerId in deadWorkerIds:
+            self.restartWorker(workerId)
+        return deadWorkerIds
+
+
+    def broadcastRunSettings(self, runSettings, exclusive = True):
+        """
+        Sends settings shared by all tasks of a run to every worker; must be called before the run's tasks are queued
+        :param runSettings: dictionary; must be picklable
+        :param exclusive: True if all previous runs are over, i.e. their settings may be dropped; False if runs are
+        processed concurrently (@see Pipeline)
+        :return: run id to be included in each task of the run
+        """
+        self.runId += 1
+        if exclusive:
+            self.runSettings = {}
+        self.runSettings[self.runId] = runSettings
+        for p in self.processes:
+            p.controlQueue.put((self.runId, runSettings, exclusive))
+        return self.runId
+
+
+
+def SPSSWorkerProcess(workerId, controlQueue, logQueue, taskQueue, debuggingResultQueue, eventQueue):
+    """
+    Processes tasks until the stop signal (None) is fetched. Each task is reported on the event queue:
+    'started' when it is taken, 'finished' or 'failed' when the worker is done with it.
+    Several tasks are taken at once if the configuration asks for more than one file per engine invocation.
+    Tasks are lists [run id, task id, input file, output file, placeholders, commands]; everything else is part of
+    the run settings (@see WorkerPool.broadcastRunSettings)
+    """
+    # each worker uses dedicated scratch files for the statistics engine
+    BatchProcessor.workerId = workerId
+    # allows the supervisor to kill the worker along with the engine processes it started
+    if hasattr(os, 'setpgrp'):
+        os.setpgrp()
+    runId, runSettings, config = None, None, None
+    # run id => (settings, parsed configuration) of all current runs
+    runs = {}
+    # task of another run fetched while taking further tasks for a batch; processed next, which keeps the order of
+    # the queue
+    heldJob = None
+
+    while(True):
+        #block until next job is fetched
+        if heldJob is not None:
+            job, heldJob = heldJob, None
+        else:
+            job = taskQueue.get(True);
+        if job is None:
+            return
+        taskRunId = job[0]
+        # the template is shipped with the settings; loading it is attributed to the first task of the run
+        templateLoadStartTime = time.time()
+        # settings of a run are always broadcast before its tasks are queued
+        while taskRunId not in runs and not(len(runs) > 0 and taskRunId < max(runs)):
+            controlRunId, controlRunSettings, exclusive = controlQueue.get(True)
+            if exclusive:
+                runs = {}
+            # parsed once per run; the placeholders of each task are set on this very object
+            controlConfig = Configuration()
+            controlConfig.loadFromString(controlRunSettings['config'])
+            runs[controlRunId] = (controlRunSettings, controlConfig)
+        if taskRunId not in runs:
+            # settings of runs which are over have been dropped
+            continue
+        runId = taskRunId
+        runSettings, config = runs[runId]
+        BatchProcessor.taskRunId = runId
+        templateLoadTime = time.time() - templateLoadStartTime
+
+        jobs = [job]
+        stopAfterBatch = False
+        try:
+            filesPerInvocation = int(config.opt.get('filesPerInvocation', 1))
+        except (ValueError, TypeError):
+            filesPerInvocation = 1
+        # take further tasks which are already waiting; don't wait for more to arrive
+        while len(jobs) < filesPerInvocation:
+            try:
+                nextJob = taskQueue.get_nowait()
+            except queue.Empty:
+                break
+            if nextJob is None:
+                stopAfterBatch = True
+                break
+            if nextJob[0] != runId:
+                heldJob = nextJob
+                break
+            jobs.append(nextJob)
+
+        if len(jobs) == 1:
+            processTask(workerId, runSettings, config, jobs[0], logQueue, debuggingResultQueue, eventQueue,
+                        templateLoadTime)
+        else:
+            processTaskBatch(workerId, runSettings, config, jobs, logQueue, eventQueue, templateLoadTime)
+        if stopAfterBatch:
+            return
+
+
+def getTaskEvent(workerId, job):
+    [taskRunId, taskId, inputFilePath, outputFilePath, placeholders, commands] = job;
+    return {'runId': taskRunId, 'taskId': taskId, 'workerId': workerId, 'inputFile': inputFilePath,
+            'outputFile': outputFilePath}
+
+
+def getFileSignatures(config, inputFilePath, outputFilePath):
+    """
+    Size, modification time and hash of the input and the output file of a completed task; taken by the worker once
+    the engine is done with the output file, so the backend neither has to wait for nor to read the files
+    @see RunManifest.getFileSignature
+    :return: dictionary with keys 'inputSignature' and 'outputSignature' (None if the file does not exist); empty if
+    no files have been written
+    """
+    if config.opt['simulateProcessing'] or config.opt['accumulateData']:
+        return {}
+    return {'inputSignature': RunManifest.getFileSignature(inputFilePath),
+            'outputSignature': RunManifest.getFileSignature(outputFilePath)}
+
+
+def getFileSize(filePath):
+    """
+    :return: size in bytes; None if the file does not exist
+    """
+    try:
+        return os.path.getsize(filePath)
+    except (OSError, TypeError):
+        return None
+
+
+def getTaskMetrics(config, inputFilePath, outputFilePath, metrics, signatures):
+    """
+    Completes the metrics of a task by the sizes of its files (@see RunMetrics)
+    :param signatures: @see getFileSignatures; sizes are taken from those where available
+    """
+    inputSignature, outputSignature = signatures.get('inputSignature'), signatures.get('outputSignature')
+    metrics = dict(metrics)
+    # accumulation merges the files listed within its commands; only its output is measured
+    if not(config.opt['accumulateData']):
+        metrics['inputBytes'] = inputSignature['size'] if inputSignature else getFileSize(inputFilePath)
+    if not(config.opt['simulateProcessing']):
+        metrics['outputBytes'] = outputSignature['size'] if outputSignature else getFileSize(outputFilePath)
+    return metrics
+
+
+def processTask(workerId, runSettings, config, job, logQueue, debuggingResultQueue, eventQueue,
+                templateLoadTime = 0.0):
+    """
+    :param templateLoadTime: time taken to load the settings of the run (including the template) for this task
+    """
+    [taskRunId, taskId, inputFilePath, outputFilePath, placeholders, commands] = job;
+    startTime = time.time()
+    event = getTaskEvent(workerId, job)
+    eventQueue.put(dict(event, type='started', time=startTime))
+    metrics = {'templateLoad': templateLoadTime}
+    try:
+        BatchProcessor.runSPSSProcessOnFile(runSettings['template'], inputFilePath, placeholders, config,
+                                            logQueue, debuggingResultQueue, commands, metrics)
+        signatures = getFileSignatures(config, inputFilePath, outputFilePath)
+        eventQueue.put(dict(event, type='finished', time=time.time(), duration=time.time() - startTime,
+                            metrics=getTaskMetrics(config, inputFilePath, outputFilePath, metrics, signatures),
+                            **signatures))
+    except Exception as e:
+        # keep the worker alive; the backend decides how to deal with the failed file
+        BatchProcessor.log(logQueue, Lang.get('Error occurred; execution incomplete') + ': ' + inputFilePath, 'error',
+                           inputFilePath)
+        output = getattr(e, 'output', None) or ''
+        if isinstance(output, bytes):
+            output = output.decode('utf-8', 'replace')
+        eventQueue.put(dict(event, type='failed', time=time.time(), duration=time.time() - startTime,
+                            error=str(e), output=output, traceback=traceback.format_exc(),
+                            metrics=getTaskMetrics(config, inputFilePath, None, metrics, {})))
+
+
+def processTaskBatch(workerId, runSettings, config, jobs, logQueue, eventQueue, templateLoadTime = 0.0):
+    """
+    Processes several tasks using a single invocation of the statistics engine; the events of the single tasks share
+    the duration and the metrics of the whole batch
+    """
+    startTime = time.time()
+    events = [getTaskEvent(workerId, job) for job in jobs]
+    for event in events:
+        eventQueue.put(dict(event, type='started', time=startTime, batchSize=len(jobs)))
+    metrics = {'templateLoad': templateLoadTime}
+    try:
+        tasks = [(inputFilePath, placeholders, commands)
+                 for [taskRunId, taskId, inputFilePath, outputFilePath, placeholders, commands] in jobs]
+        errors = BatchProcessor.runSPSSProcessOnFiles(runSettings['template'], tasks, config, logQueue, metrics)
+        trace = ''
+    except Exception as e:
+        BatchProcessor.log(logQueue, Lang.get('Error occurred; execution incomplete') + ': ' +
+                           ', '.join(event['inputFile'] for event in events), 'error')
+        errors = [str(e)] * len(jobs)
+        trace = traceback.format_exc()
+
+    duration = time.time() - startTime
+    for event, error in zip(events, errors):
+        if error is None:
+            signatures = getFileSignatures(config, event['inputFile'], event['outputFile'])
+            eventQueue.put(dict(event, type='finished', time=time.time(), duration=duration, batchSize=len(jobs),
+                                metrics=getTaskMetrics(config, event['inputFile'], event['outputFile'], metrics,
+                                                       signatures),
+                                **signatures))
+        else:
+            eventQueue.put(dict(event, type='failed', time=time.time(), duration=duration, batchSize=len(jobs),
+                                error=error, output='', traceback=trace,
+                                metrics=getTaskMetrics(config, event['inputFile'], None, metrics, {})))
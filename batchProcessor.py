@@ -12,432 +12,1184 @@ Working Group: Psychologische Diagnostik. Differentielle Psychologie und Persön
 University of Kiel
 """
 
-#GUI imports
-import tkinter as tk
-import tkinter.messagebox
-import tkinter.ttk as ttk
-
 #system imports
 import os
 import io
-from os.path import basename
 import re
 import queue
-import subprocess
 import io
 import time
 import datetime
-import argparse
-import shutil
-
-from contextlib import redirect_stdout
+import json
 
 #project imports
 from Lang import Lang
 from Configuration import Configuration
-from PSPPExecutor import PSPPExecutor
-from SPSSExecutor import SPSSExecutor
+from SyntaxTemplate import SyntaxTemplate
+from FileNameAnalysis import FileNameAnalysis
+from PreflightCheck import PreflightCheck
+from RunManifest import RunManifest
+from OutputSizeValidator import OutputSizeValidator
+from EngineUsage import EngineUsage
+from RunMetrics import RunMetrics
+from RemainingTimeEstimator import RemainingTimeEstimator
+from ExecutionLog import ExecutionLog
+from OutputCapture import OutputCapture
 
 class BatchProcessor:
     """
     Processing backend; breaks work down into tasks and arranges for their execution. Additionally, monitors progress
+    The backend does not depend on tkinter; all interaction with the operator is delegated to its frontend
+    (BatchProcessorGUI or BatchProcessorCLI).
     """
 
     """
     Wraps execution by a specific statistics engine. 
-    Available are PSPPExecutor and SPSSExecutor
+    Available are PSPPExecutor, PSPPSessionExecutor and SPSSExecutor; created lazily by each worker, as the SPSS module is only 
+    available within SPSS distributions
+    @see getExecutor
+    """
+    executor = None
+
+    """
+    Identifies the worker process this backend runs in; used to separate scratch files of the engines
+    """
+    workerId = 0
+
+    """
+    Identifies the run of the task the worker process is working on; tags its log records
+    @see log
     """
-    executor = SPSSExecutor()
+    taskRunId = None
+
+    """
+    Seconds between checks for timed out tasks and crashed workers while waiting for events
+    @see superviseWorkers
+    """
+    supervisionInterval = 1.0
+
+    """
+    Input files which could not be processed are listed in this file within the output directory
+    @see saveFailedTaskList
+    """
+    failedTaskListFileName = '.batchProcessorFailed.txt'
+
+    """
+    Files are written to a temporary file of this prefix within the same directory and renamed once complete
+    @see getTemporaryOutputPath
+    """
+    temporaryFilePrefix = '.batchProcessorTmp.'
 
 
     # SPSS Processing
     # ----------------------------------------------------------------------------------------------------------------
 
     # run the processing itself, iterate over files and update progress indicator
+    # blocks until all files have been processed; the GUI uses startProcessing/pollEvents instead
     def runProcessing(self):
+        if not(self.startProcessing()):
+            return False
+
+        for event in self.iterateEvents():
+            pass
+        self.finishProcessing()
+        return True
+
+
+    def startProcessing(self):
+        """
+        Takes over the configuration from the frontend and queues all tasks; progress is reported as soon as the
+        workers' events are consumed
+        @see pollEvents
+        @see iterateEvents
+        :return: False if processing could not be started
+        """
         print(Lang.get('Started processing...'))
         self.gui.GUIToConfig();
+        return self.queueTasks()
 
-        totalUsedTime = 0.0;
 
+    def queueTasks(self):
         if not(self.runPreprocessingChecks()):
             return False
+        if not(self.config.opt['simulateProcessing']):
+            self.removeOrphanedTemporaryFiles()
+
+        if self.ownsWorkerPool:
+            self.prepareWorkerPool()
+
+        self.paused, self.heldJobs, self.cancelledFileNum = False, [], 0
+        if not(self.populateTaskQueue()):
+            return False
+
+        self.startedTasks, self.completedTasks = 0, 0
+        self.failedFiles = []
+        # worker id => number of tasks it has been done with
+        self.completedTasksByWorker = {}
+        # task id => worker, start time and deadline of tasks being processed
+        self.runningTasks = {}
+        # task id => number of failed attempts
+        self.failedAttempts = {}
+        # (time, task id) of failed tasks to be queued again
+        self.pendingRetries = []
+        # task id => hash of the output which has been rejected by the output validation
+        self.rejectedOutputs = {}
+        self.outputValidator = self.createOutputValidator()
+        self.runMetrics = self.createRunMetrics()
+        # nothing to report if all files are up to date
+        if self.totalFileNum > 0:
+            self.gui.showProgress(0, self.totalFileNum, None)
+        return True
+
+
+    def prepareWorkerPool(self):
+        # a configuration may ask for a specific number of workers; otherwise, the user's default applies
+        self.workerPool.resize(self.config.opt.get('workerCount', 0) or self.workerPool.defaultWorkerCount)
 
-        self.config.opt['simulateProcessing'] = (self.gui.simulateProcessingVar.get() == 1);
+        # debugging information of previous simulations must not be mistaken for that of this run
+        try:
+            while True:
+                self.debuggingResultQueue.get_nowait()
+        except queue.Empty:
+            pass
 
-        self.populateTaskQueue()
-        self.trackProgress()
+
+    def finishProcessing(self):
+        """
+        Evaluates the run once all tasks have been reported back by the workers; outputs have been validated already
+        (@see validateOutput)
+        """
+        # when processing is finished, reset progress indicator
+        self.gui.resetProgress()
+        # steps of a Pipeline share the log queue, which is drained by the Pipeline @see Pipeline.transferLogQueue
+        if self.ownsWorkerPool:
+            self.transferLogQueue()
+
+        if self.config.opt['accumulateData'] and not(self.config.opt['simulateProcessing']):
+            self.removeAccumulationPartialFiles()
+
+        failedTaskListPath = self.saveFailedTaskList()
+        if len(self.failedFiles) > 0:
+            msg = Lang.get('Processing failed for {} files, please check the log for details:').format(
+                len(self.failedFiles)) + os.linesep + os.linesep.join(self.failedFiles)
+            if failedTaskListPath is not None:
+                msg += os.linesep + os.linesep + Lang.get('The list of failed files has been saved to {}').format(
+                    failedTaskListPath)
+            self.err(msg)
 
         # show debugging information upon completion
         if (self.config.opt['simulateProcessing']):
             # need try/catch here; depending on error, queue may be empty
             try:
-                debuggingInfo = self.debuggingResultQueue.get_nowait();
-                self.showDebuggingInformation(debuggingInfo)
+                debuggingInfo = self.debuggingResultQueue.get(True, 1.0);
+                self.gui.showDebuggingInformation(debuggingInfo)
             except queue.Empty as e:
                 pass
         else:
-            # give SPSS a few seconds to complete last file ...
-            time.sleep(3)
-            filesToRedo = self.spotOutputFileSizeAberrations()
-
-            if(len(filesToRedo) == 0):
-                # transfer information from queue to log (i.e. workers => backend)
-                self.transferLogQueue()
-                completedMsg = Lang.get('Processing for {} files completed in {:.2f} seconds').format(
-                    len(self.config.opt['inputFiles']), totalUsedTime)
-                self.executionLog.append(completedMsg)
-                tk.messagebox.showinfo(Lang.get('Processing completed'), completedMsg);
-            else:
-                tk.messagebox.showinfo(Lang.get('Incomplete Files detected'), Lang.get('Detected filesize aberration. Reprocessing incomplete files ...'))
-                self.redoIncompleteFiles(filesToRedo)
-
+            # accumulation counts the files merged
+            fileNum = len(self.config.opt['inputFiles']) if self.config.opt['accumulateData'] else self.totalFileNum
+            completedMsg = Lang.get('Processing for {} files completed in {:.2f} seconds').format(
+                fileNum, time.time() - self.start_time)
+            if self.skippedFileNum > 0:
+                completedMsg += os.linesep + Lang.get('{} files are up to date and have been skipped').format(
+                    self.skippedFileNum)
+            if self.cancelledFileNum > 0:
+                completedMsg += os.linesep + Lang.get('Processing has been cancelled; {} files have not been processed').format(
+                    self.cancelledFileNum)
+            if self.runMetrics is not None:
+                summary = self.runMetrics.finish()
+                if summary['tasks'] + summary['failedAttempts'] > 0:
+                    completedMsg += os.linesep + RunMetrics.formatSummary(summary)
+            self.executionLog.append(completedMsg)
+            self.gui.showInfo(Lang.get('Processing completed'), completedMsg);
+        self.executionLog.close()
+
+
+
+    def queueTask(self, job):
+        """
+        :param job: [run id, task id, input file, output file, placeholders, commands]; task ids are consecutive
+        """
+        self.jobs.append(job)
+        self.dispatchJob(job)
 
 
-    def trackProgress(self):
+    def dispatchJob(self, job):
         """
-        Indicates computation progress using progress bar in main window. Relies on time needed for already processed
-        files; performs linear extrapolation
+        Passes a job on to the workers; a Pipeline decides itself when to pass on the jobs of its steps
+        @see Pipeline.dispatchJob
         """
-        alreadyProcessedFiles = 0;
-        # keep updating the progress bar
-        # at least one of debugging result queue OR errorQueue is expected to fill as well
-        # queue may be empty immediately, as worker may "snatch" task before this function is even called.
-        while (not (self.queue.empty()) or (self.debuggingResultQueue.empty() and self.errorQueue.empty())):
-            processedAsOfNow = (self.totalFileNum - self.queue.qsize());
-            processedJustNow = processedAsOfNow - alreadyProcessedFiles;
-            alreadyProcessedFiles = processedAsOfNow;
+        self.queuedTimes[job[1]] = time.time()
+        if self.dispatcher is not None:
+            self.dispatcher(self, job)
+        elif self.paused:
+            self.heldJobs.append(job)
+        else:
+            self.queue.put(job)
 
-            # advance progressbar
-            self.gui.pb.step(processedJustNow / float(self.totalFileNum) * 100.0);
-            totalUsedTime = (time.time() - self.start_time);
 
-            # update estimated time
-            estimate = self.estimateRemainingTime(self.totalFileNum, alreadyProcessedFiles, totalUsedTime)
-            self.gui.remainingTimeLabel.config(text=Lang.get('Remaining time: %.2f seconds ') % estimate);
+    def getFailedTaskListPath(self):
+        return os.path.join(self.config.opt['outputDir'], self.failedTaskListFileName)
 
-            # propagate changes to GUI
-            self.gui.parent.update();
-            time.sleep(0.5);
 
-        # when processing is finished, reset progress bar
-        # by default, maximum progress bar can reach is 100 - thus, decrease by just that amount.
-        self.gui.pb.step(-100.0)
-        # propagate changes to GUI
-        self.gui.parent.update();
+    def saveFailedTaskList(self):
+        """
+        Saves the input files which could not be processed to the output directory, one per line; the list is removed
+        once a run completes without failures
+        @see loadFailedTaskList
+        :return: path of the list; None if there were no failures (or accumulating/simulating)
+        """
+        if self.config.opt['accumulateData'] or self.config.opt['simulateProcessing'] \
+                or not(os.path.isdir(self.config.opt['outputDir'])):
+            return None
 
+        filePath = self.getFailedTaskListPath()
+        if len(self.failedFiles) == 0:
+            if os.path.isfile(filePath):
+                os.remove(filePath)
+            return None
+        self.writeFileAtomically(filePath, ''.join(inputFilePath + '\n' for inputFilePath in self.failedFiles),
+                                 encoding='utf-8')
+        return filePath
 
 
-    def transferLogQueue(self):
+    def loadFailedTaskList(self):
         """
-        Move events from logQueue (i.e. workers) to the backend log
-        :return:
+        :return: input files which failed during the last run into the configured output directory
         """
-        while not self.logQueue.empty():
-            entry = self.logQueue.get_nowait()
-            self.executionLog.append(entry)
+        filePath = self.getFailedTaskListPath()
+        if not(os.path.isfile(filePath)):
+            return []
+        with io.open(filePath, 'r', encoding='utf-8') as f:
+            return [line.rstrip('\n') for line in f if len(line.strip()) > 0]
 
 
-    def runPreprocessingChecks(self):
-        if len(self.config.opt['inputFiles']) == 0:
-            self.err(Lang.get("You did not select any files"));
+    def handleEvent(self, event):
+        """
+        Processes a single event reported by a worker (or by the supervision); updates progress indicator
+        :param event: dictionary; key 'type' is one of 'started', 'finished', 'failed'
+        :return: False if the event is outdated and has been ignored
+        """
+        taskId = event['taskId']
+        if event['runId'] != self.runId:
             return False
 
-        #@todo:check whether REGEX matches all files
+        if event['type'] == 'started':
+            self.startedTasks += 1
+            timeout = float(self.config.opt.get('taskTimeout', 0))
+            # tasks processed by a single engine invocation are completed at once
+            deadline = event['time'] + timeout * event.get('batchSize', 1) if timeout > 0 else None
+            self.runningTasks[taskId] = {'workerId': event['workerId'], 'startTime': event['time'],
+                                         'deadline': deadline,
+                                         'queueWait': event['time'] - self.queuedTimes.get(taskId, event['time'])}
+            self.remainingTimeEstimator.startTask(event['outputFile'], event['time'])
+            return True
+
+        # tasks of killed workers may have been reported before the worker has been killed
+        running = self.runningTasks.get(taskId)
+        if running is None or running['workerId'] != event['workerId']:
+            return False
+        del self.runningTasks[taskId]
+        self.completedTasksByWorker[event['workerId']] = self.completedTasksByWorker.get(event['workerId'], 0) + 1
+        if self.runMetrics is not None:
+            self.runMetrics.record(taskId, event['inputFile'], event['outputFile'], event['type'], event['workerId'],
+                                   running['startTime'], event['time'], event['duration'], running['queueWait'],
+                                   event.get('batchSize', 1), self.failedAttempts.get(taskId, 0) + 1,
+                                   event.get('metrics'))
+        # failed attempts do not tell how long a task takes; retried tasks are added again @see retryTask
+        self.remainingTimeEstimator.finishTask(event['outputFile'], event['duration'] / event.get('batchSize', 1)
+                                               if event['type'] == 'finished' else None)
+
+        succeeded = False
+        if event['type'] == 'finished':
+            error = self.validateOutput(taskId, event.get('outputSignature'))
+            if error is not None:
+                self.executionLog.append(Lang.get('Error while processing {}: {}').format(event['inputFile'], error),
+                                         'error', event['inputFile'])
+                if self.retryTask(taskId, 0.0):
+                    return True
+                self.failedFiles.append(event['inputFile'])
+            else:
+                succeeded = True
+                if self.manifest is not None:
+                    task = self.tasks[taskId]
+                    self.manifest.record(task['inputFile'], task['outputFile'], self.template.contentHash,
+                                         task['placeholders'], event.get('inputSignature'),
+                                         event.get('outputSignature'))
+        elif event['type'] == 'failed':
+            self.executionLog.append(Lang.get('Error while processing {}: {}').format(event['inputFile'], event['error']),
+                                     'error', event['inputFile'], workerId=event['workerId'],
+                                     details=os.linesep.join(text.rstrip() for text in (event['output'], event['traceback'])
+                                                             if text))
+
+            # exponential backoff: the cause (i.e. a locked file or an unavailable license) may take a while
+            if self.retryTask(taskId, float(self.config.opt.get('retryBackoff', 5.0))):
+                return True
+            self.failedFiles.append(event['inputFile'])
+
+        self.completedTasks += 1
+        if self.completionListener is not None:
+            self.completionListener(self, self.tasks[taskId], succeeded)
+        # the next level of accumulation merges the files of the previous level
+        if len(self.accumulationLevels) > 0 and self.completedTasks == self.queuedTaskNum:
+            if len(self.failedFiles) > 0:
+                # the result would be incomplete; abandon remaining levels
+                self.accumulationLevels = []
+                self.totalFileNum = self.completedTasks
+            else:
+                self.queueAccumulationLevel()
+
+        # update progress and estimated time
+        self.gui.showProgress(self.completedTasks, self.totalFileNum, self.estimateRemainingTime())
         return True
 
 
+    def retryTask(self, taskId, backoff):
+        """
+        Counts a failed attempt of the given task and queues it again unless it ran out of retries
+        :param backoff: delay of the first retry in seconds; doubled with every further attempt
+        :return: True if the task will be processed again
+        """
+        attempts = self.failedAttempts.get(taskId, 0) + 1
+        self.failedAttempts[taskId] = attempts
+        if attempts > int(self.config.opt.get('maxRetries', 1)):
+            return False
+        delay = backoff * 2 ** (attempts - 1)
+        self.pendingRetries.append((time.time() + delay, taskId))
+        self.remainingTimeEstimator.addTask(self.tasks[taskId]['outputFile'])
+        self.executionLog.append(Lang.get('Retrying {} in {:.0f} seconds').format(self.tasks[taskId]['inputFile'],
+                                                                                delay),
+                                 'warning', self.tasks[taskId]['inputFile'])
+        return True
 
-    def populateTaskQueue(self):
-        #populate execution log as well
-        self.executionLog = []
-        self.executionLog.append(Lang.get('Execution log on {}').format(datetime.datetime.now()))
-        self.executionLog.append(Lang.get('Configuration dump: ') + os.linesep + self.config.toJSON())
-        self.executionLog.append( os.linesep + Lang.get('Execution log:'))
-
-        # keep track of files output by SPSS
-        # used to spot aberrations in filesize
-        self.outputFilePaths = []
-        self.inputFilePaths  = []
-
-        #for debugging, only very first file will be processed
-        if(self.config.opt['simulateProcessing']):
 
-            #if we do not accumulate, choose only one
-            if not(self.config.opt['accumulateData']):
-                self.config.opt['inputFiles'] = self.config.opt['inputFiles'][0:1]
-            #otherwise (we are accumulating), we need at least two
+    def createOutputValidator(self):
+        """
+        Output files are validated as soon as their task has been completed (@see validateOutput). Any object with a
+        method add(outputFile, size) returning the output files which turned out to be invalid may be used.
+        :return: None if outputs are not validated
+        """
+        if not(self.config.opt.get('checkFileSizes')) or self.config.opt['simulateProcessing'] \
+                or self.config.opt['accumulateData']:
+            return None
+        return OutputSizeValidator()
+
+
+    def createRunMetrics(self):
+        """
+        :return: None if metrics are not recorded @see RunMetrics
+        """
+        if not(self.config.opt.get('recordTaskMetrics', True)) or self.config.opt['simulateProcessing'] \
+                or not(os.path.isdir(self.config.opt['outputDir'])):
+            return None
+        try:
+            return RunMetrics(os.path.join(self.config.opt['outputDir'], RunMetrics.fileName), self.start_time)
+        except (IOError, OSError) as e:
+            self.gui.warn(Lang.get('Unable to record task metrics: ') + str(e))
+            return None
+
+
+    def validateOutput(self, taskId, outputSignature):
+        """
+        Checks the output of a completed task, based on the size and hash reported by the worker. The validation may
+        reject outputs of tasks completed earlier as well; those are queued again right away (or reported as failed),
+        while the remaining tasks go on.
+        An output which is rejected, reprocessed and then turns out identical is legitimate (i.e. a small subject)
+        and accepted.
+        :return: error message if the output of the given task is rejected
+        """
+        if self.outputValidator is None or outputSignature is None:
+            return None
+        outputFile = self.tasks[taskId]['outputFile']
+        if self.rejectedOutputs.get(taskId) == outputSignature['hash']:
+            self.executionLog.append(Lang.get('Output file size deviates, but has been reproduced identically: ') +
+                                     outputFile, 'info', self.tasks[taskId]['inputFile'])
+            return None
+
+        error = None
+        for rejectedFile in self.outputValidator.add(outputFile, outputSignature['size']):
+            rejectedTaskId = self.taskIdsByOutputFile[rejectedFile]
+            signature = outputSignature if rejectedTaskId == taskId else \
+                RunManifest.getFileSignature(rejectedFile)
+            if signature is None or self.rejectedOutputs.get(rejectedTaskId) == signature['hash']:
+                continue
+            self.rejectedOutputs[rejectedTaskId] = signature['hash']
+            message = Lang.get('Output file size deviates considerably from the other output files')
+            if rejectedTaskId == taskId:
+                error = message
+                continue
+
+            # completed earlier; processed again
+            self.executionLog.append(Lang.get('Error while processing {}: {}').format(
+                self.tasks[rejectedTaskId]['inputFile'], message), 'error', self.tasks[rejectedTaskId]['inputFile'])
+            if self.manifest is not None:
+                self.manifest.forget(rejectedFile)
+            if self.retryTask(rejectedTaskId, 0.0):
+                self.completedTasks -= 1
             else:
-                self.config.opt['inputFiles'] = self.config.opt['inputFiles'][0:2]
+                self.failedFiles.append(self.tasks[rejectedTaskId]['inputFile'])
+        return error
 
 
-        # we need copy here: we may reload the configuration file and do not want to
-        # remove files permanently from the configuration after having processed them once
-        inputFilesToUse = self.config.opt['inputFiles'][:]
-        self.totalFileNum = 0
+    def superviseWorkers(self):
+        """
+        Queues failed tasks again once their backoff expired; kills workers which exceeded the task timeout and
+        replaces workers which terminated unexpectedly. Tasks of such workers are reported as failed.
+        """
+        self.queueDueRetries()
+        abandonedWorkers = self.getTimedOutWorkers()
+        for workerId in abandonedWorkers:
+            self.workerPool.restartWorker(workerId)
+        for workerId in self.workerPool.replaceDeadWorkers():
+            abandonedWorkers.setdefault(workerId, Lang.get('Worker terminated unexpectedly'))
+        self.abandonTasks(abandonedWorkers)
 
-        #if we accumulate data, move and rename the very last entry, but do not touch the others
-        if(self.config.opt['accumulateData']):
-           self.moveRenameAccumulationFile(inputFilesToUse)
 
+    def queueDueRetries(self):
+        now = time.time()
+        for dueTime, taskId in [retry for retry in self.pendingRetries if retry[0] <= now]:
+            self.pendingRetries.remove((dueTime, taskId))
+            self.dispatchJob(self.jobs[taskId])
 
-        self.start_time = time.time()
-        # fill up queue of tasks/files
-        for filePath in inputFilesToUse:
-            self.defineDefaultPlaceholders(filePath);
-            outputFilePath = self.getOutputFilePath(filePath);
-            # attention: pickling in Python is seriously broken. passing self.config will mess up the configuration
-            # (there are literally values missing)
-            # parsing it to JSON and converting back works just fine.
-            configStr = self.config.toJSON();
-            self.queue.put([filePath, outputFilePath, configStr]);
-
-            # reconstruct file output path
-            # used to spot aberrations in file size after processing
-            self.outputFilePaths.append(outputFilePath)
-            self.inputFilePaths.append(filePath)
 
-            self.totalFileNum += 1
+    def getTimedOutWorkers(self):
+        """
+        :return: dictionary worker id => error message for all workers whose task exceeded the timeout
+        """
+        now = time.time()
+        timedOutWorkers = {}
+        for taskId, running in self.runningTasks.items():
+            if running['deadline'] is not None and running['deadline'] < now and not(running.get('abandoned')):
+                timedOutWorkers[running['workerId']] = Lang.get('Task exceeded the timeout of {} seconds').format(
+                    self.config.opt.get('taskTimeout'))
+        return timedOutWorkers
+
 
+    def abandonTasks(self, abandonedWorkers):
+        """
+        Reports the tasks of killed workers as failed
+        :param abandonedWorkers: dictionary worker id => error message
+        """
+        now = time.time()
+        for taskId, running in self.runningTasks.items():
+            if running['workerId'] in abandonedWorkers and not(running.get('abandoned')):
+                # reported via the event queue, i.e. in order with all other events
+                running['abandoned'] = True
+                job = self.jobs[taskId]
+                self.eventQueue.put({'runId': self.runId, 'taskId': taskId, 'workerId': running['workerId'],
+                                     'inputFile': job[2], 'outputFile': job[3], 'type': 'failed', 'time': now,
+                                     'duration': now - running['startTime'], 'output': '', 'traceback': '',
+                                     'error': abandonedWorkers[running['workerId']]})
+
+
+    def isProcessingComplete(self):
+        """
+        Every worker reports each task it is done with (successful or not). Counting those reports (instead of looking
+        at the task queue) takes tasks into account which are still running.
+        """
+        return self.completedTasks >= self.totalFileNum
 
 
-    def spotOutputFileSizeAberrations(self):
+    def pauseProcessing(self):
         """
-            computes file size histogram and 'spots' all files whose filesize deviates by more than x% from the mean.
-        :return: indices of files to redo
+        Holds back the tasks no worker has taken yet; tasks being processed are completed
         """
-        # 20%
-        deviationThreshold = 0.2
+        if self.paused:
+            return
+        self.paused = True
+        self.heldJobs = self.workerPool.takeQueuedTasks() + self.heldJobs
 
-        fileSizeHist = [os.path.getsize(filePath) for filePath in self.outputFilePaths]
-        avgFileSize = sum(fileSizeHist) / float(len(fileSizeHist))
-        isOutlier = lambda fileSize : (fileSize / avgFileSize) < (1 - deviationThreshold)
 
-        filesToRedo = [i for i in range(0, len(fileSizeHist)) if isOutlier(fileSizeHist[i])]
+    def resumeProcessing(self):
+        if not(self.paused):
+            return
+        self.paused = False
+        heldJobs, self.heldJobs = self.heldJobs, []
+        for job in heldJobs:
+            self.queue.put(job)
 
-        return filesToRedo
 
+    def cancelProcessing(self):
+        """
+        Drops all tasks which have not been completed yet and kills the workers processing tasks; processing is
+        complete afterwards. Files completed so far are kept (and recorded in the manifest).
+        """
+        self.paused, self.heldJobs = False, []
+        self.workerPool.takeQueuedTasks()
+        self.pendingRetries = []
+        self.accumulationLevels = []
+        self.pendingInputFiles, self.deferredEntries = set(), {}
+        for workerId in set(running['workerId'] for running in self.runningTasks.values()):
+            self.workerPool.restartWorker(workerId)
+        # events of the killed workers are ignored, as their tasks are not running anymore
+        self.runningTasks = {}
+        self.cancelledFileNum = self.totalFileNum - self.completedTasks
+        self.totalFileNum = self.completedTasks
+
+
+    def getWorkerStatus(self):
+        """
+        :return: dictionary worker id => {'inputFile', 'startTime', 'taskNum', 'completedTasks'}; input file and start
+        time of the first task the worker is processing (None if it is idle), the number of tasks it is processing (a
+        batch, @see filesPerInvocation) and the number of tasks it has been done with
+        """
+        status = dict((workerId, {'inputFile': None, 'startTime': None, 'taskNum': 0,
+                                  'completedTasks': self.completedTasksByWorker.get(workerId, 0)})
+                      for workerId in self.workerPool.getWorkerIds())
+        for taskId, running in sorted(self.runningTasks.items()):
+            workerStatus = status.get(running['workerId'])
+            if workerStatus is None or running.get('abandoned'):
+                continue
+            if workerStatus['inputFile'] is None:
+                workerStatus['inputFile'], workerStatus['startTime'] = self.jobs[taskId][2], running['startTime']
+            workerStatus['taskNum'] += 1
+        return status
+
+
+    def pollEvents(self):
+        """
+        Handles all events reported by workers so far; does not block (i.e. to be called between commands, @see ProcessingThread)
+        :return: True if all tasks have been completed
+        """
+        self.superviseWorkers()
+        self.transferLogQueue()
+        try:
+            while not(self.isProcessingComplete()):
+                self.handleEvent(self.eventQueue.get_nowait())
+        except queue.Empty:
+            pass
+        return self.isProcessingComplete()
 
 
-    def redoIncompleteFiles(self, inputFileIndices):
-        filesToRedo = [self.inputFilePaths[i] for i in inputFileIndices]
-        self.config.opt['inputFiles'] = filesToRedo
-        self.runProcessing()
+    def iterateEvents(self):
+        """
+        Blocks until the next event is reported; handles and yields every event until all tasks have been completed
+        """
+        while not(self.isProcessingComplete()):
+            self.superviseWorkers()
+            self.transferLogQueue()
+            try:
+                event = self.eventQueue.get(True, self.supervisionInterval)
+            except queue.Empty:
+                continue
+            if self.handleEvent(event):
+                yield event
 
 
 
-    def moveRenameAccumulationFile(self, inputFilesToUse):
+    @classmethod
+    def getTemporaryOutputPath(cls, filePath):
         """
-        Move very last file to destination, rename it and accumulate all other data on top
-        :param inputFilesToUse: list of input paths
+        Name a file is written to before it is renamed to the given name; within the same directory, so that renaming
+        is atomic. Each file is produced by a single task at a time, so the name does not need to be unique otherwise.
         """
-        lastFilePath = inputFilesToUse.pop()
-        self.totalFileNum += 1
-        #override with input from GUI
-        Configuration.accumulationFileName  = self.config.opt['outputFilePattern'];
-        newFilePath = os.path.join(self.config.opt['outputDir'], Configuration.accumulationFileName)
-        shutil.copyfile(lastFilePath, newFilePath)
+        directory, fileName = os.path.split(filePath)
+        return os.path.join(directory, cls.temporaryFilePrefix + fileName)
+
 
-        # furthermore, set spss execution file to template
-        self.config.opt['spssFile'] = Configuration.accumulationFileTemplate
-        self.config.opt['inputRegexPattern'] = self.config.opt['accumulationFilePattern']
+    @classmethod
+    def commitOutputFile(cls, filePath):
+        """
+        Renames the temporary file of the given output file into place; nothing happens if the syntax did not write the
+        output file (i.e. does not use <OUTPUTFILE>)
+        """
+        temporaryFilePath = cls.getTemporaryOutputPath(filePath)
+        if os.path.isfile(temporaryFilePath):
+            os.replace(temporaryFilePath, filePath)
 
-        #propagate changes back to GUI
-        self.gui.updateConfigGUI()
 
+    @classmethod
+    def discardOutputFile(cls, filePath):
+        """
+        Removes the temporary file of the given output file, i.e. after processing failed
+        """
+        temporaryFilePath = cls.getTemporaryOutputPath(filePath)
+        if os.path.isfile(temporaryFilePath):
+            os.remove(temporaryFilePath)
 
 
-    def showDebuggingInformation(self, debuggingInfo):
+    @classmethod
+    def writeFileAtomically(cls, filePath, text, encoding = None):
         """
-        Spawns new window, allows to inspect parameters and generated code for a single file
-        :param debuggingInfo: dictionary with keys 'placeholders' and 'commands'
-        :return:
+        Writes the given text to a temporary file, which is renamed once complete; the file is either missing or
+        complete, even if writing is interrupted
         """
-        t = tk.Toplevel(self.gui.parent)
-        t.wm_title(Lang.get("Debugging information"))
+        temporaryFilePath = cls.getTemporaryOutputPath(filePath)
+        with io.open(temporaryFilePath, 'w', encoding=encoding) as f:
+            f.write(text)
+        os.replace(temporaryFilePath, filePath)
 
-        #organize placeholders and resulting source code into panes
-        n = ttk.Notebook(t)
 
-        n.add(self.gui.createFrameWithText(n, debuggingInfo['placeholders']), text=Lang.get('Placeholders'))
-        n.add(self.gui.createFrameWithText(n, debuggingInfo['commands']), text=Lang.get('Sourcecode'))
-        n.pack(expand=1, fill="both")
+    def removeOrphanedTemporaryFiles(self):
+        """
+        Removes temporary files left behind by interrupted runs from all directories files are written to
+        Please note that another instance of the BatchProcessor must not write to the same directories at the same time.
+        """
+        directories = set(os.path.dirname(entry['outputFile']) for entry in self.fileNameAnalysis.entries) \
+            if self.fileNameAnalysis is not None else set()
+        directories.add(self.config.opt['outputDir'])
+        for key in ('defaultCaptureOutputOutDir', 'defaultSyntaxOutDir'):
+            if self.config.opt.get(key, 'none') not in ('', 'none'):
+                directories.add(self.config.opt[key])
+
+        for directory in directories:
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.name.startswith(self.temporaryFilePrefix) and entry.is_file():
+                    os.remove(entry.path)
 
-        # propagate changes to GUI
-        self.gui.parent.update();
 
+    def transferLogQueue(self):
+        """
+        Writes the records reported by the workers so far (@see log) to the log of the run; records of runs which are
+        over are dropped. Called whenever events are handled: the queue is bounded, workers wait while it is full.
+        """
+        while True:
+            try:
+                record = self.logQueue.get_nowait()
+            except queue.Empty:
+                return
+            if record.pop('runId', None) == self.runId:
+                self.executionLog.write(record)
 
 
-    def estimateRemainingTime(self, totalFiles, processedFiles, usedTime):
-        if(processedFiles == 0):
-            return 0.0;
-        else:
-            return (float(totalFiles - processedFiles) / float(processedFiles)) * usedTime;
+    def tailLog(self, recordNum = None, filterText = '', minLevel = 'info'):
+        """
+        Most recent records of the log; may be called by any thread @see ExecutionLog.tail
+        """
+        return self.executionLog.tail(recordNum, filterText, minLevel)
 
 
-    @classmethod
-    def loadRawCommandsFromFile(cls, config):
+    def saveExecutionLog(self, filePath):
         """
-        Returns list of commands from file (which must be UTF-8 encoded)
-        :param config: key 'spssFile' will be used
-        :return: list of commands
+        Exports the log of the current (or last) run in human readable form
         """
-        with io.open(config.opt['spssFile'], "r+b") as f:
-            if(f == None):
-                cls.err(Lang.get("Unable to obtain file handle for SPSS file"))
-            else:
-                spssCommands = f.read()
+        with io.open(filePath, 'w', encoding='utf-8') as f:
+            self.executionLog.export(f)
 
-                # remove BOM byte, should it be there
-                spssCommands = spssCommands.decode("utf-8-sig")
 
-        usesWindowsNewlines = "\r\n" in spssCommands
+    def createExecutionLog(self, runStartTime):
+        """
+        :return: log within the output directory @see ExecutionLog; only kept in memory if it cannot be opened
+        """
+        try:
+            return ExecutionLog.fromConfiguration(self.config, runStartTime)
+        except (IOError, OSError) as e:
+            self.gui.warn(Lang.get('Unable to write the execution log: ') + str(e))
+            return ExecutionLog(None, runStartTime)
 
-        #by definition, commands end with "." and a newline
-        if not(usesWindowsNewlines):
-            spssCommands = spssCommands.split("\n");
-        else:
-            spssCommands = spssCommands.split("\r\n");
 
-        spssCommands = BatchProcessor.removeCommentsFromCommands(spssCommands)
-        return BatchProcessor.mergeLinesIntoCommands(spssCommands)
+    def loadTemplate(self):
+        """
+        :return: False if the syntax file could not be read (the error has been reported)
+        """
+        error = self.compileTemplate()
+        if error is not None:
+            self.err(error)
+            return False
+        return True
+
+
+    def compileTemplate(self):
+        """
+        Compiles the selected syntax file; the compiled template is reused as long as the file does not change
+        :return: None if successful, error message otherwise
+        """
+        spssFile = self.config.opt['spssFile']
+        if self.template is None or self.template.filePath != spssFile or self.template.isStale():
+            try:
+                self.template = SyntaxTemplate.compile(spssFile)
+            except (IOError, OSError, UnicodeDecodeError) as e:
+                self.template = None
+                return Lang.get("Unable to read SPSS file: ") + str(e)
+        return None
+
+
+    def runPreprocessingChecks(self):
+        if len(self.config.opt['inputFiles']) == 0:
+            self.err(Lang.get("You did not select any files"));
+            return False
+
+        # all problems are reported at once, before any task is queued
+        check = self.runPreflightChecks()
+        if check.hasErrors():
+            self.err(check.getReport())
+            return False
+        self.preflightWarnings = check.warnings
+        if len(check.warnings) > 0:
+            self.gui.warn(check.getReport())
+        return True
+
+
+    def runPreflightChecks(self):
+        """
+        Analyses the input file names and validates the whole job without processing any file
+        @see PreflightCheck
+        :return: PreflightCheck holding all errors and warnings
+        """
+        self.fileNameAnalysis = None
+        errors = []
+        # accumulation merges the input files as they are; neither their names nor a syntax file are used
+        if not(self.config.opt['accumulateData']):
+            templateError = self.compileTemplate()
+            if templateError is not None:
+                errors.append(templateError)
+            try:
+                self.fileNameAnalysis = FileNameAnalysis.fromConfiguration(self.config)
+                self.fileNameAnalysis.analyse(self.config.opt['inputFiles'])
+            except re.error as e:
+                errors.append(Lang.get('Invalid regular expression: ') + str(e))
+
+        check = PreflightCheck(self.config, self.fileNameAnalysis, self.template, self.pendingInputFiles)
+        for error in errors:
+            check.addError(error)
+        return check.run()
+
+
+
+    def populateTaskQueue(self):
+        # the log of a run which has been aborted has not been closed
+        self.executionLog.close()
+        self.executionLog = self.createExecutionLog(time.time())
+        # the input files are listed by the records of their tasks; the settings are recorded without them
+        self.executionLog.append(Lang.get('Execution log on {}: {} input files').format(
+            datetime.datetime.now(), len(self.config.opt['inputFiles'])),
+            settings=json.loads(self.config.toRunSettingsJSON()))
+        if len(self.preflightWarnings) > 0:
+            self.executionLog.append(Lang.get('Warnings:') + os.linesep +
+                                     PreflightCheck.formatProblems(self.preflightWarnings), 'warning')
+
+        #for debugging, only very first file will be processed (@see below)
+        #if we are accumulating, we need at least two
+        if(self.config.opt['simulateProcessing'] and self.config.opt['accumulateData']):
+            self.config.opt['inputFiles'] = self.config.opt['inputFiles'][0:2]
+
+
+        # we need copy here: we may reload the configuration file and do not want to
+        # remove files permanently from the configuration after having processed them once
+        inputFilesToUse = self.config.opt['inputFiles'][:]
+        self.totalFileNum = 0
+        self.queuedTaskNum = 0
+        # queued tasks by task id; failed tasks are queued again
+        self.jobs = []
+        # input file, output file and placeholders of each task; indexed by task id
+        self.tasks = []
+        # @see validateOutput
+        self.taskIdsByOutputFile = {}
+        # task id => time it has been queued (again)
+        self.queuedTimes = {}
+        self.remainingTimeEstimator = RemainingTimeEstimator()
+        # input file => entry of files produced by the previous step of a Pipeline (@see releaseInputFile)
+        self.deferredEntries = {}
+        self.releasedEntries = {}
+        self.manifest = None
+        self.skippedFileNum = 0
+        self.accumulationLevels = []
+
+        # accumulation does not use a template; merging syntax is generated instead
+        if(self.config.opt['accumulateData']):
+            self.runId = self.workerPool.broadcastRunSettings({'template': None,
+                                                               'config': self.config.toRunSettingsJSON()},
+                                                              self.ownsWorkerPool)
+            self.start_time = time.time()
+            return self.populateAccumulationTasks(inputFilesToUse)
+
+        if not(self.loadTemplate()):
+            return False
+
+        # template and settings are sent to every worker once; tasks refer to them by the run id and only carry what
+        # differs between files
+        self.runId = self.workerPool.broadcastRunSettings({'template': self.template,
+                                                           'config': self.config.toRunSettingsJSON()},
+                                                          self.ownsWorkerPool)
+
+        self.start_time = time.time()
+
+        # outputs recorded in the manifest of the output directory are not produced again unless their input,
+        # template or placeholders changed
+        if not(self.config.opt['simulateProcessing']) and os.path.isdir(self.config.opt['outputDir']):
+            self.manifest = RunManifest(self.config.opt['outputDir'])
+        self.skipUpToDateFiles = self.manifest is not None and self.config.opt.get('skipUpToDateFiles', True)
+
+        # input files have been analysed by the preprocessing checks already; files which cannot be processed are
+        # not part of the analysis' entries
+        entries = self.fileNameAnalysis.entries
+        if(self.config.opt['simulateProcessing']):
+            entries = entries[0:1]
+
+        # fill up queue of tasks/files
+        for entry in entries:
+            if entry['inputFile'] in self.pendingInputFiles:
+                # produced by the previous step of a Pipeline; queued once available (@see releaseInputFile)
+                self.deferredEntries[entry['inputFile']] = entry
+                self.remainingTimeEstimator.addTask(entry['outputFile'])
+                self.totalFileNum += 1
+            elif self.queueEntry(entry):
+                self.totalFileNum += 1
+
+        self.queuedTaskNum = self.totalFileNum
+        if self.skippedFileNum > 0:
+            self.executionLog.append(Lang.get('{} files are up to date and have been skipped').format(self.skippedFileNum))
+        return True
+
+
+
+    def queueEntry(self, entry):
+        """
+        Queues the task of an entry of the FileNameAnalysis unless its output is up to date
+        :return: False if the file has been skipped
+        """
+        filePath, outputFilePath = entry['inputFile'], entry['outputFile']
+        if self.skipUpToDateFiles and self.manifest.isUpToDate(filePath, outputFilePath, self.template.contentHash,
+                                                               entry['placeholders']):
+            self.skippedFileNum += 1
+            self.remainingTimeEstimator.removeTask(outputFilePath)
+            return False
+        self.remainingTimeEstimator.addTask(outputFilePath, self.getFileSize(filePath))
+        placeholders = dict(entry['placeholders'], OUTPUTFILE=outputFilePath)
+        # tasks are identified by their position within the run
+        taskId = len(self.tasks)
+        self.queueTask([self.runId, taskId, filePath, outputFilePath, placeholders, None])
+        self.taskIdsByOutputFile[outputFilePath] = taskId
+        self.tasks.append(entry)
+        return True
+
+
+    def releaseInputFile(self, inputFile, produced = True):
+        """
+        Queues the task of an input file which has been deferred until the previous step of a Pipeline produced it.
+        Files released again (i.e. reprocessed by the previous step after its output had been rejected) are processed
+        again.
+        :param produced: False if the previous step failed to produce the file; its task fails as well
+        """
+        self.pendingInputFiles.discard(inputFile)
+        entry = self.deferredEntries.pop(inputFile, None)
+        if entry is None:
+            entry = self.releasedEntries.get(inputFile)
+            if entry is None or not(produced):
+                return
+            # counted anew
+            self.totalFileNum += 1
+        self.releasedEntries[inputFile] = entry
+
+        if produced:
+            if not(self.queueEntry(entry)):
+                self.totalFileNum -= 1
+            return
+        self.executionLog.append(Lang.get('Error while processing {}: {}').format(
+            inputFile, Lang.get('Input file has not been produced by the previous step')), 'error', inputFile)
+        self.failedFiles.append(inputFile)
+        self.remainingTimeEstimator.removeTask(entry['outputFile'])
+        self.completedTasks += 1
+        self.gui.showProgress(self.completedTasks, self.totalFileNum, self.estimateRemainingTime())
+
+
+    def getPlannedOutputFiles(self):
+        """
+        Output files of the run; used as the input files of the next step of a Pipeline
+        :return: (all output files, output files which have not been produced yet)
+        """
+        if self.config.opt['accumulateData']:
+            return [self.accumulationFile], set([self.accumulationFile])
+        outputFiles = [entry['outputFile'] for entry in self.fileNameAnalysis.entries]
+        pendingOutputFiles = set(task['outputFile'] for task in self.tasks)
+        pendingOutputFiles.update(entry['outputFile'] for entry in self.deferredEntries.values())
+        return outputFiles, pendingOutputFiles
+
+
+    def populateAccumulationTasks(self, inputFilesToUse):
+        """
+        Merges the cases of all input files into one file. Instead of adding one file after the other to the
+        accumulation file, files are merged in batches: the batches of a level are merged in parallel, the resulting
+        partial files are merged by the next level, until one file remains.
+        @see planAccumulation
+        """
+        self.accumulationLevels = self.planAccumulation(inputFilesToUse)
+        self.accumulationFile = self.accumulationLevels[-1][0][1]
+        self.accumulationPartialFiles = [outputFilePath for level in self.accumulationLevels[:-1]
+                                         for (inputFilePaths, outputFilePath) in level]
+        self.totalFileNum = sum(len(level) for level in self.accumulationLevels)
+
+        # merging takes about as long as reading the files merged; partial files are about as large as their inputs
+        sizes = dict((filePath, self.getFileSize(filePath) or 0) for filePath in inputFilesToUse)
+        for level in self.accumulationLevels:
+            for (inputFilePaths, outputFilePath) in level:
+                sizes[outputFilePath] = sum(sizes[filePath] for filePath in inputFilePaths)
+                self.remainingTimeEstimator.addTask(outputFilePath, sizes[outputFilePath])
+
+        self.queueAccumulationLevel()
+        return True
+
+
+    def planAccumulation(self, inputFilePaths):
+        """
+        Files are merged in the same order as the former sequential accumulation did: very last file first, followed
+        by all others in the given order.
+        :param inputFilePaths: list of input paths
+        :return: list of levels; each level is a list of (input files, output file)
+        """
+        # ADD FILES accepts at most 50 files
+        batchSize = min(max(2, int(self.config.opt.get('accumulationBatchSize', 50))), 50)
+        accumulationFileName = self.config.opt['outputFilePattern'] or Configuration.accumulationFileName
+        finalFilePath = self.config.opt['outputDir'] + '/' + accumulationFileName
+
+        filePaths = inputFilePaths[-1:] + inputFilePaths[:-1]
+        levels = []
+        while True:
+            batches = [filePaths[i:i + batchSize] for i in range(0, len(filePaths), batchSize)]
+            if len(batches) <= 1:
+                levels.append([(filePaths, finalFilePath)])
+                return levels
+
+            level = []
+            for i, batch in enumerate(batches):
+                partialFilePath = self.config.opt['outputDir'] + '/' + '.{}.part{}-{}.sav'.format(
+                    os.path.splitext(accumulationFileName)[0], len(levels), i)
+                level.append((batch, partialFilePath))
+            levels.append(level)
+            filePaths = [outputFilePath for (batch, outputFilePath) in level]
+
+
+    def queueAccumulationLevel(self):
+        """
+        Queues all merging tasks of the next level
+        """
+        for (inputFilePaths, outputFilePath) in self.accumulationLevels.pop(0):
+            # renamed into place by the worker (@see runSPSSProcessOnFile)
+            commands = self.generateAccumulationCommands(inputFilePaths, self.getTemporaryOutputPath(outputFilePath))
+            placeholders = {'OUTPUTFILE': outputFilePath, 'fileName': os.path.basename(outputFilePath)}
+            self.queueTask([self.runId, self.queuedTaskNum, outputFilePath, outputFilePath, placeholders, commands])
+            self.tasks.append({'inputFile': outputFilePath, 'outputFile': outputFilePath, 'placeholders': {}})
+            self.queuedTaskNum += 1
 
-    @staticmethod
-    def removeCommentsFromCommands(commands):
-        ret = []
-        for command in commands:
-            command = command.strip()
-            if(len(command) > 0 and command[0] != '*'):
-                ret.append(command)
-        return ret
 
     @staticmethod
-    def mergeLinesIntoCommands(lines):
+    def generateAccumulationCommands(inputFilePaths, outputFilePath):
         """
-        A command may span several lines; merge parts from several lines into point-separated commands
-        :return: array of commands where each line corresponds to a command.
+        Generates syntax merging the cases of all given files (in the given order) into the output file
         """
-        currentCommand = ""
-        ret = []
+        # quotes within strings are doubled in SPSS syntax
+        quote = lambda path: "'" + path.replace("'", "''") + "'"
 
-        for line in lines:
-            currentCommand += " "
-            currentCommand += line
-            if(line[-1] == '.'):
-                ret.append(currentCommand)
-                currentCommand = ""
+        if len(inputFilePaths) == 1:
+            commands = [' GET FILE=' + quote(inputFilePaths[0]) + '.']
+        else:
+            commands = [' ADD FILES ' + ' '.join('/FILE=' + quote(path) for path in inputFilePaths) + '.']
+        commands.append(' EXECUTE.')
+        commands.append(' SAVE OUTFILE=' + quote(outputFilePath) + ' /COMPRESSED.')
+        return commands
 
-        return ret
 
+    def removeAccumulationPartialFiles(self):
+        for filePath in self.accumulationPartialFiles:
+            if os.path.isfile(filePath):
+                os.remove(filePath)
+        self.accumulationPartialFiles = []
 
-    @classmethod
-    def instantiatePlaceholders(cls, config, inputFilePath, outputFilePath):
-        fileName = os.path.basename(inputFilePath);
-        inputFileNameMatch = re.match(config.opt['inputRegexPattern'], fileName)
 
-        inputPath, fileName = os.path.split(inputFilePath);
-        # set special placeholders
-        config.opt['placeholders']['INFILE'] = inputFilePath;
-        # input Path doesn't have a trailing slash
-        config.opt['placeholders']['INPUTDIR'] = inputPath + '/';
-        config.opt['placeholders']['OUTPUTFILE'] = outputFilePath;
-        # output Path doesn't have a trailing slash
-        config.opt['placeholders']['OUTPUTDIR'] = config.opt['outputDir'] + '/';
-        config.opt['placeholders']['fileName'] = basename(inputFilePath);
 
-        # incorporate the capture groups in the input file name into REGEX file
-        # get groupnames themselves
-        for grpName, grpValue in inputFileNameMatch.groupdict().items():
-            config.opt['placeholders'][grpName] = grpValue;
+    def estimateRemainingTime(self):
+        """
+        :return: (remaining seconds, lower bound, upper bound); None until the first task has been completed
+        @see RemainingTimeEstimator
+        """
+        return self.remainingTimeEstimator.estimate(time.time(), self.workerPool.getWorkerCount())
+
 
+    @staticmethod
+    def getFileSize(filePath):
+        """
+        :return: size in bytes; None if the file does not exist (yet)
+        """
+        try:
+            return os.path.getsize(filePath)
+        except OSError:
+            return None
 
 
     @classmethod
-    def applyPlaceholders(cls, command, config):
-        # replace placeholders
-        for placeholderKey, substitute in config.opt['placeholders'].items():
-            command = command.replace("<" + placeholderKey + ">", substitute);
-        return command
+    def prepareCommands(cls, template, inputFilePath, placeholders, config, logQueue, commands = None):
+        """
+        Instantiates the template for a single file; populates config.opt['placeholders']
+        :param template: SyntaxTemplate instance, compiled once per run
+        :param placeholders: placeholders of the file as resolved by the backend
+        :param commands: commands generated by the backend (i.e. for accumulation); used instead of the template
+        :return: list of commands
+        """
+        logMsg = Lang.get("Processing ") +  inputFilePath + "..."
+        print(logMsg);
+        cls.log(logQueue, logMsg, 'info', inputFilePath)
 
+        config.opt['placeholders'] = placeholders
+        if commands is not None:
+            allCommands = commands
+        else:
+            undefinedPlaceholders = set()
+            allCommands = template.instantiate(placeholders, undefinedPlaceholders)
+            # undefined placeholders are kept as they are; the syntax may use "<...>" for other purposes
+            if len(undefinedPlaceholders) > 0:
+                cls.log(logQueue, Lang.get('Undefined placeholders in syntax: ') + ', '.join(sorted(undefinedPlaceholders)),
+                        'warning', inputFilePath)
+        return allCommands
 
 
     @classmethod
-    def runSPSSProcessOnFile(cls, inputFilePath, outputFilePath, config, logQueue, debuggingResultQueue, errorQueue):
+    def runSPSSProcessOnFile(cls, template, inputFilePath, placeholders, config, logQueue, debuggingResultQueue,
+                             commands = None, metrics = None):
         """
         process single given file with SPSS template and save to output File
+        :param template: SyntaxTemplate instance, compiled once per run
+        :param placeholders: placeholders of the file as resolved by the backend
+        :param config: settings of the run; shared by all files
+        :param commands: commands generated by the backend (i.e. for accumulation); used instead of the template.
+        Those have to write to the temporary output file (@see getTemporaryOutputPath).
+        :param metrics: dictionary receiving the duration of each phase and the usage of the engine (@see RunMetrics);
+        filled in even if the engine fails
         returns the time it used up (in seconds)
         """
-        #create dedicated TK instance; tk _always_ requires a window, however we just want message Boxes
-        # create and hide main window
-        root = tk.Tk()
-        root.withdraw()
-
         start_time = time.time()
+        if metrics is None:
+            metrics = {}
+
+        # named by the placeholders of the task, i.e. by the actual output file
+        capturePlaceholders = placeholders
+        # the engine writes to a temporary file, which is renamed into place once complete
+        outputFilePath = placeholders.get('OUTPUTFILE')
+        if outputFilePath and not(config.opt['simulateProcessing']):
+            placeholders = dict(placeholders, OUTPUTFILE=cls.getTemporaryOutputPath(outputFilePath))
+        allCommands = cls.prepareCommands(template, inputFilePath, placeholders, config, logQueue, commands)
+        metrics['instantiation'] = time.time() - start_time
+
+        if(config.opt['simulateProcessing']):
+            pointPlusNewline = '.' + os.linesep
+            debuggingResultQueue.put({'placeholders': config.ObjToJSON(config.opt['placeholders']), 'commands':
+                pointPlusNewline.join(allCommands)});
+        else:
+            executor = BatchProcessor.getExecutor(config)
+            executor.usage = EngineUsage()
+            # the engine's output is streamed into the capture file while it runs
+            capture = cls.createOutputCapture(config, capturePlaceholders, inputFilePath)
+            engineStartTime = time.time()
+            failed = True
+            try:
+                executor.execute(allCommands, capture)
+                failed = False
+            except Exception:
+                if outputFilePath:
+                    cls.discardOutputFile(outputFilePath)
+                raise
+            finally:
+                metrics['engineTime'] = time.time() - engineStartTime
+                metrics.update(executor.usage.toDict())
+                if capture is not None:
+                    capture.close(failed)
+            if outputFilePath:
+                cls.commitOutputFile(outputFilePath)
+        writeStartTime = time.time()
 
-        logMsg = Lang.get("Processing ") +  inputFilePath + "..."
-        print(logMsg);
-        logQueue.put(logMsg)
-
-        # read in commands
-        spssCommands = BatchProcessor.loadRawCommandsFromFile(config)
-        allCommands = [];
-        BatchProcessor.instantiatePlaceholders(config, inputFilePath, outputFilePath)
+        cls.saveCommandsToSyntaxFile(config, allCommands)
 
-        #execute file command by command
-        for command in spssCommands:
-            #ignore encoding line
-            if(command.find('Encoding') != -1):
-                continue;
+        usedTime = (time.time() - start_time);
+        metrics['outputWrite'] = time.time() - writeStartTime
+        cls.log(logQueue, Lang.get('Processing finished in {:.2f}s').format(usedTime), 'info', inputFilePath)
 
-            command = BatchProcessor.applyPlaceholders(command, config)
-            allCommands.append(command)
-            print(Lang.get("Executing: "), command);
+        return usedTime;
 
 
-        # redirect output
-        # redirecting here will also capture SPSS's errors
-        f = io.StringIO()
-        outDir = config.opt['defaultCaptureOutputOutDir']
-        if outDir != 'none':
-            redirect_stdout(f);
-        #try:
-        pointPlusNewline = '.' + os.linesep
-        debuggingResultQueue.put({'placeholders': config.ObjToJSON(config.opt['placeholders']), 'commands':
-            pointPlusNewline.join(allCommands)});
-
-        if(not(config.opt['simulateProcessing'])):
-            BatchProcessor.executor.execute(allCommands)
-
-        #except subprocess.CalledProcessError as e:
-            #halt processing
-            #errorQueue.put(e)
-            #logQueue.put(Lang.get('Error occurred; execution incomplete'))
-            #cls.saveOutputToFile(config, f)
-        #raise
-
-        cls.saveOutputToFile(config, f)
-        cls.saveCommandsToSyntaxFile(config, allCommands)
+    @classmethod
+    def runSPSSProcessOnFiles(cls, template, tasks, config, logQueue, metrics = None):
+        """
+        Processes several files using a single invocation of the statistics engine
+        (@see Configuration.opt['filesPerInvocation'])
+        :param template: SyntaxTemplate instance, compiled once per run
+        :param tasks: list of (inputFilePath, placeholders, commands)
+        :param config: settings of the run; shared by all files
+        :param metrics: dictionary receiving the duration of each phase and the usage of the engine for the whole batch
+        (@see runSPSSProcessOnFile)
+        :return: list with one entry per task: None if the file has been processed successfully, error message
+        otherwise
+        """
+        start_time = time.time()
+        if metrics is None:
+            metrics = {}
+
+        # the engine writes to temporary files, which are renamed into place once complete
+        outputFiles = [placeholders.get('OUTPUTFILE') for inputFilePath, placeholders, commands in tasks]
+        commandLists = []
+        for (inputFilePath, placeholders, commands), outputFilePath in zip(tasks, outputFiles):
+            if outputFilePath:
+                placeholders = dict(placeholders, OUTPUTFILE=cls.getTemporaryOutputPath(outputFilePath))
+            commandLists.append(cls.prepareCommands(template, inputFilePath, placeholders, config, logQueue, commands))
+        metrics['instantiation'] = time.time() - start_time
+
+        temporaryOutputFiles = [cls.getTemporaryOutputPath(outputFilePath) if outputFilePath else None
+                                for outputFilePath in outputFiles]
+        # the executor writes the output of each file into its capture (@see runSPSSProcessOnFile)
+        captures = [cls.createOutputCapture(config, placeholders, inputFilePath)
+                    for inputFilePath, placeholders, commands in tasks]
+        executor = BatchProcessor.getExecutor(config)
+        executor.usage = EngineUsage()
+        engineStartTime = time.time()
+        try:
+            results = executor.executeBatch(commandLists, temporaryOutputFiles, captures)
+        except Exception:
+            for outputFilePath, capture in zip(outputFiles, captures):
+                if outputFilePath:
+                    cls.discardOutputFile(outputFilePath)
+                if capture is not None:
+                    capture.close(True)
+            raise
+        finally:
+            metrics['engineTime'] = time.time() - engineStartTime
+            metrics.update(executor.usage.toDict())
+        writeStartTime = time.time()
+
+        errors = []
+        for (inputFilePath, placeholders, commands), allCommands, outputFilePath, capture, (output, error) in \
+                zip(tasks, commandLists, outputFiles, captures, results):
+            if outputFilePath and error is None:
+                cls.commitOutputFile(outputFilePath)
+            elif outputFilePath:
+                cls.discardOutputFile(outputFilePath)
+            if capture is not None:
+                capture.close(error is not None)
+            config.opt['placeholders'] = placeholders
+            cls.saveCommandsToSyntaxFile(config, allCommands)
+            if error is not None:
+                cls.log(logQueue, Lang.get('Error occurred; execution incomplete') + ': ' + inputFilePath, 'error',
+                        inputFilePath)
+            errors.append(error)
 
         usedTime = (time.time() - start_time);
-        logQueue.put(Lang.get('Processing finished in {:.2f}s').format(usedTime))
+        metrics['outputWrite'] = time.time() - writeStartTime
+        cls.log(logQueue, Lang.get('Processed {} files in {:.2f}s').format(len(tasks), usedTime))
+        return errors
 
-        return usedTime;
 
     @classmethod
-    def saveOutputToFile(cls, config, f):
+    def log(cls, logQueue, message, level = 'info', inputFile = None):
         """
-            writes out an individual spss file for each subject; the naming is equivalent to
-            fileName + .log
-            Please note that the toolbox currently does not support the generic generation of those filenames.
-            parameters: configuration as well as a io.StringIO object
+        Reports a record of the execution log from within a worker (@see transferLogQueue). The queue is bounded:
+        workers wait while the backend is behind, instead of piling up records in memory.
+        :param level: @see ExecutionLog.levels
         """
-        outDir = config.opt['defaultCaptureOutputOutDir']
-        if outDir != 'none':
-            origFileName = config.opt['placeholders']['fileName']
-            outFilePath = outDir + '/' + origFileName
+        logQueue.put({'runId': cls.taskRunId, 'workerId': cls.workerId, 'time': time.time(), 'level': level,
+                      'message': message, 'inputFile': inputFile})
 
-            with io.open(outFilePath, 'w+') as file:
-                file.write(f.getvalue())
+    @classmethod
+    def createOutputCapture(cls, config, placeholders, inputFilePath):
+        """
+        :param placeholders: placeholders of the task; name the capture file (@see OutputCapture.getFilePath)
+        :return: OutputCapture receiving the engine's output for the task; None if output is not captured
+        """
+        filePath = OutputCapture.getFilePath(config, placeholders)
+        if filePath is None:
+            return None
+        return OutputCapture(filePath, cls.getTemporaryOutputPath(filePath),
+                             config.opt.get('compressCapturedOutput', False), inputFilePath)
 
 
     @classmethod
@@ -452,98 +1204,96 @@ class BatchProcessor:
             origFileName = config.opt['placeholders']['fileName']
             outFilePath = outDir + '/' + origFileName + '.sps'
 
-            with io.open(outFilePath, 'w+') as file:
-                for cmd in commands:
-                    file.write(cmd)
+            cls.writeFileAtomically(outFilePath, ''.join(commands))
 
 
-    @staticmethod
-    def err(errMsg):
+    @classmethod
+    def getExecutor(cls, config):
         """
-        Shows given error message in Messagebox
+        Returns the executor for the engine selected in the configuration; imports the engine on first use only
+        :param config: key 'engine' will be used ('spss', 'pspp' or 'pspp-session')
         """
-        tk.messagebox.showerror(Lang.get("Error"), errMsg)
-
-
-    def defineDefaultPlaceholders(self, inputFilePath):
-        inputPath, fileName = os.path.split(inputFilePath);
-
-        # reset all placeholders. This is mandatory, as previous runs (other subjects) may have left values here
-        # however, ALL placeholders existing before applying custom placeholders are considered to be PREDEFINED
-        # (and will thus not be affected by custom placeholders)
-        self.config.opt['placeholders'] = {};
-        # set special placeholders
-        self.config.opt['placeholders']['INFILE'] = inputFilePath;
-        # input Path doesn't have a trailing slash
-        self.config.opt['placeholders']['INPUTDIR'] = inputPath + '/';
-        # output Path doesn't have a trailing slash
-        self.config.opt['placeholders']['OUTPUTDIR'] = self.config.opt['outputDir'] + '/';
-        self.config.opt['placeholders']['fileName'] = basename(inputFilePath);
-
-
-
-    def getOutputFilePath(self, oldFilePath):
+        engine = config.opt.get('engine', 'spss')
+        if cls.executor is None or cls.executor.engine != engine:
+            if cls.executor is not None and cls.executor.engine == 'pspp-session':
+                cls.executor.stopSession()
+            if engine == 'pspp':
+                from PSPPExecutor import PSPPExecutor
+                cls.executor = PSPPExecutor()
+            elif engine == 'pspp-session':
+                from PSPPSessionExecutor import PSPPSessionExecutor
+                cls.executor = PSPPSessionExecutor()
+            else:
+                from SPSSExecutor import SPSSExecutor
+                cls.executor = SPSSExecutor()
+            cls.executor.workerId = cls.workerId
+        if cls.executor.engine == 'pspp':
+            cls.executor.syntaxDelivery = config.opt.get('syntaxDelivery', 'stdin')
+            cls.executor.scratchDir = config.opt.get('scratchDir', '')
+            cls.executor.keepScratchFiles = config.opt.get('keepScratchFiles', False)
+        elif cls.executor.engine == 'pspp-session':
+            cls.executor.filesPerSession = max(1, int(config.opt.get('filesPerSession', 100)))
+            fileTimeout = float(config.opt.get('sessionFileTimeout', 3600))
+            cls.executor.fileTimeout = fileTimeout if fileTimeout > 0 else None
+        return cls.executor
+
+
+    def err(self, errMsg):
         """
-        constructs output file path from given path and inputRegexPattern; also populates inputFileNameMatch
+        Shows given error message using the frontend
         """
-        path = os.path.dirname(oldFilePath)
-        file = os.path.basename(oldFilePath);
-        # extract information from input file path using regex
-        m = re.match(self.config.opt['inputRegexPattern'], file)
-        self.inputFileNameMatch = m;
+        self.gui.err(errMsg)
 
-        if(m == None):
-            msg = Lang.get("Could not match input filename with pattern. Please check defined and used placeholders. Affected file: ") +  oldFilePath
-            self.err(msg);
-
-        # find all spots in the output file name to replace
-        # they have the form <name1>, <name2> ...
-        namedGroupPattern = '<([\w]*)>';
-        placeholders = re.findall(namedGroupPattern, self.config.opt['outputFilePattern']);
-
-        outputFileName = self.config.opt['outputFilePattern'];
-        #replace the placeholders
-        for placeholder in placeholders:
-            try:
-                #check whether it is a predefined placeholder
-                if (placeholder in self.config.opt['placeholders']):
-                    replacement = self.config.opt['placeholders'][placeholder];
-                else:
-                    replacement = m.group(placeholder)
-                    # if placeholder is PREDEFINED (already exists in above array), this is a serisous error
-                    # predefined placeholders may NOT be overwritten.
-                    if(placeholder in self.config.opt['placeholders']):
-                        msg = Lang.get('Predefined placeholders must not be redefined: attempted to define placeholder,  which already exists: ');
-                        raise RuntimeError( msg + ' ' + placeholder);
-            except IndexError:
-                BatchProcessor.err(Lang.get("Placeholder in ouput file pattern refers to a placeholder which has not been defined"));
-
-            # perhaps the placeholder is not in use after all (defined but not populated)
-            if(replacement != None):
-                outputFileName = outputFileName.replace('<' + placeholder + '>', replacement)
-        return self.config.opt['outputDir'] + '/' + outputFileName
 
 
 
-    def __init__(self, gui, parent, workerProcess, logQueue, taskQueue, debuggingResultQueue, errorQueue):
+    def __init__(self, gui, workerPool):
         """
-        initialize with process and queue; please note that as TK handles _cannot_ be pickled, we need to create
+        initialize with worker pool; please note that as TK handles _cannot_ be pickled, we need to create
         structures related to multiprocessing _before_ initializing the GUI (i.e. this class)
-        :param gui: BatchProcessorGUI instance
-        :param parent: TKinter frame instance (to draw into)
-        :param workerProcess:
-        :param logQueue:
-        :param taskQueue:
-        :param debuggingResultQueue:
-        :param errorQueue:
-        """
-        self.p = workerProcess;
-        self.queue, self.logQueue, self.debuggingResultQueue, self.errorQueue = taskQueue, logQueue, debuggingResultQueue, errorQueue;
+        :param gui: frontend; BatchProcessorGUI or BatchProcessorCLI instance
+        :param workerPool: WorkerPool instance
+        """
+        self.workerPool = workerPool;
+        # identifies the tasks of the current run @see WorkerPool.broadcastRunSettings
+        self.runId = None
+        self.queue, self.logQueue, self.debuggingResultQueue, self.eventQueue = workerPool.taskQueue, \
+            workerPool.logQueue, workerPool.debuggingResultQueue, workerPool.eventQueue;
+        self.startedTasks, self.completedTasks, self.totalFileNum, self.skippedFileNum = 0, 0, 0, 0
+        self.outputValidator = None
+        # set by a Pipeline running this backend as one of its steps
+        # False if the Pipeline takes care of the worker pool and runs several backends on it at the same time
+        self.ownsWorkerPool = True
+        # called with (backend, task, succeeded) whenever a task has been completed
+        self.completionListener = None
+        # @see createRunMetrics
+        self.runMetrics = None
+        self.remainingTimeEstimator = RemainingTimeEstimator()
+        self.queuedTimes = {}
+        # called with (backend, job) instead of queueing jobs right away @see dispatchJob
+        self.dispatcher = None
+        # jobs held back while processing is paused @see pauseProcessing
+        self.paused, self.heldJobs = False, []
+        self.cancelledFileNum = 0
+        self.completedTasksByWorker = {}
+        # input files which are still to be produced by the previous step @see releaseInputFile
+        self.pendingInputFiles = set()
+        self.deferredEntries, self.releasedEntries = {}, {}
+        self.skipUpToDateFiles = False
+        self.accumulationFile = None
+        self.manifest = None
+        # @see runPreflightChecks
+        self.fileNameAnalysis = None
+        self.preflightWarnings = []
+        self.accumulationLevels, self.accumulationPartialFiles = [], []
         self.config = Configuration();
-
-        parent.title(Lang.get("BatchProcessing"))
         self.gui = gui
 
-        self.executionLog = []
+        # compiled syntax file
+        # @see loadTemplate
+        self.template = None
+
+        # @see populateTaskQueue
+        self.executionLog = ExecutionLog()
 
 
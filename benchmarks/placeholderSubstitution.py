@@ -0,0 +1,59 @@
+"""
+Micro-benchmark: filling in placeholders of a large syntax template for many files.
+Compares one str.replace pass per placeholder and command (as done previously) to the single-pass PlaceholderPattern.
+
+Usage: python benchmarks/placeholderSubstitution.py [commands] [placeholders] [files]
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from SyntaxTemplate import SyntaxTemplate
+
+
+def createTemplate(commandNum, placeholderNum):
+    """
+    Creates template resembling the EEG import syntax: many variable lines, few commands using placeholders
+    """
+    lines = ['GET DATA /TYPE=TXT /FILE="<INFILE>" /DELIMITERS="\\t" /VARIABLES=']
+    lines += ['  var{} F10.7'.format(i) for i in range(commandNum)]
+    lines[-1] += '.'
+    lines += ['COMPUTE p{0} = "<placeholder{0}>".'.format(i) for i in range(placeholderNum)]
+    lines += ["SAVE OUTFILE='<OUTPUTFILE>'."]
+    return SyntaxTemplate('benchmark.sps', SyntaxTemplate.mergeLinesIntoCommands(lines), 0, 0, '')
+
+
+def replacePerPlaceholder(commands, placeholders):
+    ret = []
+    for command in commands:
+        for placeholderKey, substitute in placeholders.items():
+            command = command.replace("<" + placeholderKey + ">", substitute);
+        ret.append(command)
+    return ret
+
+
+def main():
+    commandNum = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    placeholderNum = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    fileNum = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+
+    template = createTemplate(commandNum, placeholderNum)
+    placeholders = {'placeholder{}'.format(i): 'value{}'.format(i) for i in range(placeholderNum)}
+    placeholders.update({'INFILE': 'in/subject.txt', 'OUTPUTFILE': 'out/subject.sav', 'INPUTDIR': 'in/',
+                         'OUTPUTDIR': 'out/', 'fileName': 'subject'})
+
+    assert replacePerPlaceholder(template.commands, placeholders) == template.instantiate(placeholders)
+
+    previous = timeit.timeit(lambda: replacePerPlaceholder(template.commands, placeholders), number=fileNum)
+    singlePass = timeit.timeit(lambda: template.instantiate(placeholders), number=fileNum)
+
+    print('{} commands, {} placeholders, {} files'.format(len(template.commands), len(placeholders), fileNum))
+    print('str.replace per placeholder: {:.4f}s'.format(previous))
+    print('single pass:                 {:.4f}s'.format(singlePass))
+    print('speedup:                     {:.1f}x'.format(previous / singlePass))
+
+if __name__ == '__main__':
+    main()
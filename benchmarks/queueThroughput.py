@@ -0,0 +1,80 @@
+"""
+Benchmark: throughput of the task queue depending on the number of input files.
+Compares tasks carrying the whole configuration as indented JSON (including the list of all input files; as done
+previously) to lean tasks carrying only paths and placeholders. A consumer process parses each task the way the
+workers do.
+
+Usage: python benchmarks/queueThroughput.py [file counts...]
+"""
+
+import os
+import sys
+import time
+from multiprocessing import Process, Queue
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Configuration import Configuration
+
+
+def consume(taskQueue, doneQueue):
+    while True:
+        task = taskQueue.get(True)
+        if task is None:
+            doneQueue.put(time.time())
+            return
+        if isinstance(task[4], str):
+            # previously, every task's configuration was parsed by the worker
+            Configuration().loadFromString(task[4])
+
+
+def createConfiguration(fileNum):
+    config = Configuration()
+    config.opt = dict(config.opt)
+    config.opt['inputFiles'] = ['/data/study/eeg/raw/subject{:05d}_session1_condition2.txt'.format(i)
+                                for i in range(fileNum)]
+    config.opt['outputDir'] = '/data/study/eeg/out'
+    return config
+
+
+def getFullTasks(config):
+    for i, filePath in enumerate(config.opt['inputFiles']):
+        yield [1, i, filePath, filePath + '.sav', config.toJSON(), None]
+
+
+def getLeanTasks(config):
+    for i, filePath in enumerate(config.opt['inputFiles']):
+        placeholders = {'fileName': os.path.basename(filePath), 'INFILE': filePath,
+                        'INPUTDIR': os.path.dirname(filePath) + '/', 'OUTPUTDIR': config.opt['outputDir'] + '/',
+                        'OUTPUTFILE': filePath + '.sav'}
+        yield [1, i, filePath, filePath + '.sav', placeholders, None]
+
+
+def measure(tasks):
+    """
+    :return: seconds until the consumer has received (and parsed) all tasks
+    """
+    taskQueue, doneQueue = Queue(), Queue()
+    consumer = Process(target=consume, args=(taskQueue, doneQueue))
+    consumer.start()
+    startTime = time.time()
+    for task in tasks:
+        taskQueue.put(task)
+    taskQueue.put(None)
+    endTime = doneQueue.get(True)
+    consumer.join()
+    return endTime - startTime
+
+
+def main():
+    fileNums = [int(arg) for arg in sys.argv[1:]] or [100, 500, 1000, 2000]
+    print('{:>7} {:>14} {:>14} {:>14} {:>14}'.format('files', 'full config', 'files/s', 'lean task', 'files/s'))
+    for fileNum in fileNums:
+        config = createConfiguration(fileNum)
+        full = measure(getFullTasks(config))
+        lean = measure(getLeanTasks(config))
+        print('{:>7} {:>13.3f}s {:>14.0f} {:>13.3f}s {:>14.0f}'.format(fileNum, full, fileNum / full, lean,
+                                                                      fileNum / lean))
+
+if __name__ == '__main__':
+    main()
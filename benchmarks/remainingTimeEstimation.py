@@ -0,0 +1,126 @@
+"""
+Benchmark: error of the estimated remaining time on run traces.
+Replays the task metrics recorded by runs (.batchProcessorMetrics.jsonl, @see RunMetrics) in the order the tasks
+started and completed; whenever a task completes, the remaining time estimated by the RemainingTimeEstimator and by
+the former linear extrapolation (average time per file so far) is compared to the time the run actually took from
+there on. Without trace files, synthetic runs are simulated: file sizes vary by orders of magnitude and task durations
+are a fixed cost plus a cost per byte with noise; some runs take the largest files last, or get slower halfway
+through (which no estimator can foresee, but the moving window catches up with).
+
+Reported per trace: mean absolute error relative to the duration of the run, and how often the actual remaining time
+lies within the estimated confidence interval (nominally 95%). The interval cannot cover a slowdown before it happens;
+that trace falls short of the nominal coverage by design.
+
+Usage: python benchmarks/remainingTimeEstimation.py [metrics files...]
+"""
+
+import heapq
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from RemainingTimeEstimator import RemainingTimeEstimator
+
+
+def loadTraces(filePath):
+    """
+    :return: list of traces, one per run within the file; each trace is a list of records of completed tasks
+    """
+    runs = {}
+    with open(filePath, 'r') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get('status') == 'finished':
+                runs.setdefault(record['runStartTime'], []).append(record)
+    return [runs[runStartTime] for runStartTime in sorted(runs)]
+
+
+def simulateTrace(taskNum, workerCount, seed, largestLast = False, slowdown = 1.0):
+    """
+    Simulates a run on the given number of workers; tasks are taken in order
+    :param largestLast: sort the files by size (i.e. names correlating with the amount of data)
+    :param slowdown: factor the durations grow by halfway through (i.e. a network share getting slower)
+    """
+    rng = random.Random(seed)
+    sizes = [int(10 ** rng.uniform(3, 7)) for i in range(taskNum)]
+    if largestLast:
+        sizes.sort()
+    workers = [(0.0, workerId) for workerId in range(workerCount)]
+    records = []
+    for taskId, size in enumerate(sizes):
+        freeTime, workerId = heapq.heappop(workers)
+        factor = slowdown if taskId > taskNum / 2 else 1.0
+        duration = (0.5 + size * 2e-7) * factor * rng.lognormvariate(0, 0.3)
+        records.append({'taskId': taskId, 'outputFile': 'out{}'.format(taskId), 'inputBytes': size,
+                        'startTime': freeTime, 'endTime': freeTime + duration, 'duration': duration,
+                        'batchSize': 1, 'workerId': workerId})
+        heapq.heappush(workers, (freeTime + duration, workerId))
+    return records
+
+
+def replay(records):
+    """
+    :return: (mean relative error of the estimator, of the linear extrapolation, share of estimates whose interval
+    covers the actual remaining time)
+    """
+    runStart = min(record['startTime'] for record in records)
+    runEnd = max(record['endTime'] for record in records)
+    runDuration = max(runEnd - runStart, 1e-6)
+    workerCount = len(set(record['workerId'] for record in records))
+
+    estimator = RemainingTimeEstimator()
+    for record in records:
+        estimator.addTask(record['outputFile'], record.get('inputBytes'))
+    # (time, order, kind, record); starts come before completions at the same time
+    events = [(record['startTime'], 0, index) for index, record in enumerate(records)]
+    events += [(record['endTime'], 1, index) for index, record in enumerate(records)]
+    events.sort()
+
+    errors, linearErrors, covered, completed = [], [], 0, 0
+    for eventTime, kind, index in events:
+        record = records[index]
+        if kind == 0:
+            estimator.startTask(record['outputFile'], eventTime)
+            continue
+        estimator.finishTask(record['outputFile'], record['duration'] / record['batchSize'])
+        completed += 1
+        if completed == len(records):
+            break
+        actual = runEnd - eventTime
+        remainingTime, lower, upper = estimator.estimate(eventTime, workerCount)
+        linear = float(len(records) - completed) / completed * (eventTime - runStart)
+        errors.append(abs(remainingTime - actual) / runDuration)
+        linearErrors.append(abs(linear - actual) / runDuration)
+        covered += 1 if lower <= actual <= upper else 0
+    if len(errors) == 0:
+        return 0.0, 0.0, 1.0
+    return sum(errors) / len(errors), sum(linearErrors) / len(linearErrors), covered / float(len(errors))
+
+
+def main():
+    traces = []
+    for filePath in sys.argv[1:]:
+        traces += [(os.path.basename(filePath), trace) for trace in loadTraces(filePath)]
+    if len(traces) == 0:
+        scenarios = [('mixed sizes, 200 files, 1 worker', 200, 1, {}),
+                     ('mixed sizes, 200 files, 4 workers', 200, 4, {}),
+                     ('largest last, 500 files, 8 workers', 500, 8, {'largestLast': True}),
+                     ('slowdown, 500 files, 8 workers', 500, 8, {'slowdown': 1.5}),
+                     ('mixed sizes, 1000 files, 32 workers', 1000, 32, {})]
+        traces = [(name, simulateTrace(taskNum, workerCount, seed, **options))
+                  for seed, (name, taskNum, workerCount, options) in enumerate(scenarios)]
+
+    print('{:<36} {:>8} {:>12} {:>12} {:>10}'.format('trace', 'tasks', 'estimator', 'linear', 'coverage'))
+    for name, trace in traces:
+        error, linearError, coverage = replay(trace)
+        print('{:<36} {:>8} {:>11.1f}% {:>11.1f}% {:>9.0f}%'.format(name, len(trace), error * 100,
+                                                                   linearError * 100, coverage * 100))
+
+if __name__ == '__main__':
+    main()